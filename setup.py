@@ -10,4 +10,5 @@ setup(
     author="Stephanie Frank Singer, et al.",
     author_email="sfsinger@campaignscientific.com",
     install_requires=["sqlalchemy", "pandas"],
+    extras_require={"cache": ["pyarrow"]},
 )
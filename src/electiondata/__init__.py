@@ -25,6 +25,8 @@ import xml.etree.ElementTree as ET
 import itertools
 import shutil
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # nb: jurisdiction_path is for backward compatibility
 
@@ -140,19 +142,36 @@ class SingleDataLoader:
         return datafile_id, election_id, err
 
     def load_results(
-        self, rollup: bool = False, rollup_rut: Optional[str] = None
+        self,
+        rollup: bool = False,
+        rollup_rut: Optional[str] = None,
+        chunk_rows: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_format: str = constants.default_frame_cache_format,
+        stats: Optional[Dict[str, float]] = None,
     ) -> Optional[dict]:
         """
         Optional inputs:
             rollup: bool = False, if True, roll results up to subdivision before inserting in db
             rollup_rut: Optional[str] = None, subdivision type to roll up to (typically 'county')
-
-        Load results from the file referenced in self.param_file
+            chunk_rows: Optional[int] = None, if given, flat_text files are streamed to the db
+                this many rows at a time (unless the munger specifies its own chunk_rows)
+            cache_dir: Optional[str] = None, if given, directory for the on-disk cache of
+                parsed results files (so that unchanged files are not parsed again)
+            cache_format: str = constants.default_frame_cache_format, format of the files in the
+                on-disk cache ("parquet", which requires pyarrow, or "pickle")
+            stats: Optional[Dict[str, float]] = None, if given, the statistics of the inserts of vote
+                counts from the file are added to this dictionary (see load_results_file)
+
+        Load results from the file referenced in self.param_file, reporting the number of vote counts
+        inserted, the time taken and the peak memory of the inserts
 
         Returns:
             Optional[dict], error dictionary
         """
         err = None
+        if stats is None:
+            stats = dict()
         print(f'\n\nProcessing {self.d["results_file"]}')
 
         # Enter datafile info to db and collect _datafile_Id and Election_Id
@@ -164,7 +183,8 @@ class SingleDataLoader:
         else:
             constants = self.collect_constants_from_ini()
 
-            # load results to db
+            # load results to db, reading the file only once for all mungers that read it the same way
+            read_cache = dict()
             for mu in self.munger_list:
                 print(f"\twith munger {mu}")
                 f_path = os.path.join(self.results_dir, self.d["results_file"])
@@ -181,9 +201,26 @@ class SingleDataLoader:
                     self.path_to_jurisdiction_dir,
                     rollup=rollup,
                     rollup_rut=rollup_rut,
+                    chunk_rows=chunk_rows,
+                    read_cache=read_cache,
+                    cache_dir=cache_dir,
+                    cache_format=cache_format,
+                    stats=stats,
                 )
                 if new_err:
                     err = ui.consolidate_errors([err, new_err])
+            # compute contest totals once for the whole datafile
+            err_str = db.refresh_contest_totals(self.session, [datafile_id])
+            if err_str:
+                err = ui.add_new_error(
+                    err, "warn-database", self.session.bind.url.database, err_str
+                )
+            if stats.get("rows"):
+                print(
+                    f"\tinserted {stats['rows']} vote counts in {stats['seconds']:.2f} seconds "
+                    f"({stats['seconds_per_million_rows']:.2f} seconds per million rows, "
+                    f"peak memory {stats['peak_memory_mb']:.1f} MB)"
+                )
         return err
 
     def collect_constants_from_ini(self) -> dict:
@@ -264,7 +301,14 @@ class SingleDataLoader:
 
 # noinspection PyTypeChecker
 class DataLoader:
-    def __new__(cls, param_file: Optional[str] = None, dbname: Optional[str] = None):
+    def __new__(
+        cls,
+        param_file: Optional[str] = None,
+        dbname: Optional[str] = None,
+        major_subdivision_file: Optional[str] = None,
+        db_pool_size: Optional[int] = None,
+        db_max_overflow: Optional[int] = None,
+    ):
         """Checks if parameter file exists and is correct. If not, does
         not create DataLoader object."""
 
@@ -284,7 +328,10 @@ class DataLoader:
 
         # create db if it does not already exist and have right tables
         err = db.create_db_if_not_ok(
-            d["repository_content_root"], db_param_file=param_file, dbname=dbname
+            d["repository_content_root"],
+            db_param_file=param_file,
+            dbname=dbname,
+            partition_vote_count=partition_vote_count_from_params(d),
         )
         if err:
             print(f"DataLoader object not created. Error:\n{err}")
@@ -298,6 +345,8 @@ class DataLoader:
         param_file: Optional[str] = None,
         dbname: Optional[str] = None,
         major_subdivision_file: Optional[str] = None,
+        db_pool_size: Optional[int] = None,
+        db_max_overflow: Optional[int] = None,
     ):
         """
         Inputs:
@@ -305,17 +354,24 @@ class DataLoader:
             dbname: Optional[str] = None, name of database (defaults to name specified in param_file)
             major_subdivision_file: str = None, path to file with columns
                 'jurisdiction', 'major_subjurisdiction_type'
+            db_pool_size: Optional[int] = None, if given, overrides db_pool_size in param_file
+            db_max_overflow: Optional[int] = None, if given, overrides db_max_overflow in param_file
 
         Returns DataLoader instance with attributes:
             d, dictionary of parameters from param_file
+            param_file, path to param_file
+            major_subdivision_file, path to major_subdivision_file (or None)
             db_engine, sqlalchemy engine connecting to postgres database specified in param_file
             session, sqlalchemy session for interacting with the database
+            schema, schema read from and written to (None for the public schema)
             analyzer, Analyzer instance for exporting or analyzing data in the database,
                 using subdivisions from <major_subdivision_file>, if given
         """
         # default param_file is run_time.ini in current directory
         if not param_file:
             param_file = "run_time.ini"
+        self.param_file = param_file
+        self.major_subdivision_file = major_subdivision_file
 
         # grab parameters
         self.d, self.parameter_err = ui.get_parameters(
@@ -325,6 +381,11 @@ class DataLoader:
             header="electiondata",
         )
 
+        if db_pool_size is not None:
+            self.d["db_pool_size"] = db_pool_size
+        if db_max_overflow is not None:
+            self.d["db_max_overflow"] = db_max_overflow
+
         # define parameters derived from run_time.ini
         self.d["ini_dir"] = os.path.join(
             self.d["repository_content_root"], "ini_files_for_results"
@@ -336,13 +397,15 @@ class DataLoader:
         # connect to db
         self.db_engine = None  # will be set in connect_to_db
         self.session = None  # will be set in connect_to_db
+        self.schema = None  # will be set in connect_to_db
         self.connect_to_db(dbname=dbname, db_param_file=param_file)
 
-        # create analyzer with same db
+        # create analyzer with same db, sharing the dataloader's session (and connection pool)
         self.analyzer = Analyzer(
             dbname=dbname,
             param_file=param_file,
             major_subdivision_file=major_subdivision_file,
+            session=self.session,
         )
 
     def connect_to_db(
@@ -350,20 +413,29 @@ class DataLoader:
         dbname: Optional[str] = None,
         db_param_file: Optional[str] = None,
         db_params: Optional[Dict[str, str]] = None,
+        schema: Optional[str] = None,
     ):
         """
         Inputs:
             dbname: Optional[str] = None,
             db_param_file: Optional[str] = None,
             db_params: Optional[Dict[str, str]] = None,
+            schema: Optional[str] = None, if given, tables are read from and written to
+                this schema (e.g., a staging schema) instead of public
 
             Sets engine attribute to an open connection with the database specified by
                 dname and/or db_params and/or db_param_file, and sets session attribute
                 to a newly-opened session on that engine
         """
+        self.schema = schema
         try:
             self.db_engine, err = db.sql_alchemy_connect(
-                db_param_file=db_param_file, dbname=dbname, db_params=db_params
+                db_param_file=db_param_file,
+                dbname=dbname,
+                db_params=db_params,
+                pool_size=self.d.get("db_pool_size") or constants.db_pool_size,
+                max_overflow=self.d.get("db_max_overflow") or constants.db_max_overflow,
+                schema=schema,
             )
             Session = sessionmaker(bind=self.db_engine)
             self.session = Session()
@@ -418,8 +490,10 @@ class DataLoader:
                 "dbname": new_db_name,
             }
 
-        # disconnect from current db and connect to new db, updating self.session and self.dbname
+        # disconnect from current db (returning all pooled connections)
+        # and connect to new db, updating self.session and self.dbname
         self.session.close()
+        self.db_engine.dispose()
         # # nb: next command updates self.session
         new_err = self.connect_to_db(
             db_params=db_params,
@@ -435,16 +509,88 @@ class DataLoader:
             dbname=new_db_name,
             db_param_file=db_param_file,
             db_params=db_params,
+            partition_vote_count=partition_vote_count_from_params(self.d),
         )
         err = ui.consolidate_errors([err, new_err])
         if ui.fatal_error(new_err):
             return err
 
-        # create new session for analyzer
-        self.analyzer.session.close()
-        self.analyzer.session = self.session
+        # point analyzer to the new session
+        self.analyzer.share_session(self.session)
+        return err
+
+    def change_schema(self, schema: Optional[str] = None) -> Optional[dict]:
+        """
+        Input:
+            schema: Optional[str] = None, name of schema (e.g., created by db.create_staging_schema)
+                or None for the public schema
+
+        Closes self.session, then redefines self.engine and self.session to read from and write to
+            the tables in <schema> in the current database
+        Changes self.analyzer.session to use the same schema
+
+        Returns:
+            Optional[dict], error dictionary
+        """
+        db_params = {
+            "host": self.db_engine.url.host,
+            "port": self.db_engine.url.port,
+            "user": self.db_engine.url.username,
+            "password": self.db_engine.url.password,
+            "dbname": self.db_engine.url.database,
+        }
+        self.session.close()
+        self.db_engine.dispose()
+        # nb: next command updates self.session
+        err = self.connect_to_db(db_params=db_params, schema=schema)
+        if ui.fatal_error(err):
+            return err
+
+        # point analyzer to the new session
+        self.analyzer.share_session(self.session)
         return err
 
+    def loading_pool(self, workers: int) -> ProcessPoolExecutor:
+        """
+        Inputs:
+            workers: int, number of worker processes
+
+        Returns:
+            ProcessPoolExecutor, pool of <workers> processes, each with its own DataLoader
+                (and so its own database connections) on the same database and schema as this one.
+                The connection pool configured for this DataLoader is divided among the workers
+                (see worker_pool_sizes), so that together they open no more connections than it would.
+                Processes are started fresh rather than forked, so that no open database connection
+                is shared with the parent; scripts calling this should therefore be
+                guarded by `if __name__ == "__main__":`
+        """
+        pool_size, max_overflow = worker_pool_sizes(
+            self.d.get("db_pool_size") or constants.db_pool_size,
+            self.d.get("db_max_overflow") or constants.db_max_overflow,
+            workers,
+        )
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_loading_worker,
+            initargs=(
+                self.param_file,
+                self.db_engine.url.database,
+                self.schema,
+                self.major_subdivision_file,
+                pool_size,
+                max_overflow,
+            ),
+        )
+
+    def pool_metrics(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int], state and running totals of the connection pool shared by
+                the DataLoader, its Analyzer and all database helpers called by them
+        """
+        return db.pool_metrics(self.db_engine)
+
     def close_and_erase(self) -> Optional[dict]:
         """
         Closes and removes the database specified by self.engine. Creates new engine and session
@@ -557,10 +703,42 @@ class DataLoader:
 
         else:
             rollup_rut = None
-        load_error = sdl.load_results(rollup=rollup, rollup_rut=rollup_rut)
+        load_error = sdl.load_results(
+            rollup=rollup,
+            rollup_rut=rollup_rut,
+            chunk_rows=chunk_rows_from_params(self.d),
+            cache_dir=self.d.get("cache_dir") or None,
+            cache_format=cache_format_from_params(self.d),
+        )
         err = ui.consolidate_errors([err, load_error])
         return sdl, err
 
+    def load_one_with_download_date(
+        self,
+        ini_path: str,
+        path_to_jurisdiction_dir: str,
+        juris_true_name: str,
+        rollup: bool = False,
+    ) -> (Optional[str], Optional[dict]):
+        """
+        Inputs:
+            as for load_one_from_ini
+
+        Loads results from the single results file specified by the parameters in <ini_path>.
+        Returns:
+            Optional[str], download date of the results file (or None if no SingleDataLoader was created)
+            Optional[dict], error dictionary
+        """
+        sdl, err = self.load_one_from_ini(
+            ini_path,
+            path_to_jurisdiction_dir,
+            juris_true_name,
+            rollup=rollup,
+        )
+        if sdl is None:
+            return None, err
+        return sdl.d["results_download_date"], err
+
     def load_ej_pair(
         self,
         election: str,
@@ -569,6 +747,7 @@ class DataLoader:
         report_missing_files: bool = False,
         status: Optional[str] = None,
         run_tests: bool = True,
+        workers: int = 1,
     ) -> (List[str], List[str], str, Optional[dict]):
         """
         Inputs:
@@ -579,6 +758,7 @@ class DataLoader:
                 results directory as a warning in the error dictionary
             status: Optional[str] = None, if given, use only reference results of that particular status for testing
             run_tests: bool = True, controls whether tests are run
+            workers: int = 1, if more than 1, files are loaded in parallel by a pool of this many processes
 
         Looks within ini_files_for_results/<jurisdiction> for
         all ini files matching  given election and jurisdiction.
@@ -608,6 +788,7 @@ class DataLoader:
                 f"No matching subfolder in ini_files_for_results",
             )
             return list(), err
+        to_load = list()
         for ini in os.listdir(ini_subdir):
             if ini[-4:] == ".ini":
                 ini_path = os.path.join(ini_subdir, ini)
@@ -633,21 +814,7 @@ class DataLoader:
                                     f"File not found in directory {self.d['results_dir']}",
                                 )
                             continue
-
-                        sdl, load_error = self.load_one_from_ini(
-                            ini_path,
-                            path_to_jurisdiction_dir,
-                            juris_true_name,
-                            rollup=rollup,
-                        )
-                        if ui.fatal_error(load_error):
-                            failure_by_ini.append(ini)
-                        else:
-                            success_by_ini.append(ini)
-                            if latest_download_date < sdl.d["results_download_date"]:
-                                latest_download_date = sdl.d["results_download_date"]
-                        if load_error:
-                            err = ui.consolidate_errors([err, load_error])
+                        to_load.append(ini)
 
                     else:
                         err = ui.add_new_error(
@@ -656,6 +823,29 @@ class DataLoader:
                             ini,
                             f"Ini in subdirectory {ini_subdir} has non-matching jurisdiction: {params['jurisdiction']}",
                         )
+
+        # load the files (in parallel, if requested), keeping results in the order of the ini files
+        load_args = (
+            [os.path.join(ini_subdir, ini) for ini in to_load],
+            itertools.repeat(path_to_jurisdiction_dir),
+            itertools.repeat(juris_true_name),
+            itertools.repeat(rollup),
+        )
+        if workers > 1 and len(to_load) > 1:
+            with self.loading_pool(min(workers, len(to_load))) as pool:
+                loaded = list(pool.map(load_one_from_ini_in_worker, *load_args))
+        else:
+            loaded = map(self.load_one_with_download_date, *load_args)
+        for ini, (download_date, load_error) in zip(to_load, loaded):
+            if ui.fatal_error(load_error):
+                failure_by_ini.append(ini)
+            else:
+                success_by_ini.append(ini)
+                if latest_download_date < download_date:
+                    latest_download_date = download_date
+            if load_error:
+                err = ui.consolidate_errors([err, load_error])
+
         # add totals if necessary
         add_err = self.add_totals_if_missing(election, juris_true_name)
         if add_err:
@@ -681,6 +871,7 @@ class DataLoader:
         report_missing_files: bool = False,
         run_tests: bool = True,
         suppress_warnings: bool = False,
+        workers: int = 1,
     ) -> (Dict[str, List[str]], Dict[str, List[str]], Dict[str, bool], Optional[dict]):
         """
         Inputs:
@@ -696,12 +887,19 @@ class DataLoader:
             run_tests: bool = True, if false, do not run tests on loaded data
             suppress_warnings: bool = False, if True, report only errors
                 to directory specified by self.d["reports_and_plots_dir"]
+            workers: int = 1, if more than 1, election-jurisdiction pairs are loaded in parallel by a pool
+                of this many processes, each with its own database connections. At most <workers> pairs are
+                submitted to the pool at a time; the next pair is submitted as each result is collected. Jurisdiction
+                info is still loaded first, serially; archiving and reporting are done in the same order as for
+                serial loading.
 
         Processes all results (or all results corresponding to pairs in
         ej_list if given) in DataLoader's results directory using
             .ini files from repository.
         If load is successful for all files for a single election-jurisdicction pair,
             then add records for total vote counts whereever necessary.
+        After each election-jurisdiction pair is loaded, its stored anomaly scores are refreshed
+            if its datafiles or jurisdiction files have changed (see refresh_anomaly_scores).
         By default, loads (or updates) the info from the jurisdiction files
             into the db first. By default, moves files to the DataLoader's archive directory.
         Returns a post-reporting error dictionary (including errors from post-load testing, if
@@ -807,77 +1005,95 @@ class DataLoader:
             ok_jurisdictions = jurisdictions
 
         latest_download_date = dict()
-        for jurisdiction in ok_jurisdictions:
-            juris_system_name = jm.system_name_from_true_name(jurisdiction)
-            juris_err = None
-            for election in elections[jurisdiction]:
-                # load the relevant files
-                (
-                    success_list,
-                    failure_list,
-                    latest_download_date[jurisdiction],
-                    new_err,
-                ) = self.load_ej_pair(
-                    election,
-                    jurisdiction,
-                    rollup=rollup,
-                    report_missing_files=report_missing_files,
-                    run_tests=run_tests,
-                )
-                if new_err:
-                    juris_err = ui.consolidate_errors([juris_err, new_err])
-
-                # set all_test_passed boolean for this e-j pair
-                if not run_tests:
-                    all_tests_passed[f"{election};{jurisdiction}"] = True
-                elif failure_list or (
-                    new_err and ("warn-test" in new_err.keys()) and new_err["warn-test"]
-                ):
-                    all_tests_passed[f"{election};{jurisdiction}"] = False
-                else:
-                    all_tests_passed[f"{election};{jurisdiction}"] = True
-
-                successfully_loaded[f"{election};{jurisdiction}"] = success_list
-                failed_to_load[f"{election};{jurisdiction}"] = failure_list
-
-            if move_files:
-                # if all existing files referenced in any results.ini
-                # for the jurisdiction
-                # -- for any election -- loaded correctly
-                if not ui.fatal_error(juris_err):
-                    juris_results_path = os.path.join(
-                        self.d["results_dir"], juris_system_name
-                    )
-                    # copy the jurisdiction's results file to archive directory
-                    # (subdir named with latest download date; if exists already, create backup with timestamp)
-                    if os.path.isdir(juris_results_path):
-                        new_err = ui.copy_directory_with_backup(
-                            juris_results_path,
-                            os.path.join(
-                                self.d["archive_dir"],
-                                f"{juris_system_name}_{latest_download_date[jurisdiction]}",
-                            ),
-                            report_error=False,
+        pair_kwargs = {
+            "rollup": rollup,
+            "report_missing_files": report_missing_files,
+            "run_tests": run_tests,
+        }
+        # if requested, load election-jurisdiction pairs in parallel, keeping one pair in flight
+        # per worker and submitting the next pair (in order) as each result is collected;
+        # results are still processed (archived, reported) one jurisdiction at a time, in order
+        pairs = [(e, j) for j in ok_jurisdictions for e in elections[j]]
+        pool = None
+        futures = dict()
+        to_submit = iter(pairs)
+        if workers > 1 and len(pairs) > 1:
+            pool_workers = min(workers, len(pairs))
+            pool = self.loading_pool(pool_workers)
+            for e, j in itertools.islice(to_submit, pool_workers):
+                futures[(e, j)] = pool.submit(load_ej_pair_in_worker, e, j, pair_kwargs)
+        try:
+            for jurisdiction in ok_jurisdictions:
+                juris_system_name = jm.system_name_from_true_name(jurisdiction)
+                juris_err = None
+                for election in elections[jurisdiction]:
+                    # load the relevant files (or collect the results of loading them in parallel)
+                    if pool is None:
+                        pair_results = self.load_ej_pair(
+                            election, jurisdiction, **pair_kwargs
                         )
-                        err = ui.consolidate_errors([err, new_err])
-                        # remove jurisdiction's results file from results directory
-                        shutil.rmtree(juris_results_path)
                     else:
-                        print(
-                            f"Directory not copied, because not found: {juris_results_path}\n"
-                            f"This may be caused by having results for two different elections"
-                            f"in the directory."
+                        pair_results = futures.pop((election, jurisdiction)).result()
+                        for e, j in itertools.islice(to_submit, 1):
+                            futures[(e, j)] = pool.submit(
+                                load_ej_pair_in_worker, e, j, pair_kwargs
+                            )
+                    (
+                        success_list,
+                        failure_list,
+                        latest_download_date[jurisdiction],
+                        new_err,
+                    ) = pair_results
+                    if new_err:
+                        juris_err = ui.consolidate_errors([juris_err, new_err])
+
+                    # set all_test_passed boolean for this e-j pair
+                    if not run_tests:
+                        all_tests_passed[f"{election};{jurisdiction}"] = True
+                    elif failure_list or (
+                        new_err
+                        and ("warn-test" in new_err.keys())
+                        and new_err["warn-test"]
+                    ):
+                        all_tests_passed[f"{election};{jurisdiction}"] = False
+                    else:
+                        all_tests_passed[f"{election};{jurisdiction}"] = True
+
+                    successfully_loaded[f"{election};{jurisdiction}"] = success_list
+                    failed_to_load[f"{election};{jurisdiction}"] = failure_list
+
+                    # rescore the pair for outliers, if its datafiles or jurisdiction files have changed
+                    new_err = self.refresh_anomaly_scores(
+                        election, jurisdiction, workers=workers
+                    )
+                    if new_err:
+                        juris_err = ui.consolidate_errors([juris_err, new_err])
+
+                if move_files:
+                    # if all existing files referenced in any results.ini
+                    # for the jurisdiction
+                    # -- for any election -- loaded correctly
+                    if not ui.fatal_error(juris_err):
+                        new_err = self.archive_results(
+                            juris_system_name, latest_download_date[jurisdiction]
                         )
+                        err = ui.consolidate_errors([err, new_err])
 
-            err = ui.consolidate_errors([err, juris_err])
+                err = ui.consolidate_errors([err, juris_err])
 
-            err = ui.report(
-                err,
-                report_dir,
-                key_list=constants.juris_load_report_keys,
-                file_prefix=juris_system_name,
-                suppress_warnings=suppress_warnings,
-            )
+                err = ui.report(
+                    err,
+                    report_dir,
+                    key_list=constants.juris_load_report_keys,
+                    file_prefix=juris_system_name,
+                    suppress_warnings=suppress_warnings,
+                )
+        finally:
+            if pool is not None:
+                # nb: nothing to cancel unless an exception was raised
+                for future in futures.values():
+                    future.cancel()
+                pool.shutdown()
 
         # report remaining errors
         ui.report(
@@ -889,6 +1105,42 @@ class DataLoader:
 
         return successfully_loaded, failed_to_load, all_tests_passed, err
 
+    def archive_results(
+        self, juris_system_name: str, download_date: str
+    ) -> Optional[dict]:
+        """
+        Inputs:
+            juris_system_name: str, system name of jurisdiction
+            download_date: str, latest download date of the jurisdiction's results files
+
+        Copies the jurisdiction's results folder to the archive directory (subdir named with
+            <download_date>; if exists already, creates backup with timestamp)
+            and removes it from the results directory
+
+        Returns:
+            Optional[dict], error dictionary
+        """
+        err = None
+        juris_results_path = os.path.join(self.d["results_dir"], juris_system_name)
+        if os.path.isdir(juris_results_path):
+            err = ui.copy_directory_with_backup(
+                juris_results_path,
+                os.path.join(
+                    self.d["archive_dir"],
+                    f"{juris_system_name}_{download_date}",
+                ),
+                report_error=False,
+            )
+            # remove jurisdiction's results file from results directory
+            shutil.rmtree(juris_results_path)
+        else:
+            print(
+                f"Directory not copied, because not found: {juris_results_path}\n"
+                f"This may be caused by having results for two different elections"
+                f"in the directory."
+            )
+        return err
+
     def strip_dates_from_results_folders(self) -> Dict[str, str]:
         """
         Remove any date-suffixes from sub-folders of self.d["results_dir"]
@@ -925,13 +1177,9 @@ class DataLoader:
         Returns:
             Optional[str], error string (or None if no errors)
         """
-        # get connection & cursor
-        connection = self.session.bind.raw_connection()
-        cursor = connection.cursor()
-
         # find all datafile ids matching the given election and jurisdiction
-        df_list, err_str = db.data_file_list_cursor(
-            cursor, election_id, reporting_unit_id=juris_id
+        df_list, err_str = db.data_file_list(
+            self.session, election_id, reporting_unit_id=juris_id
         )
         if err_str:
             return err_str
@@ -945,6 +1193,8 @@ class DataLoader:
             err_str = db.remove_record_from_datafile_table(self.session, idx)
             if err_str:
                 err_str_list.append(err_str)
+        # drop cached names and Ids, which may refer to removed records
+        db.invalidate_caches(self.session)
         if err_str_list:
             return ";".join(err_str_list)
         else:
@@ -1011,6 +1261,17 @@ class DataLoader:
                     f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
                 )
                 err = ui.consolidate_errors([err, new_err])
+                if "_datafile_Id" in m_df.columns:
+                    err_str = db.refresh_contest_totals(
+                        self.session, m_df["_datafile_Id"].unique()
+                    )
+                    if err_str:
+                        err = ui.add_new_error(
+                            err,
+                            "warn-database",
+                            self.session.bind.url.database,
+                            err_str,
+                        )
             except Exception as exc:
                 err = ui.add_new_error(
                     err,
@@ -1020,6 +1281,48 @@ class DataLoader:
                 )
         return err
 
+    def refresh_anomaly_scores(
+        self, election: str, jurisdiction: str, workers: int = 1
+    ) -> Optional[dict]:
+        """
+        Inputs:
+            election: str, name of election
+            jurisdiction: str, name of jurisdiction
+            workers: int = 1, number of worker processes for scoring contests for outliers
+
+        If the election-jurisdiction pair's datafiles have changed or its jurisdiction files have been loaded
+            since its anomaly scores (from which bar charts are drawn) were stored, or none are stored, scores
+            its vote counts by major subdivision and stores the result. Does nothing if the jurisdiction has no major subdivision type.
+
+        Returns:
+            Optional[dict], error dictionary
+        """
+        err = None
+        if jurisdiction not in self.analyzer.major_subdivision_type.keys():
+            return err
+        election_id = db.name_to_id(self.session, "Election", election)
+        jurisdiction_id = db.name_to_id(self.session, "ReportingUnit", jurisdiction)
+        if election_id is None or jurisdiction_id is None:
+            return err
+        try:
+            scored, err_str = an.refresh_anomaly_scores(
+                self.session,
+                election_id,
+                jurisdiction_id,
+                self.analyzer.major_subdivision_type[jurisdiction],
+                workers=workers,
+            )
+        except Exception as exc:
+            err_str = f"Unexpected exception while scoring vote counts: {exc}"
+        if err_str:
+            err = ui.add_new_error(
+                err,
+                "warn-database",
+                f"{election};{jurisdiction}",
+                f"Anomaly scores not stored: {err_str}",
+            )
+        return err
+
     def load_data_from_db_dump(
         self, dbname: str, dump_file: str, delete_existing: bool = False
     ) -> Optional[str]:
@@ -1034,14 +1337,12 @@ class DataLoader:
         Returns:
              Optional[str], error (or None if no error)
         """
-        connection = self.session.bind.raw_connection()
-        cursor = connection.cursor()
-        err_str = db.create_database(
-            connection, cursor, dbname=dbname, delete_existing=delete_existing
-        )
-
-        cursor.close()
-        connection.close()
+        with db.borrowed_cursor(self.session) as (connection, cursor):
+            err_str = db.create_database(
+                connection, cursor, dbname=dbname, delete_existing=delete_existing
+            )
+            # connection is now in autocommit mode, so keep it out of the pool
+            connection.detach()
 
         if not err_str:
             # read contents of dump into db
@@ -1447,17 +1748,14 @@ class DataLoader:
                 continue  # go to next munger
             # collect election-jurisdiction pairs
             new_err = dict()
-            dictionary_df = pd.read_csv(
-                dictionary_path,
-                sep="\t",
-            )
+            dictionary = m.compile_dictionary(dictionary_path)
             for element in ["Jurisdiction", "Election"]:
                 working, new_err[element] = m.replace_raw_with_internal_name(
                     working,
                     munger,
                     multi_file_name,
                     element,
-                    dictionary_df,
+                    dictionary,
                     dictionary_path,
                     drop_unmatched=True,
                 )
@@ -1623,6 +1921,15 @@ class DataLoader:
                                 )
                         else:
                             print(f"Successful load: {election} {jurisdiction}")
+                        # compute contest totals once for the whole datafile
+                        err_str = db.refresh_contest_totals(self.session, [datafile_id])
+                        if err_str:
+                            err = ui.add_new_error(
+                                err,
+                                "warn-database",
+                                self.session.bind.url.database,
+                                err_str,
+                            )
                     except Exception as exc:
                         err = ui.add_new_error(
                             err,
@@ -1663,6 +1970,161 @@ class DataLoader:
         return success, err
 
 
+def partition_vote_count_from_params(d: dict) -> bool:
+    """
+    Inputs:
+        d: dict, dictionary of parameters (presumably from the [electiondata] section of run_time.ini)
+
+    Returns:
+        bool, True if the optional parameter partition_vote_count is set to a true value
+            (e.g., 'true', 'yes' or '1')
+    """
+    value = d.get("partition_vote_count")
+    return value is not None and str(value).strip().lower() in ["true", "yes", "1"]
+
+
+def worker_pool_sizes(pool_size: int, max_overflow: int, workers: int) -> (int, int):
+    """
+    Inputs:
+        pool_size: int, size of the connection pool configured for a single DataLoader
+        max_overflow: int, connections allowed beyond <pool_size> for a single DataLoader
+        workers: int, number of worker processes sharing the configured connections
+
+    Returns:
+        int, size of each worker's connection pool: its share of <pool_size>, but at least
+            constants.min_worker_pool_size (a worker may hold a borrowed cursor alongside its session)
+        int, each worker's share of <max_overflow>
+    """
+    workers = max(workers, 1)
+    return (
+        max(-(-int(pool_size) // workers), constants.min_worker_pool_size),
+        -(-int(max_overflow) // workers),
+    )
+
+
+# DataLoader of the current worker process, when results are loaded in parallel (see DataLoader.loading_pool)
+worker_data_loader = None
+
+
+def init_loading_worker(
+    param_file: str,
+    dbname: str,
+    schema: Optional[str],
+    major_subdivision_file: Optional[str],
+    db_pool_size: Optional[int] = None,
+    db_max_overflow: Optional[int] = None,
+):
+    """
+    Inputs:
+        param_file: str, path to file of necessary parameters
+        dbname: str, name of database
+        schema: Optional[str], schema to read from and write to (None for the public schema)
+        major_subdivision_file: Optional[str], path to file of major subdivision types
+        db_pool_size: Optional[int] = None, size of the worker's connection pool (see worker_pool_sizes)
+        db_max_overflow: Optional[int] = None, connections the worker may open beyond <db_pool_size>
+
+    Creates the DataLoader (with its own database connections) used by the
+        current worker process for all the loading it is asked to do
+    """
+    global worker_data_loader
+    worker_data_loader = DataLoader(
+        param_file=param_file,
+        dbname=dbname,
+        major_subdivision_file=major_subdivision_file,
+        db_pool_size=db_pool_size,
+        db_max_overflow=db_max_overflow,
+    )
+    if worker_data_loader is not None and schema:
+        worker_data_loader.change_schema(schema)
+    return
+
+
+def get_worker_data_loader() -> DataLoader:
+    """
+    Returns:
+        DataLoader, the DataLoader of the current worker process
+        (raises an exception if it could not be created)
+    """
+    if worker_data_loader is None:
+        raise RuntimeError(
+            f"No DataLoader could be created in worker process {os.getpid()}"
+        )
+    return worker_data_loader
+
+
+def load_ej_pair_in_worker(
+    election: str, juris_true_name: str, pair_kwargs: Dict[str, Any]
+) -> (List[str], List[str], str, Optional[dict]):
+    """
+    Inputs:
+        election: str,
+        juris_true_name: str,
+        pair_kwargs: Dict[str, Any], keyword arguments for DataLoader.load_ej_pair
+
+    Loads the election-jurisdiction pair in the current worker process.
+    Returns:
+        as for DataLoader.load_ej_pair
+    """
+    return get_worker_data_loader().load_ej_pair(
+        election, juris_true_name, **pair_kwargs
+    )
+
+
+def load_one_from_ini_in_worker(
+    ini_path: str,
+    path_to_jurisdiction_dir: str,
+    juris_true_name: str,
+    rollup: bool = False,
+) -> (Optional[str], Optional[dict]):
+    """
+    Inputs:
+        as for DataLoader.load_one_from_ini
+
+    Loads the results file specified in <ini_path> in the current worker process.
+    Returns:
+        as for DataLoader.load_one_with_download_date
+    """
+    return get_worker_data_loader().load_one_with_download_date(
+        ini_path,
+        path_to_jurisdiction_dir,
+        juris_true_name,
+        rollup=rollup,
+    )
+
+
+def chunk_rows_from_params(d: dict) -> Optional[int]:
+    """
+    Inputs:
+        d: dict, dictionary of parameters (presumably from the [electiondata] section of run_time.ini)
+
+    Returns:
+        Optional[int], number of rows per chunk for streaming flat_text results files to the database,
+            from the optional parameter flat_text_chunk_rows (None if not given or not a positive integer)
+    """
+    try:
+        value = int(d.get("flat_text_chunk_rows"))
+    except (TypeError, ValueError):
+        return None
+    if value > 0:
+        return value
+    return None
+
+
+def cache_format_from_params(d: dict) -> str:
+    """
+    Inputs:
+        d: dict, dictionary of parameters (presumably from the [electiondata] section of run_time.ini)
+
+    Returns:
+        str, format of the files in the on-disk cache of parsed results files, from the optional
+            parameter cache_format (constants.default_frame_cache_format if not given or not a known format)
+    """
+    cache_format = d.get("cache_format")
+    if cache_format in constants.frame_cache_suffixes.keys():
+        return cache_format
+    return constants.default_frame_cache_format
+
+
 def check_param_file_elements(
     ini_d: dict,
     mungers_path: str,
@@ -2381,6 +2843,7 @@ class Analyzer:
         param_file: str = None,
         dbname: str = None,
         major_subdivision_file: str = None,
+        session: Optional[Session] = None,
     ):
         """
         Optional inputs:
@@ -2389,6 +2852,8 @@ class Analyzer:
             dbname: str = None, name of database. Default is name in <param_file>
             major_subdivision_file: str = None, path to file with columns
                 'jurisdiction', 'major_subjurisdiction_type'
+            session: Optional[Session] = None, if given, an open session (e.g., of a DataLoader)
+                to use instead of connecting to the database anew
         Checks:
             parameter file exists and is has necessary parameters
             connection to database
@@ -2424,11 +2889,17 @@ class Analyzer:
             print("Analyzer object not created.")
             return None
 
-        # test connection to db
+        # test connection to db (unless a session is given)
+        db_engine = None
         try:
-            db_engine, err = db.sql_alchemy_connect(db_params=db_params, dbname=dbname)
-            Session = sessionmaker(bind=db_engine)
-            session = Session()
+            if session is not None:
+                err = None
+            else:
+                db_engine, err = db.sql_alchemy_connect(
+                    db_params=db_params, dbname=dbname
+                )
+                Session = sessionmaker(bind=db_engine)
+                session = Session()
             # if error is fatal
             if ui.fatal_error(err):
                 print(
@@ -2466,6 +2937,7 @@ class Analyzer:
         param_file: str = None,
         dbname: str = None,
         major_subdivision_file: str = None,
+        session: Optional[Session] = None,
     ):
         """
         Optional inputs:
@@ -2475,6 +2947,8 @@ class Analyzer:
                 is the value of the dbname parameter in the [postgres] section of the param_file
             major_subdivision_file: str = None, path to file with columns
                 'jurisdiction', 'major_subjurisdiction_type'
+            session: Optional[Session] = None, if given, an open session (e.g., of a DataLoader)
+                for the Analyzer to use, so that no connection pool of its own is created
 
         Creates instance of Analyzer with attributes:
             d, dictionary of parameters from param_file
@@ -2496,10 +2970,13 @@ class Analyzer:
         self.reports_and_plots_dir = d["reports_and_plots_dir"]
         self.repository_content_root = d["repository_content_root"]
 
-        # create session
-        eng, err = db.sql_alchemy_connect(db_param_file=param_file, dbname=dbname)
-        Session = sessionmaker(bind=eng)
-        self.session = Session()
+        # create session (unless one is given)
+        if session is not None:
+            self.session = session
+        else:
+            eng, err = db.sql_alchemy_connect(db_param_file=param_file, dbname=dbname)
+            Session = sessionmaker(bind=eng)
+            self.session = Session()
 
         # get dictionary of major subdivision types
         self.major_subdivision_type, new_err = get_major_subdivisions(
@@ -2508,6 +2985,30 @@ class Analyzer:
             major_subdivision_file=major_subdivision_file,
         )
 
+    def share_session(self, session: Session):
+        """
+        Required inputs:
+            session: Session, sqlalchemy session (e.g., of a DataLoader) to be used by the Analyzer
+
+        Closes the Analyzer's current session, disposing of its connection pool if the new session
+            uses a different engine, so that only one pool is open per database
+        """
+        if self.session is session:
+            return
+        old_engine = self.session.bind
+        self.session.close()
+        if old_engine is not session.bind:
+            old_engine.dispose()
+        self.session = session
+        return
+
+    def pool_metrics(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int], state and running totals of the connection pool used by the Analyzer
+        """
+        return db.pool_metrics(self.session)
+
     # testing methods
     def test_loaded_results(
         self,
@@ -2906,6 +3407,7 @@ class Analyzer:
         contest_type: str = None,
         contest: str = None,
         fig_type: str = None,
+        workers: int = 1,
     ) -> Optional[List[dict]]:
         """
         Required inputs:
@@ -2919,9 +3421,14 @@ class Analyzer:
             fig_type: str = None, an image format string from plotly - as of 8/2021, includes
                 html, png, jpeg, webp, svg, pdf, and eps. Note that some filetypes may need
                 plotly-orca installed as well.
+            workers: int = 1, number of worker processes for scoring contests for outliers
+                (scripts using workers should be guarded by `if __name__ == "__main__":`)
 
         If <fig_type> is given and points for scatter are found, creates a scatter plot
             in the self.reports_and_plots_dir directory with file extension and format determined by fig_type.
+        Outlier scores are read from the anomaly-score store, which is refreshed first if the
+            election-jurisdiction pair's datafiles or jurisdiction files have changed
+            (see DataLoader.refresh_anomaly_scores).
 
         Returns:
             List[dict],
@@ -2939,6 +3446,7 @@ class Analyzer:
             contest_district_type=contest_type,
             contest_or_contest_group=contest,
             for_export=False,
+            workers=workers,
         )
         if fig_type and agg_results:
             for agg_result in agg_results:
@@ -2964,9 +3472,11 @@ class Analyzer:
         election: str,
         jurisdiction: str,
         contest: str = None,
+        workers: int = 1,
     ) -> Optional[List[dict]]:
         """Not ready for prime time
-        contest_type is one of state, congressional, state-senate, state-house"""
+        contest_type is one of state, congressional, state-senate, state-house.
+        If <workers> > 1, contests are scored for outliers in that many worker processes"""
         election_id = db.name_to_id(self.session, "Election", election)
         jurisdiction_id = db.name_to_id(self.session, "ReportingUnit", jurisdiction)
         # bar chart always at one level below top reporting unit
@@ -2977,6 +3487,7 @@ class Analyzer:
             self.major_subdivision_type[jurisdiction],
             contest_or_contest_group=contest,
             for_export=True,
+            workers=workers,
         )
         return agg_results
 
@@ -3092,7 +3603,9 @@ class Analyzer:
 
         Exports all election results from <self.session>'s database for the election <election> (and the jurisdiction
             <jurisdiction>, if given) to the <target_file>. Columns exported are:  "Election",
-            "Contest", "Selection", "Party", "ReportingUnit", "VoteType", "Count", "Preliminary"
+            "Contest", "Selection", "Party", "ReportingUnit", "VoteType", "Count", "Preliminary".
+            Results are sorted in the database and written in chunks, so memory use does not grow
+            with the size of the election.
         """
         # get internal ids for election (and maybe jurisdiction too)
         election_id = db.name_to_id(self.session, "Election", election)
@@ -3101,8 +3614,8 @@ class Analyzer:
         else:
             jurisdiction_id = None
 
-        # get counts
-        df = db.read_vote_count(
+        # get counts, sorted by the database
+        chunks = db.read_vote_count_chunks(
             self.session,
             election_id=election_id,
             jurisdiction_id=jurisdiction_id,
@@ -3126,13 +3639,34 @@ class Analyzer:
                 "Count",
                 "Preliminary",
             ],
+            order_by=[
+                "ElectionName",
+                "ContestName",
+                "BallotName",
+                "GPReportingUnitName",
+                "CountItemType",
+            ],
         )
         #  export to file
-        df.sort_values(
-            by=["Election", "Contest", "Selection", "ReportingUnit", "VoteType"],
-            inplace=True,
-        )
-        df.to_csv(target_file, sep="\t", index=False)
+        header = True
+        with open(target_file, "w", newline="") as f:
+            for df in chunks:
+                df.to_csv(f, sep="\t", index=False, header=header)
+                header = False
+        if header:
+            # no results, so just write column names
+            pd.DataFrame(
+                columns=[
+                    "Election",
+                    "Contest",
+                    "Selection",
+                    "Party",
+                    "ReportingUnit",
+                    "VoteType",
+                    "Count",
+                    "Preliminary",
+                ]
+            ).to_csv(target_file, sep="\t", index=False)
         return
 
     def diff_in_diff_dem_vs_rep(
@@ -3417,11 +3951,8 @@ class Analyzer:
         jurisdiction_id = db.name_to_id(self.session, "ReportingUnit", jurisdiction)
         if not election_id:
             return empty_df_with_good_cols
-        connection = self.session.bind.raw_connection()
-        cursor = connection.cursor()
-
-        datafile_list, err_str1 = db.data_file_list_cursor(
-            cursor,
+        datafile_list, err_str1 = db.data_file_list(
+            self.session,
             election_id,
             reporting_unit_id=jurisdiction_id,
             by="Id",
@@ -3624,28 +4155,67 @@ class Analyzer:
                 f"Some counts could not be interpreted as integers:\n{clean_err_df}",
             )
 
-        # initialize dataframes to be returned
-        not_found_in_db = ok = pd.DataFrame(columns=ref.columns)
-        wrong = pd.DataFrame(columns=list(ref.columns) + ["Database_Count"])
-
-        for idx, row in ref.iterrows():
-            db_total = self.contest_total(
-                election=row["Election"],
-                jurisdiction=row["Jurisdiction"],
-                contest=row["Contest"],
-                reporting_unit=row["ReportingUnit"],
-                vote_type=row["VoteType"],
+        # get database totals, with one query per election, jurisdiction and subdivision type
+        ref = ref.reset_index(drop=True)
+        ru_types = db.get_reporting_unit_types(
+            self.session, list(ref["ReportingUnit"].unique())
+        )
+        ref_sub_unit_types = ref["ReportingUnit"].map(ru_types).rename("sub_unit_type")
+        unknown_units = sorted(
+            ref.loc[ref_sub_unit_types.isnull(), "ReportingUnit"].unique()
+        )
+        if unknown_units:
+            err = ui.add_new_error(
+                err,
+                "warn-test",
+                Path(reference).name,
+                f"Reporting units not found in database, so their results were not found: {unknown_units}",
             )
-
-            if db_total is None:
-                # contest not found
-                not_found_in_db = not_found_in_db.append(row, ignore_index=True)
-            elif int(db_total) == int(row["Count"]):
-                ok = ok.append(row, ignore_index=True)
-            else:
-                wrong = wrong.append(
-                    {**row, **{"Database_Count": int(db_total)}}, ignore_index=True
+        key_cols = ["Election", "Jurisdiction", "Contest", "ReportingUnit", "VoteType"]
+        db_totals_list = list()
+        for (election, jurisdiction, sub_unit_type), _ in ref.groupby(
+            [ref["Election"], ref["Jurisdiction"], ref_sub_unit_types], dropna=False
+        ):
+            # reporting units not in the database have no totals (see unknown_units)
+            if pd.isnull(sub_unit_type):
+                continue
+            df = self.aggregate(
+                election,
+                jurisdiction,
+                sub_unit_type=sub_unit_type,
+                exclude_redundant_total=False,
+            )
+            if df.empty:
+                continue
+            df = (
+                df.groupby(["contest", "reporting_unit", "count_item_type"])["count"]
+                .sum()
+                .reset_index()
+                .rename(
+                    columns={
+                        "contest": "Contest",
+                        "reporting_unit": "ReportingUnit",
+                        "count_item_type": "VoteType",
+                        "count": "Database_Count",
+                    }
                 )
+            )
+            df = m.add_constant_column(df, "Election", election)
+            df = m.add_constant_column(df, "Jurisdiction", jurisdiction)
+            db_totals_list.append(df)
+        if db_totals_list:
+            db_totals = pd.concat(db_totals_list)[key_cols + ["Database_Count"]]
+        else:
+            db_totals = pd.DataFrame(columns=key_cols + ["Database_Count"])
+
+        # classify reference results as not found, ok or wrong
+        compared = ref.merge(db_totals, how="left", on=key_cols)
+        found = compared["Database_Count"].notnull()
+        matched = found & (compared["Database_Count"] == compared["Count"])
+        not_found_in_db = ref[~found].reset_index(drop=True)
+        ok = ref[matched].reset_index(drop=True)
+        wrong = compared[found & ~matched].reset_index(drop=True)
+        wrong["Database_Count"] = wrong["Database_Count"].astype(int)
 
         # rename Count to Reference Count and revise column order
         wrong.rename(columns={"Count": "Reference_Count"}, inplace=True)
@@ -3829,10 +4399,8 @@ def external_data_exists(
         # data doesn't exist
         return False
 
-    connection = an.session.bind.raw_connection()
-    cursor = connection.cursor()
-    df = db.read_external(cursor, election_id, jurisdiction_id, ["Label"])
-    cursor.close()
+    with db.borrowed_cursor(an.session) as (connection, cursor):
+        df = db.read_external(cursor, election_id, jurisdiction_id, ["Label"])
 
     # if no data found
     if df.empty:
@@ -3857,6 +4425,10 @@ def load_results_df(
     rollup: bool = False,
     rollup_rut: str = constants.default_subdivision_type,
     alt_dictionary: Optional[str] = None,
+    distinct: bool = True,
+    chunk_table: Optional[str] = None,
+    chunk_cursor=None,
+    stats: Optional[Dict[str, float]] = None,
 ) -> Optional[dict]:
     """
     Required inputs:
@@ -3873,6 +4445,14 @@ def load_results_df(
         rollup: bool = False,
         rollup_rut: str = constants.default_subdivision_type,
         alt_dictionary: Optional[str] = None,  path to file
+        distinct: bool = True, if True, raw values are replaced by Ids once for each distinct combination
+            of raw values, and the Ids are broadcast back to the rows
+        chunk_table: Optional[str] = None, if given, the vote counts are staged in this temp table
+            (see db.create_vote_count_chunk_table_cursor) rather than inserted into VoteCount. <df> is then
+            one chunk of a file, so finding no contest-selection pairs in it is not an error.
+        chunk_cursor = None, cursor on the connection holding <chunk_table>; nothing is committed.
+        stats: Optional[Dict[str, float]] = None, if given, the statistics of the insert into VoteCount
+            are added to this dictionary (see db.insert_to_cdf_db)
 
     Munges vote counts in dataframe into the <session>'s database, using the dictionary.txt file in the
         <path_to_jurisdiction_dir> directory or, if given, the file specified by <alt_dictionary>. If
@@ -3883,7 +4463,10 @@ def load_results_df(
          Optional[dict], error dictionary
     """
     err = None
-    working = df.copy()
+    if distinct:
+        working, codes = m.distinct_keys(df, ["Count"])
+    else:
+        working = df.copy()
     # add text column for internal CountItemType name, Id columns for all but Count, removing raw-munged
     try:
         working, new_err = m.munge_raw_to_ids(
@@ -3899,6 +4482,8 @@ def load_results_df(
             err = ui.consolidate_errors([err, new_err])
             if ui.fatal_error(new_err):
                 return err
+        if distinct:
+            working = m.broadcast_to_rows(working, codes, df[["Count"]])
     except Exception as exc:
         err = ui.add_new_error(
             err,
@@ -3921,6 +4506,8 @@ def load_results_df(
         working = working[~mask.all(axis=1)]
 
     if working.empty:
+        if chunk_table:
+            return err
         err = ui.add_new_error(
             err,
             "jurisdiction",
@@ -3949,7 +4536,15 @@ def load_results_df(
     working = m.add_constant_column(working, "Election_Id", election_id)
     # load counts to db
     try:
-        err = m.fill_vote_count(working, session, munger_name, err)
+        err = m.fill_vote_count(
+            working,
+            session,
+            munger_name,
+            err,
+            chunk_table=chunk_table,
+            chunk_cursor=chunk_cursor,
+            stats=stats,
+        )
     except Exception as exc:
         err = ui.add_new_error(
             err,
@@ -3973,6 +4568,11 @@ def load_results_file(
     path_to_jurisdiction_dir: str,
     rollup: bool = False,
     rollup_rut: str = constants.default_subdivision_type,
+    chunk_rows: Optional[int] = None,
+    read_cache: Optional[Dict[str, tuple]] = None,
+    cache_dir: Optional[str] = None,
+    cache_format: str = constants.default_frame_cache_format,
+    stats: Optional[Dict[str, float]] = None,
 ) -> Optional[dict]:
     """
     required inputs:
@@ -3990,6 +4590,21 @@ def load_results_file(
     optional inputs:
         rollup: bool = False, if True, roll up results to the subdivisions specified by <rollup_rut>
         rollup_rut: str = constants.default_subdivision_type, ReportingUnitType used for rollup (typically 'county')
+        chunk_rows: Optional[int] = None, if given (and not overridden by chunk_rows in the munger), a flat_text
+            file is read, munged and loaded this many rows at a time, so that memory use is bounded by the
+            size of a chunk rather than the size of the file (see load_results_file_in_chunks). Ignored if
+            <rollup> is True, since rolled-up counts sum over the whole file. A flat_text file whose records
+            must be padded is read whole.
+        read_cache: Optional[Dict[str, tuple]] = None, if given, results file is read only if it has not
+            already been read into <read_cache> with the same reading parameters (e.g., for another munger)
+        cache_dir: Optional[str] = None, if given (and the file is not streamed in chunks), the parsed
+            results file is taken from the on-disk cache in <cache_dir> if the file and munger are unchanged
+            since they were last processed together, and otherwise added to the cache
+        cache_format: str = constants.default_frame_cache_format, format of the files in the on-disk cache
+            ("parquet", which requires pyarrow, or "pickle", only for a cache no one else can write to)
+        stats: Optional[Dict[str, float]] = None, if given, the number of vote counts inserted, the seconds
+            taken, the seconds per million rows and the peak memory (MB) of the insert are added to this
+            dictionary (see db.add_insert_stats)
 
     Attempts to load results from results file to the database. (Does *not* require results to pass tests.)
 
@@ -4004,21 +4619,57 @@ def load_results_file(
     if ui.fatal_error(err):
         return err
 
+    # # identify constant-over-file elements
+    if p["constant_over_file"]:
+        necessary_constants = {
+            c: v for c, v in constants.items() if c in p["constant_over_file"]
+        }
+    else:
+        necessary_constants = dict()
+
+    # stream file to db chunk by chunk, if possible
+    if rollup:
+        chunk_rows = 0
+    else:
+        chunk_rows = m.chunk_rows_for_munger(p, chunk_rows)
+    if chunk_rows:
+        new_err, streamed = load_results_file_in_chunks(
+            session,
+            munger_path,
+            p,
+            f_path,
+            juris_true_name,
+            datafile_id,
+            election_id,
+            necessary_constants,
+            results_directory_path,
+            path_to_jurisdiction_dir,
+            chunk_rows,
+            stats=stats,
+        )
+        err = ui.consolidate_errors([err, new_err])
+        if streamed:
+            return err
+        # otherwise file must be read whole
+
     # transform to raw df in standard form
-    df, new_err = m.file_to_raw_df(munger_path, p, f_path, results_directory_path)
+    df, new_err = m.file_to_raw_df(
+        munger_path,
+        p,
+        f_path,
+        results_directory_path,
+        read_cache=read_cache,
+        cache_dir=cache_dir,
+        cache_format=cache_format,
+    )
     if new_err:
         err = ui.consolidate_errors([err, new_err])
         if ui.fatal_error(new_err):
             return err
 
     # # add columns for constant-over-file elements
-    if p["constant_over_file"]:
-        necessary_constants = {
-            c: v for c, v in constants.items() if c in p["constant_over_file"]
-        }
+    if necessary_constants:
         df = m.add_constants_to_df(df, necessary_constants)
-    else:
-        necessary_constants = dict()
 
     # # delete any rows with items to be ignored
     df = m.remove_ignored_rows(df, munger_path)
@@ -4035,10 +4686,110 @@ def load_results_file(
         election_id,
         rollup=rollup,
         rollup_rut=rollup_rut,
+        stats=stats,
     )
     return ui.consolidate_errors([err, new_err])
 
 
+def load_results_file_in_chunks(
+    session: Session,
+    munger_path: str,
+    p: Dict[str, Any],
+    f_path: str,
+    juris_true_name: str,
+    datafile_id: int,
+    election_id: int,
+    necessary_constants: Dict[str, str],
+    results_directory_path: str,
+    path_to_jurisdiction_dir: str,
+    chunk_rows: int,
+    stats: Optional[Dict[str, float]] = None,
+) -> (Optional[dict], bool):
+    """Streaming version of the loading in load_results_file: reads and munges the results file <chunk_rows>
+    data rows (or counts) at a time, staging the vote counts of each chunk in a temp table. Once
+    every chunk is staged, the staged counts are summed over the whole file (so that rows for the same
+    contest, selection, reporting unit and count type in different chunks are added, as they would be if the
+    file were read whole) and inserted into VoteCount, in one transaction. (Contest totals are computed
+    once the whole datafile is loaded; see SingleDataLoader.load_results.)
+    If any chunk has a fatal error, no vote counts from the file are loaded. If a dictionary <stats> is
+    given, the statistics of the insert of the staged counts into VoteCount are added to it, counting the
+    rows staged (see db.add_insert_stats).
+
+    returns:
+        Optional[dict], error dictionary
+        bool, False if the file turned out to need reading whole (e.g., flat_text records that must be
+            padded), in which case nothing was loaded (and the error dictionary holds only the warning)
+    """
+    munger_name = Path(munger_path).name
+    file_name = Path(f_path).name
+    err = None
+    # the chunks are staged in a temp table on a single connection, so that if loading stops
+    # partway (even if the process dies) nothing staged is left behind
+    with db.borrowed_cursor(session) as (connection, cursor):
+        try:
+            chunk_table = db.create_vote_count_chunk_table_cursor(cursor)
+            for df, new_err in m.file_to_raw_df_in_chunks(
+                munger_path, p, f_path, results_directory_path, chunk_rows
+            ):
+                if new_err:
+                    err = ui.consolidate_errors([err, new_err])
+                    if ui.fatal_error(new_err):
+                        connection.rollback()
+                        return err, True
+                if df is None:
+                    connection.rollback()
+                    return err, False
+
+                # # add columns for constant-over-file elements
+                if necessary_constants:
+                    df = m.add_constants_to_df(df, necessary_constants)
+
+                # # delete any rows with items to be ignored
+                df = m.remove_ignored_rows(df, munger_path)
+
+                new_err = load_results_df(
+                    session,
+                    df,
+                    necessary_constants,
+                    juris_true_name,
+                    file_name,
+                    munger_name,
+                    path_to_jurisdiction_dir,
+                    datafile_id,
+                    election_id,
+                    chunk_table=chunk_table,
+                    chunk_cursor=cursor,
+                )
+                if new_err:
+                    err = ui.consolidate_errors([err, new_err])
+                    if ui.fatal_error(new_err):
+                        connection.rollback()
+                        return err, True
+
+            started = db.start_insert_stats(stats)
+            staged = db.insert_vote_counts_from_chunk_table_cursor(cursor, chunk_table)
+            connection.commit()
+            db.add_insert_stats(stats, started, staged)
+        except Exception as exc:
+            connection.rollback()
+            err = ui.add_new_error(
+                err,
+                "system",
+                f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
+                f"Unable to load vote counts in chunks: {exc}",
+            )
+            return err, True
+    db.invalidate_caches(session, "VoteCount")
+    if staged == 0:
+        err = ui.add_new_error(
+            err,
+            "jurisdiction",
+            juris_true_name,
+            f"No contest-selection pairs recognized via munger {munger_name}",
+        )
+    return err, True
+
+
 def create_from_template(
     template_file: str, target_file: str, replace_dict: Dict[str, str]
 ):
@@ -4070,7 +4821,7 @@ def load_or_reload_all(
 
     For each election-jurisdiction pair from a <results>.ini file corresponding to a file in
         the results directory specified in the data loading parameter file, loads all result data to
-        a temporary database (and, if <run_tests> is True, runs tests on loaded data). If the
+        a staging schema (and, if <run_tests> is True, runs tests on loaded data). If the
         set of files in the election-jurisdiction pair all load without fatal error or failed test,
         remove any data for that election-jurisdiction pair from the database and load the new data.
 
@@ -4143,6 +4894,7 @@ def reload_juris_election(
     move_files: bool = True,
     run_tests: bool = True,
     suppress_warnings: bool = False,
+    stage_in_schema: bool = True,
 ) -> Optional[dict]:
     """
     required inputs:
@@ -4158,6 +4910,9 @@ def reload_juris_election(
             are successful
         run_tests: bool = True, if true, run tests on loaded data
         suppress_warnings: bool = False, if true, report only errors, not warnings
+        stage_in_schema: bool = True, if true (and <run_tests> is true), load and test data once,
+            in a staging schema of the live database, and publish it to the live tables if tests pass;
+            otherwise load and test data in a temporary database, then load it again into the live database
 
     Loads and archives each results file in each direct subfolder of the results_dir
     named in ./run_time.ini -- provided there the results file is specified in a *.ini file in the
@@ -4170,6 +4925,17 @@ def reload_juris_election(
     err = None
     dl = DataLoader(dbname=dbname, param_file=param_file)
 
+    if run_tests and stage_in_schema:
+        return stage_and_publish_juris_election(
+            dl,
+            juris_name,
+            election_name,
+            report_dir,
+            rollup=rollup,
+            move_files=move_files,
+            suppress_warnings=suppress_warnings,
+        )
+
     if run_tests:
         # create temp_db (preserving live db name) and point dataloader to it
         live_db = dl.session.bind.url.database
@@ -4254,6 +5020,89 @@ def reload_juris_election(
     return err
 
 
+def stage_and_publish_juris_election(
+    dl: DataLoader,
+    juris_name: str,
+    election_name: str,
+    report_dir,
+    rollup: bool = False,
+    move_files: bool = True,
+    suppress_warnings: bool = False,
+) -> Optional[dict]:
+    """
+    required inputs:
+        dl: DataLoader, connected to the live database
+        juris_name: str, name of jurisdiction (without hyphens, e.g., 'District of Columbia')
+        election_name: str, name of election (without hyphens, e.g., '2020 General')
+        report_dir, path to directory for reporting errors, warnings and test results
+    optional inputs:
+        rollup: bool = False, if true, rolls up results within the to the major subdivision
+        move_files: bool = True, if true, move all files to archive directory if loading, testing
+            and publishing are successful
+        suppress_warnings: bool = False, if true, report only errors, not warnings
+
+    Loads the jurisdiction files and results files for the election-jurisdiction pair into a
+    staging schema (with the live records of the jurisdiction, but no vote counts) and tests the
+    results there.
+    If all files load and all tests pass, replaces any existing data for the pair in the live tables
+    with the contents of the staging schema. The staging schema is dropped in any case.
+
+    returns:
+        Optional[dict], error dictionary
+    """
+    err = None
+    ts = datetime.datetime.now().strftime("%m%d_%H%M%S")
+    schema = f"{constants.staging_schema_prefix}_{ts}"
+    juris_id = db.name_to_id(dl.session, "ReportingUnit", juris_name)
+    err_str = db.create_staging_schema(dl.session, schema, juris_id)
+    if err_str:
+        return ui.add_new_error(
+            err, "database", f"{dl.session.bind.url.database}", err_str
+        )
+
+    # load all data into the staging schema
+    new_err = dl.change_schema(schema)
+    err = ui.consolidate_errors([err, new_err])
+    if not ui.fatal_error(new_err):
+        success, failure, all_tests_passed, load_err = dl.load_all(
+            report_dir=report_dir,
+            move_files=False,
+            rollup=rollup,
+            election_jurisdiction_list=[(election_name, juris_name)],
+            suppress_warnings=suppress_warnings,
+        )
+        err = ui.consolidate_errors([err, load_err])
+        download_date = db.latest_download_date(dl.session)
+
+        # publish to live tables if all data loaded and all tests passed
+        new_err = dl.change_schema(None)
+        err = ui.consolidate_errors([err, new_err])
+        loaded = not (failure or ui.fatal_error(load_err) or ui.fatal_error(new_err))
+        if loaded and not all_tests_passed.get(f"{election_name};{juris_name}"):
+            print(
+                f"{juris_name} {election_name}: No old data removed and no new data loaded because of failed tests."
+            )
+        elif loaded:
+            err_str = db.publish_staging_schema(dl.session, schema)
+            if err_str:
+                err = ui.add_new_error(
+                    err, "database", f"{dl.session.bind.url.database}", err_str
+                )
+            elif move_files:
+                new_err = dl.archive_results(
+                    jm.system_name_from_true_name(juris_name), download_date
+                )
+                err = ui.consolidate_errors([err, new_err])
+
+    # cleanup staging schema
+    err_str = db.drop_staging_schema(dl.session, schema)
+    if err_str:
+        err = ui.add_new_error(
+            err, "warn-database", f"{dl.session.bind.url.database}", err_str
+        )
+    return err
+
+
 def datafile_info(
     connection,
     ini_filename: str,
@@ -1,6 +1,7 @@
 import os.path
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 import psycopg2
 import pandas as pd
 import inspect
@@ -12,9 +13,11 @@ from electiondata import (
 )
 import datetime
 import os
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from pathlib import Path
-import scipy.spatial.distance as dist
 from scipy import stats
 import json
 
@@ -57,78 +60,76 @@ def export_rollup(
     If no <datafile_list> is given, return all results for the given election.
     """
 
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    if not datafile_list:
-        datafile_list, e = db.data_file_list_cursor(cursor, election_id, by="Id")
-        if e:
-            return e
-        by = "Id"
-        if len(datafile_list) == 0:
-            return f"No datafiles found for Election_Id {election_id}"
-    # set exclude_redundant_total
-    vote_type_list, err_str = db.vote_type_list(cursor, datafile_list, by=by)
-    if err_str:
-        return err_str
-    elif len(vote_type_list) == 0:
-        return f"No vote types found for datafiles with {by} in {datafile_list} "
+    with db.borrowed_cursor(session) as (connection, cursor):
+        if not datafile_list:
+            datafile_list, e = db.data_file_list_cursor(cursor, election_id, by="Id")
+            if e:
+                return e
+            by = "Id"
+            if len(datafile_list) == 0:
+                return f"No datafiles found for Election_Id {election_id}"
+        # set exclude_redundant_total
+        vote_type_list, err_str = db.vote_type_list(cursor, datafile_list, by=by)
+        if err_str:
+            return err_str
+        elif len(vote_type_list) == 0:
+            return f"No vote types found for datafiles with {by} in {datafile_list} "
+
+        if len(vote_type_list) > 1 and "total" in vote_type_list:
+            exclude_redundant_total = True
+        else:
+            exclude_redundant_total = False
 
-    if len(vote_type_list) > 1 and "total" in vote_type_list:
-        exclude_redundant_total = True
-    else:
-        exclude_redundant_total = False
+        # get names from ids (and sub_rutype othertext if appropriate)
+        top_ru = db.name_from_id(session, "ReportingUnit", jurisdiction_id)
+        election = db.name_from_id(session, "Election", election_id)
 
-    # get names from ids (and sub_rutype othertext if appropriate)
-    top_ru = db.name_from_id_cursor(cursor, "ReportingUnit", jurisdiction_id)
-    election = db.name_from_id_cursor(cursor, "Election", election_id)
+        # create path to export directory
+        leaf_dir = os.path.join(target_dir, election, top_ru, f"by_{sub_rutype}")
+        Path(leaf_dir).mkdir(parents=True, exist_ok=True)
 
-    # create path to export directory
-    leaf_dir = os.path.join(target_dir, election, top_ru, f"by_{sub_rutype}")
-    Path(leaf_dir).mkdir(parents=True, exist_ok=True)
+        # prepare inventory
+        inventory_file = os.path.join(target_dir, "inventory.txt")
+        inv_exists = os.path.isfile(inventory_file)
+        if inv_exists:
+            inv_df = pd.read_csv(inventory_file, sep="\t")
+        else:
+            inv_df = pd.DataFrame()
+        inventory = {
+            "Election": election,
+            "ReportingUnitType": sub_rutype,
+            "source_db_url": cursor.connection.dsn,
+            "timestamp": datetime.date.today(),
+        }
+
+        for contest_type in ["BallotMeasure", "Candidate"]:
+            # export data
+            rollup_file = f"{cursor.connection.info.dbname}_{contest_type}_results.txt"
+            while os.path.isfile(os.path.join(leaf_dir, rollup_file)):
+                rollup_file = input(
+                    f"There is already a file called {rollup_file}. Pick another name.\n"
+                )
 
-    # prepare inventory
-    inventory_file = os.path.join(target_dir, "inventory.txt")
-    inv_exists = os.path.isfile(inventory_file)
-    if inv_exists:
-        inv_df = pd.read_csv(inventory_file, sep="\t")
-    else:
-        inv_df = pd.DataFrame()
-    inventory = {
-        "Election": election,
-        "ReportingUnitType": sub_rutype,
-        "source_db_url": cursor.connection.dsn,
-        "timestamp": datetime.date.today(),
-    }
-
-    for contest_type in ["BallotMeasure", "Candidate"]:
-        # export data
-        rollup_file = f"{cursor.connection.info.dbname}_{contest_type}_results.txt"
-        while os.path.isfile(os.path.join(leaf_dir, rollup_file)):
-            rollup_file = input(
-                f"There is already a file called {rollup_file}. Pick another name.\n"
+            df, err_str = db.export_rollup_from_db(
+                session,
+                top_ru=top_ru,
+                election=election,
+                sub_unit_type=sub_rutype,
+                contest_type=contest_type,
+                datafile_list=datafile_list,
+                by=by,
+                exclude_redundant_total=exclude_redundant_total,
+                by_vote_type=by_vote_type,
             )
-
-        df, err_str = db.export_rollup_from_db(
-            session,
-            top_ru=top_ru,
-            election=election,
-            sub_unit_type=sub_rutype,
-            contest_type=contest_type,
-            datafile_list=datafile_list,
-            by=by,
-            exclude_redundant_total=exclude_redundant_total,
-            by_vote_type=by_vote_type,
-        )
-        if not err_str:
-            # create record for inventory.txt
-            inv_df = inv_df.append(inventory, ignore_index=True).fillna("")
-            err_str = None
-            df.to_csv(os.path.join(leaf_dir, rollup_file), index=False, sep="\t")
-
-    # export to inventory file
-    inv_df.to_csv(inventory_file, index=False, sep="\t")
-    cursor.close()
-    return err_str
+            if not err_str:
+                # create record for inventory.txt
+                inv_df = inv_df.append(inventory, ignore_index=True).fillna("")
+                err_str = None
+                df.to_csv(os.path.join(leaf_dir, rollup_file), index=False, sep="\t")
+
+        # export to inventory file
+        inv_df.to_csv(inventory_file, index=False, sep="\t")
+        return err_str
 
 
 def create_scatter(
@@ -146,117 +147,111 @@ def create_scatter(
     v_type,
     v_runoff,
 ) -> Optional[dict]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-
-    # get the mappings back to the DB labels
-    h_count = ui.get_contest_type_mapping(h_count)
-    v_count = ui.get_contest_type_mapping(v_count)
-
-    dfh = get_data_for_scatter(
-        session,
-        jurisdiction_id,
-        subdivision_type,
-        h_election_id,
-        h_category,
-        h_count,
-        h_type,
-        h_runoff,
-    )
-    dfv = get_data_for_scatter(
-        session,
-        jurisdiction_id,
-        subdivision_type,
-        v_election_id,
-        v_category,
-        v_count,
-        v_type,
-        v_runoff,
-    )
-    if dfh.empty or dfv.empty:
-        connection.close()
-        return None
-
-    unsummed = pd.concat([dfh, dfv])
-    jurisdiction = db.name_from_id_cursor(cursor, "ReportingUnit", jurisdiction_id)
-
-    # check if there is only 1 candidate selection (with multiple count types)
-    single_selection = len(unsummed["Selection"].unique()) == 1
-    # check if there is only one count type
-    single_count_type = len(unsummed["CountItemType"].unique()) == 1
-
-    if (h_runoff or v_runoff) and single_selection:
-        pivot_col = "Contest"
-    elif single_selection and not single_count_type:
-        pivot_col = "CountItemType"
-    elif single_selection and single_count_type:
-        pivot_col = "Election_Id"
-    else:  # no runoffs, not single_selection
-        pivot_col = "Selection"
-    pivot_df = pd.pivot_table(
-        unsummed, values="Count", index=["Name"], columns=pivot_col, aggfunc=np.sum
-    ).reset_index()
-    pivot_df = pivot_df.dropna()
-    pivot_df.columns = pivot_df.columns.map(str)
-    if pivot_df.empty:
-        connection.close()
-        return None
+    with db.borrowed_cursor(session) as (connection, cursor):
+        # get the mappings back to the DB labels
+        h_count = ui.get_contest_type_mapping(h_count)
+        v_count = ui.get_contest_type_mapping(v_count)
 
-    # package up results
-    if (h_runoff or v_runoff) and single_selection:
-        cols = list(pivot_df.columns)
-        results = package_results(pivot_df, jurisdiction, cols[-2], cols[-1])
-        results["x"] = cols[-2]
-        results["y"] = cols[-1]
-    elif single_selection and not single_count_type:
-        results = package_results(pivot_df, jurisdiction, h_category, v_category)
-        results["x"] = h_count
-        results["y"] = v_count
-    elif single_selection and single_count_type:
-        results = package_results(
-            pivot_df, jurisdiction, str(h_election_id), str(v_election_id)
+        dfh = get_data_for_scatter(
+            session,
+            jurisdiction_id,
+            subdivision_type,
+            h_election_id,
+            h_category,
+            h_count,
+            h_type,
+            h_runoff,
         )
-        results["x"] = h_count
-        results["y"] = v_count
-    else:  # neither is runoff; not single_selection
-        results = package_results(pivot_df, jurisdiction, h_count, v_count)
-    results["x-election"] = db.name_from_id_cursor(cursor, "Election", h_election_id)
-    results["y-election"] = db.name_from_id_cursor(cursor, "Election", v_election_id)
-    results["subdivision_type"] = subdivision_type
-    results["x-count_item_type"] = h_category
-    results["y-count_item_type"] = v_category
-    results["x-title"] = scatter_axis_title(
-        cursor,
-        results["x"],
-        results["x-election"],
-        dfh.iloc[0]["Contest"],
-        jurisdiction_id,
-    )
-    results["y-title"] = scatter_axis_title(
-        cursor,
-        results["y"],
-        results["y-election"],
-        dfv.iloc[0]["Contest"],
-        jurisdiction_id,
-    )
-    h_preliminary = db.is_preliminary(cursor, h_election_id, jurisdiction_id)
-    v_preliminary = db.is_preliminary(cursor, v_election_id, jurisdiction_id)
-    results["preliminary"] = h_preliminary or v_preliminary
-
-    # only keep the ones where there are an (x, y) to graph
-    to_keep = []
-    for result in results["counts"]:
-        # need reporting unit, x, y, and x_ y_ pcts
-        # otherwise it's invalid
-        if len(result) == 5:
-            to_keep.append(result)
-    if not to_keep:
-        connection.close()
-        return None
+        dfv = get_data_for_scatter(
+            session,
+            jurisdiction_id,
+            subdivision_type,
+            v_election_id,
+            v_category,
+            v_count,
+            v_type,
+            v_runoff,
+        )
+        if dfh.empty or dfv.empty:
+            return None
+
+        unsummed = pd.concat([dfh, dfv])
+        jurisdiction = db.name_from_id(session, "ReportingUnit", jurisdiction_id)
+
+        # check if there is only 1 candidate selection (with multiple count types)
+        single_selection = len(unsummed["Selection"].unique()) == 1
+        # check if there is only one count type
+        single_count_type = len(unsummed["CountItemType"].unique()) == 1
+
+        if (h_runoff or v_runoff) and single_selection:
+            pivot_col = "Contest"
+        elif single_selection and not single_count_type:
+            pivot_col = "CountItemType"
+        elif single_selection and single_count_type:
+            pivot_col = "Election_Id"
+        else:  # no runoffs, not single_selection
+            pivot_col = "Selection"
+        pivot_df = pd.pivot_table(
+            unsummed, values="Count", index=["Name"], columns=pivot_col, aggfunc=np.sum
+        ).reset_index()
+        pivot_df = pivot_df.dropna()
+        pivot_df.columns = pivot_df.columns.map(str)
+        if pivot_df.empty:
+            return None
+
+        # package up results
+        if (h_runoff or v_runoff) and single_selection:
+            cols = list(pivot_df.columns)
+            results = package_results(pivot_df, jurisdiction, cols[-2], cols[-1])
+            results["x"] = cols[-2]
+            results["y"] = cols[-1]
+        elif single_selection and not single_count_type:
+            results = package_results(pivot_df, jurisdiction, h_category, v_category)
+            results["x"] = h_count
+            results["y"] = v_count
+        elif single_selection and single_count_type:
+            results = package_results(
+                pivot_df, jurisdiction, str(h_election_id), str(v_election_id)
+            )
+            results["x"] = h_count
+            results["y"] = v_count
+        else:  # neither is runoff; not single_selection
+            results = package_results(pivot_df, jurisdiction, h_count, v_count)
+        results["x-election"] = db.name_from_id(session, "Election", h_election_id)
+        results["y-election"] = db.name_from_id(session, "Election", v_election_id)
+        results["subdivision_type"] = subdivision_type
+        results["x-count_item_type"] = h_category
+        results["y-count_item_type"] = v_category
+        results["x-title"] = scatter_axis_title(
+            cursor,
+            results["x"],
+            results["x-election"],
+            dfh.iloc[0]["Contest"],
+            jurisdiction_id,
+        )
+        results["y-title"] = scatter_axis_title(
+            cursor,
+            results["y"],
+            results["y-election"],
+            dfv.iloc[0]["Contest"],
+            jurisdiction_id,
+        )
+        h_preliminary = db.is_preliminary(cursor, h_election_id, jurisdiction_id)
+        v_preliminary = db.is_preliminary(cursor, v_election_id, jurisdiction_id)
+        results["preliminary"] = h_preliminary or v_preliminary
 
-    results["counts"] = to_keep
-    connection.close()
-    return results
+        # only keep the ones where there are an (x, y) to graph
+        to_keep = []
+        for result in results["counts"]:
+            # need reporting unit, x, y, and x_ y_ pcts
+            # otherwise it's invalid
+            if len(result) == 5:
+                to_keep.append(result)
+        if not to_keep:
+            return None
+
+        results["counts"] = to_keep
+        return results
 
 
 def package_results(data, jurisdiction, x, y, restrict=None) -> dict:
@@ -323,18 +318,16 @@ def get_external_data(
     subdivision_type,
 ):
     # get the census data
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    census_df = db.read_external(
-        cursor,
-        election_id,
-        jurisdiction_id,
-        ["Name", "Category", "Label", "Value", "Source"],
-        restrict_by_label=label,
-        restrict_by_category=category,
-        subdivision_type=subdivision_type,
-    )
-    cursor.close()
+    with db.borrowed_cursor(session) as (connection, cursor):
+        census_df = db.read_external(
+            cursor,
+            election_id,
+            jurisdiction_id,
+            ["Name", "Category", "Label", "Value", "Source"],
+            restrict_by_label=label,
+            restrict_by_category=category,
+            subdivision_type=subdivision_type,
+        )
 
     # reshape data so it can be unioned with other results
     if not census_df.empty:
@@ -433,10 +426,7 @@ def get_votecount_data(
         unsummed["Contest"] = filter_str
 
     if count_type == "contests" and not keep_all:
-        connection = session.bind.raw_connection()
-        cursor = connection.cursor()
         unsummed["Selection"] = filter_str
-        cursor.close()
 
     columns = list(unsummed.drop(columns="Count").columns)
     unsummed = unsummed.groupby(columns)["Count"].sum().reset_index()
@@ -452,6 +442,7 @@ def create_bar(
     contest_district_type: Optional[str] = None,
     contest_or_contest_group: Optional[str] = None,
     for_export: bool = True,
+    workers: int = 1,
 ) -> Optional[List[dict]]:
     """
     Required inputs:
@@ -464,6 +455,7 @@ def create_bar(
         contest_or_contest_group: Optional[str] = None, from user-facing menu, either the name of a contest or of a
             group of contests, e.g., "All congressional"
         for_export: bool = True,
+        workers: int = 1, number of worker processes for scoring (see assign_anomaly_score)
 
     Returns:
         List[dict], list of dictionaries, where each dictionary contains information to create a bar
@@ -472,26 +464,177 @@ def create_bar(
             # TODO document algorithm details in assign_anomaly_score(unsummed)
             Bar charts are restricted to results for the <contest_or_contest_group> , if given,and also
             from the contests with districts of type <contest_district_type>, if given
+    Scores are read from the anomaly-score store, and are recomputed (and stored) only if
+    the election-jurisdiction pair's datafiles have changed, or its jurisdiction files have been loaded,
+    since they were stored
     """
-    # connect to db via psycopg2
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-
-    unsummed = db.unsummed_vote_counts_with_rollup_subdivision_id(
-        session, election_id, jurisdiction_id, subdivision_type
-    )
+    # score (or read stored scores) before borrowing a connection for labeling the charts,
+    # so that no more than one connection is in use at a time
+    try:
+        votes_at_stake, err_str = stored_anomaly_scores(
+            session, election_id, jurisdiction_id, subdivision_type, workers=workers
+        )
+    except (psycopg2.Error, SQLAlchemyError, ValueError, KeyError) as exc:
+        print(f"Unable to read or compute anomaly scores: {exc}")
+        return None
+    if err_str:
+        print(err_str)
 
     if contest_district_type:
         contest_district_type = ui.get_contest_type_mapping(contest_district_type)
-        unsummed = unsummed[unsummed["contest_district_type"] == contest_district_type]
+        votes_at_stake = votes_at_stake[
+            votes_at_stake["contest_district_type"] == contest_district_type
+        ]
 
     # through VoteVisualizer front end, contest_type must be truthy if contest is truthy
     # Only filter when there is an actual contest passed through, as opposed to
     # "All congressional" as an example
     if contest_or_contest_group and not contest_or_contest_group.startswith("All "):
-        unsummed = unsummed[unsummed["Contest"] == contest_or_contest_group]
+        votes_at_stake = votes_at_stake[
+            votes_at_stake["Contest"] == contest_or_contest_group
+        ]
+    if votes_at_stake.empty:
+        return None
+
+    multiple_ballot_types = len(votes_at_stake["CountItemType"].unique()) > 1
+    if not for_export:
+        top_ranked = get_most_anomalous(votes_at_stake, 3)
+    else:
+        top_ranked = votes_at_stake
+    if top_ranked.empty:
+        return None
+
+    # connect to db via psycopg2
+    with db.borrowed_cursor(session) as (connection, cursor):
+        # package into list of dictionary
+        result_list = []
+        ids = top_ranked["unit_id"].unique()
+        for idx in ids:
+            temp_df = top_ranked[top_ranked["unit_id"] == idx]
+            # some cleaning here to make the pivoting work
+            scores_df = temp_df[temp_df["rank"] != 1]
+            scores_df = scores_df[["ReportingUnit_Id", "score", "margins_pct"]]
+            scores_df.rename(
+                columns={
+                    "score": "max_score",
+                    "margins_pct": "max_margins_pct",
+                },
+                inplace=True,
+            )
+            temp_df = temp_df.merge(scores_df, how="left", on="ReportingUnit_Id")
+            temp_df.drop(columns=["score", "margins_pct"], inplace=True)
+            temp_df.rename(
+                columns={
+                    "max_score": "score",
+                    "max_margins_pct": "margins_pct",
+                },
+                inplace=True,
+            )
+
+            candidates = temp_df["Candidate_Id"].unique()
+            x = db.name_from_id_cursor(cursor, "Candidate", int(candidates[0]))
+            y = db.name_from_id_cursor(cursor, "Candidate", int(candidates[1]))
+            x_party = temp_df.loc[
+                temp_df["Candidate_Id"] == candidates[0], "Party"
+            ].iloc[0]
+            x_party_abbr = create_party_abbreviation(x_party)
+            y_party = temp_df.loc[
+                temp_df["Candidate_Id"] == candidates[1], "Party"
+            ].iloc[0]
+            y_party_abbr = create_party_abbreviation(y_party)
+            jurisdiction = db.name_from_id_cursor(
+                cursor, "ReportingUnit", jurisdiction_id
+            )
+
+            pivot_df = pd.pivot_table(
+                temp_df,
+                values="Count",
+                index=["Name"],
+                columns="Selection",
+                fill_value=0,
+            ).reset_index()
+            score_df = temp_df.groupby("Name")[
+                ["score", "margins_pct", "margin_ratio"]
+            ].mean()
+            pivot_df = pivot_df.merge(score_df, how="inner", on="Name")
+            pivot_df = sort_pivot_by_margins(pivot_df)
+
+            if for_export:
+                results = package_results(pivot_df, jurisdiction, x, y)
+            else:
+                results = package_results(pivot_df, jurisdiction, x, y, restrict=8)
+            results["election"] = db.name_from_id_cursor(
+                cursor, "Election", election_id
+            )
+            results["contest"] = db.name_from_id_cursor(
+                cursor, "Contest", int(temp_df.iloc[0]["Contest_Id"])
+            )
+            results["subdivision_type"] = subdivision_type
+            results["count_item_type"] = temp_df.iloc[0]["CountItemType"]
+
+            # display votes at stake, margin info
+            results["votes_at_stake_raw"] = temp_df.iloc[0]["votes_at_stake"]
+            results["margin_raw"] = (
+                temp_df[temp_df["rank"] == 1].iloc[0]["ind_total"]
+                - temp_df[temp_df["rank"] != 1].iloc[0]["ind_total"]
+            )
+            votes_at_stake = human_readable_numbers(results["votes_at_stake_raw"])
+            if votes_at_stake[0] == "-":
+                votes_at_stake = votes_at_stake[1:]
+                acted = "narrowed"
+            else:
+                acted = "widened"
+            results["votes_at_stake"] = f"Outlier {acted} margin by ~ {votes_at_stake}"
+            results["margin"] = human_readable_numbers(results["margin_raw"])
+            results["preliminary"] = db.is_preliminary(
+                cursor, election_id, jurisdiction_id
+            )
 
-    multiple_ballot_types = len(unsummed["CountItemType"].unique()) > 1
+            # display ballot info
+            if multiple_ballot_types:
+                results[
+                    "ballot_types"
+                ] = f"""{results["jurisdiction"]} provides data by vote type"""
+            else:
+                results["ballot_types"] = "Data by vote type unavailable"
+
+            # display name with party
+            results["x"] = f"""{results["x"]} ({x_party_abbr})"""
+            results["y"] = f"""{results["y"]} ({y_party_abbr})"""
+
+            results["score"] = temp_df["score"].max()
+            results[
+                "title"
+            ] = f"""{results["count_item_type"].replace("-", " ").title()} Ballots Reported"""
+            download_date = db.data_file_download(cursor, election_id, jurisdiction_id)
+            if (
+                db.is_preliminary(cursor, election_id, jurisdiction_id)
+                and download_date
+            ):
+                results[
+                    "title"
+                ] = f"""{results["title"]} as of {download_date} (preliminary)"""
+
+            result_list.append(results)
+        return result_list
+
+
+def score_vote_counts(
+    session: Session,
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+    workers: int = 1,
+) -> (pd.DataFrame, Optional[str]):
+    """Scores the candidate vote counts of the election-jurisdiction pair, rolled up to subdivisions
+    of type <subdivision_type>, for outliers (see assign_anomaly_score) and calculates the votes at stake
+    (see calculate_votes_at_stake). Returns a dataframe with the columns
+    db.anomaly_score_columns, and error string listing any units that could not be scored"""
+    unsummed = db.unsummed_vote_counts_with_rollup_subdivision_id(
+        session, election_id, jurisdiction_id, subdivision_type
+    )
+    if unsummed.empty:
+        return pd.DataFrame(columns=db.anomaly_score_columns.keys()), None
     groupby_cols = [
         "ReportingUnitType",
         "ParentName",
@@ -509,130 +652,74 @@ def create_bar(
     unsummed = unsummed.groupby(groupby_cols).sum().reset_index()
 
     # Now process data - this is the heart of the scoring/ranking algorithm
-    try:
-        ranked = assign_anomaly_score(unsummed)
-        ranked["margins_pct"] = ranked["Count"] / ranked["reporting_unit_total"]
-        ranked_margin = ranked
-        votes_at_stake = calculate_votes_at_stake(ranked_margin)
-        if not for_export:
-            top_ranked = get_most_anomalous(votes_at_stake, 3)
-        else:
-            top_ranked = votes_at_stake
-    except Exception:
-        connection.close()
-        return None
-    if top_ranked.empty:
-        connection.close()
-        return None
-
-    # package into list of dictionary
-    result_list = []
-    ids = top_ranked["unit_id"].unique()
-    for idx in ids:
-        temp_df = top_ranked[top_ranked["unit_id"] == idx]
-        # some cleaning here to make the pivoting work
-        scores_df = temp_df[temp_df["rank"] != 1]
-        scores_df = scores_df[["ReportingUnit_Id", "score", "margins_pct"]]
-        scores_df.rename(
-            columns={
-                "score": "max_score",
-                "margins_pct": "max_margins_pct",
-            },
-            inplace=True,
-        )
-        temp_df = temp_df.merge(scores_df, how="left", on="ReportingUnit_Id")
-        temp_df.drop(columns=["score", "margins_pct"], inplace=True)
-        temp_df.rename(
-            columns={
-                "max_score": "score",
-                "max_margins_pct": "margins_pct",
-            },
-            inplace=True,
-        )
+    ranked = assign_anomaly_score(unsummed, workers=workers)
+    if ranked.empty:
+        return pd.DataFrame(columns=db.anomaly_score_columns.keys()), None
+    ranked["margins_pct"] = ranked["Count"] / ranked["reporting_unit_total"]
+    votes_at_stake, err_str = calculate_votes_at_stake(ranked)
 
-        candidates = temp_df["Candidate_Id"].unique()
-        x = db.name_from_id_cursor(cursor, "Candidate", int(candidates[0]))
-        y = db.name_from_id_cursor(cursor, "Candidate", int(candidates[1]))
-        x_party = unsummed.loc[unsummed["Candidate_Id"] == candidates[0], "Party"].iloc[
-            0
-        ]
-        x_party_abbr = create_party_abbreviation(x_party)
-        y_party = unsummed.loc[unsummed["Candidate_Id"] == candidates[1], "Party"].iloc[
-            0
-        ]
-        y_party_abbr = create_party_abbreviation(y_party)
-        jurisdiction = db.name_from_id_cursor(cursor, "ReportingUnit", jurisdiction_id)
+    # party of each candidate, for labeling charts
+    party = unsummed[["Candidate_Id", "Party"]].drop_duplicates("Candidate_Id")
+    votes_at_stake = votes_at_stake.merge(party, how="left", on="Candidate_Id")
+    return votes_at_stake[list(db.anomaly_score_columns.keys())], err_str
 
-        pivot_df = pd.pivot_table(
-            temp_df, values="Count", index=["Name"], columns="Selection", fill_value=0
-        ).reset_index()
-        score_df = temp_df.groupby("Name")[
-            ["score", "margins_pct", "margin_ratio"]
-        ].mean()
-        pivot_df = pivot_df.merge(score_df, how="inner", on="Name")
-        pivot_df = sort_pivot_by_margins(pivot_df)
-
-        if for_export:
-            results = package_results(pivot_df, jurisdiction, x, y)
-        else:
-            results = package_results(pivot_df, jurisdiction, x, y, restrict=8)
-        results["election"] = db.name_from_id_cursor(cursor, "Election", election_id)
-        results["contest"] = db.name_from_id_cursor(
-            cursor, "Contest", int(temp_df.iloc[0]["Contest_Id"])
-        )
-        results["subdivision_type"] = subdivision_type
-        results["count_item_type"] = temp_df.iloc[0]["CountItemType"]
 
-        # display votes at stake, margin info
-        results["votes_at_stake_raw"] = temp_df.iloc[0]["votes_at_stake"]
-        results["margin_raw"] = (
-            temp_df[temp_df["rank"] == 1].iloc[0]["ind_total"]
-            - temp_df[temp_df["rank"] != 1].iloc[0]["ind_total"]
-        )
-        votes_at_stake = human_readable_numbers(results["votes_at_stake_raw"])
-        if votes_at_stake[0] == "-":
-            votes_at_stake = votes_at_stake[1:]
-            acted = "narrowed"
-        else:
-            acted = "widened"
-        results["votes_at_stake"] = f"Outlier {acted} margin by ~ {votes_at_stake}"
-        results["margin"] = human_readable_numbers(results["margin_raw"])
-        results["preliminary"] = db.is_preliminary(cursor, election_id, jurisdiction_id)
+def refresh_anomaly_scores(
+    session: Session,
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+    workers: int = 1,
+) -> (Optional[pd.DataFrame], Optional[str]):
+    """If no anomaly scores of the election-jurisdiction pair (for subdivisions of type
+    <subdivision_type>) are stored, or they are out of date (see db.anomaly_score_signatures),
+    scores the pair's vote counts (see score_vote_counts) and stores the result.
+    Returns the newly-scored vote counts (None if the stored scores were current), and
+    error string from storing them, if any. Units that could not be scored are printed"""
+    signature, stored_signature = db.anomaly_score_signatures(
+        session, election_id, jurisdiction_id, subdivision_type
+    )
+    if signature == stored_signature:
+        return None, None
+    scored, err_str = score_vote_counts(
+        session, election_id, jurisdiction_id, subdivision_type, workers=workers
+    )
+    if err_str:
+        print(err_str)
+    err_str = db.write_anomaly_scores(
+        session, election_id, jurisdiction_id, subdivision_type, signature, scored
+    )
+    return scored, err_str
 
-        # display ballot info
-        if multiple_ballot_types:
-            results[
-                "ballot_types"
-            ] = f"""{results["jurisdiction"]} provides data by vote type"""
-        else:
-            results["ballot_types"] = "Data by vote type unavailable"
-
-        # display name with party
-        results["x"] = f"""{results["x"]} ({x_party_abbr})"""
-        results["y"] = f"""{results["y"]} ({y_party_abbr})"""
-
-        results["score"] = temp_df["score"].max()
-        results[
-            "title"
-        ] = f"""{results["count_item_type"].replace("-", " ").title()} Ballots Reported"""
-        download_date = db.data_file_download(cursor, election_id, jurisdiction_id)
-        if db.is_preliminary(cursor, election_id, jurisdiction_id) and download_date:
-            results[
-                "title"
-            ] = f"""{results["title"]} as of {download_date} (preliminary)"""
 
-        result_list.append(results)
-    connection.close()
-    return result_list
+def stored_anomaly_scores(
+    session: Session,
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+    workers: int = 1,
+) -> (pd.DataFrame, Optional[str]):
+    """Returns the scored vote counts of the election-jurisdiction pair (for subdivisions of type
+    <subdivision_type>) from the anomaly-score store, refreshing the store first if necessary
+    (see refresh_anomaly_scores), and error string, if any"""
+    scored, err_str = refresh_anomaly_scores(
+        session, election_id, jurisdiction_id, subdivision_type, workers=workers
+    )
+    if scored is None:
+        scored = db.read_anomaly_scores(
+            session, election_id, jurisdiction_id, subdivision_type
+        )
+    return scored, err_str
 
 
-def assign_anomaly_score(data: pd.DataFrame) -> pd.DataFrame:
+def assign_anomaly_score(data: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
     """adds a new column called score between 0 and 1; 1 is more anomalous.
     Also adds a `unit_id` column which assigns a score to each unit of analysis
     that is considered. For example, we may decide to look at anomalies across each
     distinct combination of contest, reporting unit type, and vote type. Each
     combination of those would get assigned an ID. This means rows may get added
-    to the dataframe if needed."""
+    to the dataframe if needed.
+    If <workers> > 1, units are scored in that many worker processes (see zscores_by_pair)"""
 
     # Assign a ranking for each candidate by votes for each contest
     if "total" not in data["CountItemType"].unique():
@@ -705,60 +792,98 @@ def assign_anomaly_score(data: pd.DataFrame) -> pd.DataFrame:
         df_unit, how="left", on=["Contest_Id", "ReportingUnitType", "CountItemType"]
     )
 
-    # loop through each unit ID and assign anomaly scores
-    # also update the "real" unit_id which takes into account pairing of candidates
-    unit_ids_tmp = df_with_units["unit_id_tmp"].unique()
-    unit_id = 0
-    df = pd.DataFrame()
-    # for each unit ID
-    for unit_id_tmp in unit_ids_tmp:
-        # grab all the data there
-        temp_df = df_with_units[df_with_units["unit_id_tmp"] == unit_id_tmp]
-        for i in range(2, int(temp_df["rank"].max()) + 1):
-            selection_df = temp_df[temp_df["rank"].isin([1, i])].copy()
-            selection_df["unit_id"] = unit_id
-            unit_id += 1
-            total = (
-                selection_df.groupby("ReportingUnit_Id")["Count"].sum().reset_index()
-            )
-            total.rename(columns={"Count": "reporting_unit_total"}, inplace=True)
-            selection_df = selection_df.merge(total, how="inner", on="ReportingUnit_Id")
-            if selection_df.shape[0] >= 12 and len(selection_df["rank"].unique()) > 1:
-                pivot_df = (
-                    pd.pivot_table(
-                        selection_df,
-                        values="Count",
-                        index=["ReportingUnit_Id", "reporting_unit_total"],
-                        columns="Selection",
-                    )
-                    .sort_values("ReportingUnit_Id")
-                    .reset_index()
-                )
-                pivot_df = pivot_df[pivot_df["reporting_unit_total"] > 0]
-                pivot_df_values = pivot_df.drop(
-                    columns=["ReportingUnit_Id", "reporting_unit_total"]
-                )
-                to_drop = [
-                    selection_df[selection_df["rank"] == 1]["Selection"].unique()[0],
-                    selection_df[selection_df["rank"] == i]["Selection"].unique()[0],
-                ]
-                # pass in proportions instead of raw vlaues
-                vote_proportions = pivot_df_values.div(
-                    pivot_df["reporting_unit_total"], axis=0
-                )
-                np.nan_to_num(vote_proportions, copy=False)
-                # assign z score and then add back into final DF
-                scored = euclidean_zscore(vote_proportions.to_numpy())
-                pivot_df["score"] = scored
-                pivot_df = pivot_df[["ReportingUnit_Id", to_drop[1], "score"]]
-                pivot_df["Selection"] = to_drop[1]
-                pivot_df.rename(columns={to_drop[1]: "Count"}, inplace=True)
-                scored_df = selection_df.merge(
-                    pivot_df, how="left", on=["ReportingUnit_Id", "Selection", "Count"]
-                )
-                df = pd.concat([df, scored_df])
-    if "score" in df.columns:
-        df["score"] = df["score"].fillna(0)
+    # pair the leader (rank 1) with each other rank i in each unit. Pairs are numbered (unit_id)
+    # in order of unit and then of rank, counting pairs that end up too small to score
+    df_with_units["row_order"] = np.arange(df_with_units.shape[0])
+    pair_count = (
+        df_with_units.groupby("unit_id_tmp")["rank"].max().astype(int) - 1
+    ).clip(lower=0)
+    first_unit_id = pair_count.cumsum() - pair_count
+    # # each leader row belongs to every pair in its unit
+    leaders = df_with_units[df_with_units["rank"] == 1]
+    leaders = leaders.loc[
+        leaders.index.repeat(pair_count.loc[leaders["unit_id_tmp"]].to_numpy())
+    ]
+    leaders["unit_id"] = (
+        first_unit_id.loc[leaders["unit_id_tmp"]].to_numpy()
+        + leaders.groupby(level=0).cumcount().to_numpy()
+    )
+    # # each other row belongs to the pair for its rank
+    challengers = df_with_units[df_with_units["rank"] != 1].copy()
+    challengers["unit_id"] = first_unit_id.loc[
+        challengers["unit_id_tmp"]
+    ].to_numpy() + (challengers["rank"].astype(int).to_numpy() - 2)
+    selection_df = pd.concat([leaders, challengers])
+    by_unit = selection_df.groupby(["unit_id", "ReportingUnit_Id"])
+    selection_df["reporting_unit_total"] = by_unit["Count"].transform("sum")
+    # # within each pair, rows of each reporting unit together, reporting units in order
+    # # of first appearance (the order of the merge with the reporting unit totals)
+    selection_df["ru_order"] = by_unit["row_order"].transform("min")
+    selection_df = (
+        selection_df.sort_values(["unit_id", "ru_order", "row_order"], kind="stable")
+        .drop(columns=["row_order", "ru_order"])
+        .reset_index(drop=True)
+    )
+
+    # keep pairs with enough data to score
+    by_pair = selection_df.groupby("unit_id")
+    enough = (by_pair["Count"].size() >= 12) & (by_pair["rank"].nunique() > 1)
+    selection_df = selection_df[
+        enough.loc[selection_df["unit_id"]].to_numpy()
+    ].reset_index(drop=True)
+    if selection_df.empty:
+        return pd.DataFrame()
+
+    # vote counts for each selection in each reporting unit of each pair
+    # (averaged if a selection has more than one row in a reporting unit)
+    pair_counts = (
+        selection_df.groupby(
+            ["unit_id", "ReportingUnit_Id", "reporting_unit_total", "Selection"]
+        )["Count"]
+        .mean()
+        .reset_index()
+    )
+    pair_counts = pair_counts[pair_counts["reporting_unit_total"] > 0]
+    # # number the selections within each pair, and pass in proportions instead of raw values
+    selection_number = pair_counts.groupby(["unit_id", "Selection"]).ngroup()
+    pair_counts["selection_number"] = selection_number - selection_number.groupby(
+        pair_counts["unit_id"]
+    ).transform("min")
+    pair_counts["proportion"] = (
+        pair_counts["Count"] / pair_counts["reporting_unit_total"]
+    )
+    proportions = pair_counts.pivot_table(
+        values="proportion",
+        index=["unit_id", "ReportingUnit_Id"],
+        columns="selection_number",
+    )
+    vectors = np.nan_to_num(proportions.to_numpy())
+
+    # assign z score to each reporting unit, relative to the other reporting units of its pair
+    pair_ids = proportions.index.get_level_values("unit_id").to_numpy()
+    boundaries = np.flatnonzero(np.diff(pair_ids)) + 1
+    starts = np.concatenate([[0], boundaries])
+    stops = np.concatenate([boundaries, [pair_ids.size]])
+    scores = zscores_by_pair(vectors, starts, stops, workers=workers)
+    scores = pd.Series(scores, index=proportions.index, name="score")
+
+    # the score belongs to the row of the challenger (first selection of rank i) in each reporting unit
+    challenger = (
+        selection_df[selection_df["rank"] != 1].groupby("unit_id")["Selection"].first()
+    )
+    challenger_counts = pair_counts[
+        pair_counts["Selection"].to_numpy()
+        == challenger.loc[pair_counts["unit_id"]].to_numpy()
+    ]
+    scored = challenger_counts[
+        ["unit_id", "ReportingUnit_Id", "Selection", "Count"]
+    ].merge(scores.reset_index(), how="inner", on=["unit_id", "ReportingUnit_Id"])
+    df = selection_df.merge(
+        scored, how="left", on=["unit_id", "ReportingUnit_Id", "Selection", "Count"]
+    )
+    # index rows within each pair, as when pairs were scored one at a time
+    df.index = df.groupby("unit_id").cumcount().to_numpy()
+    df["score"] = df["score"].fillna(0)
     return df
 
 
@@ -824,100 +949,330 @@ def get_most_anomalous(data: pd.DataFrame, n: int) -> pd.DataFrame:
 def euclidean_zscore(li: List[List[float]]) -> List[float]:
     """Take a list of vectors -- all in the same R^k,
     returns a list of the z-scores of the vectors -- each relative to the ensemble"""
-    distance_list = [sum([dist.euclidean(item, y) for y in li]) for item in li]
-    if len(set(distance_list)) == 1:
-        # if all distances are the same, which yields z-score nan values
-        return [0] * len(li)
+    distance_list = euclidean_distance_sums(li)
+    if distance_list.size == 0:
+        return list()
+    spread = np.ptp(distance_list)
+    if spread <= constants.distance_rtol * np.abs(distance_list).max():
+        # if all distances are the same (up to rounding), which yields z-score nan values
+        return [0] * len(distance_list)
     else:
         return list(stats.zscore(distance_list))
 
 
-def calculate_votes_at_stake(data: pd.DataFrame) -> pd.DataFrame:
-    """Move the most anomalous pairing to the equivalent of the second-most anomalous
-    and calculate the differences in votes that would be returned"""
-    df = pd.DataFrame()
-    unit_ids = data["unit_id"].unique()
-    for unit_id in unit_ids:
-        temp_df = data[data["unit_id"] == unit_id].copy()
-        try:
-            # get a df of the most anomalous pairing
-            max_score = temp_df["score"].max()
-            index = temp_df.index[temp_df["score"] == max_score][0]
-            reporting_unit_id = temp_df.loc[index, "ReportingUnit_Id"]
-            selection = temp_df.loc[index, "Selection"]
-            margin_pct = temp_df.loc[index, "margins_pct"]
-            reporting_unit_total = temp_df.loc[index, "reporting_unit_total"]
-            anomalous_df = (
-                temp_df[
-                    (temp_df["ReportingUnit_Id"] == reporting_unit_id)
-                    & (
-                        (temp_df["score"] == max_score)
-                        | (temp_df["rank"] == 1)
-                        & (temp_df["reporting_unit_total"] == reporting_unit_total)
-                    )
-                ]
-                .sort_values("rank", ascending=False)
-                .drop_duplicates()
-            )
+def zscores_by_pair(
+    vectors: np.ndarray, starts: np.ndarray, stops: np.ndarray, workers: int = 1
+) -> np.ndarray:
+    """Returns array of the z-scores (see euclidean_zscore) of the rows of <vectors>, each relative
+    to the other rows of its pair, where the rows of the k-th pair are <starts>[k]:<stops>[k].
+    If <workers> > 1 and there is enough work, pairs are scored in that many worker processes,
+    which read <vectors> from and write scores to shared memory, so that no data is pickled.
+    Scores do not depend on the number of workers. Worker processes are started fresh rather than
+    forked, so scripts using workers should be guarded by `if __name__ == "__main__":`"""
+    vectors = np.ascontiguousarray(vectors, dtype=float)
+    scores = np.zeros(vectors.shape[0])
+    # work to score a pair grows with the square of its number of rows
+    costs = (stops - starts).astype(float) ** 2
+    if (
+        workers <= 1
+        or len(starts) < 2
+        or costs.sum() < constants.min_parallel_scoring_cost
+    ):
+        for start, stop in zip(starts, stops):
+            scores[start:stop] = euclidean_zscore(vectors[start:stop])
+        return scores
+
+    # split pairs into batches of consecutive pairs with about the same work
+    batch_count = workers * constants.scoring_batches_per_worker
+    work_before = np.cumsum(costs) - costs
+    batch = np.minimum(
+        (work_before * batch_count / costs.sum()).astype(int), batch_count - 1
+    )
+    batches = np.split(np.arange(len(starts)), np.flatnonzero(np.diff(batch)) + 1)
 
-            # Identify the next closest RU in terms of margins
-            filtered_df = temp_df[
-                (temp_df["ReportingUnit_Id"] != reporting_unit_id)
-                & (temp_df["Selection"] == selection)
+    vectors_shm = shared_memory.SharedMemory(create=True, size=vectors.nbytes)
+    scores_shm = shared_memory.SharedMemory(create=True, size=scores.nbytes)
+    try:
+        shared_vectors = np.ndarray(vectors.shape, dtype=float, buffer=vectors_shm.buf)
+        shared_vectors[:] = vectors
+        del shared_vectors
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = [
+                pool.submit(
+                    score_pairs_in_shared_memory,
+                    vectors_shm.name,
+                    vectors.shape,
+                    scores_shm.name,
+                    starts[b],
+                    stops[b],
+                )
+                for b in batches
             ]
-            # this finds the closest margin on either side (+/-)
-            next_index = filtered_df.iloc[
-                (filtered_df["margins_pct"] - margin_pct).abs().argsort()[:1]
-            ].index[0]
-            next_reporting_unit_id = temp_df.loc[next_index, "ReportingUnit_Id"]
-            next_margin_pct = temp_df.loc[next_index, "margins_pct"]
-            next_reporting_unit_total = temp_df.loc[next_index, "reporting_unit_total"]
-            next_anomalous_df = (
-                temp_df[
-                    (temp_df["ReportingUnit_Id"] == next_reporting_unit_id)
-                    & (
-                        (temp_df["margins_pct"] == next_margin_pct)
-                        | (temp_df["rank"] == 1)
-                        & (temp_df["reporting_unit_total"] == next_reporting_unit_total)
-                    )
-                ]
-                .sort_values("rank", ascending=False)
-                .drop_duplicates()
-            )
-
-            # move the most anomalous to the closest and calculate what the
-            # change to the Contest margin would be
-            winner_bucket_total = int(anomalous_df[anomalous_df["rank"] == 1]["Count"])
-            not_winner_bucket_total = int(
-                anomalous_df[anomalous_df["rank"] != 1]["Count"]
-            )
-            reported_bucket_total = int(anomalous_df["Count"].sum())
-            next_bucket_total = int(next_anomalous_df["Count"].sum())
-            adj_margin = (
-                next_anomalous_df[next_anomalous_df["rank"] != 1].iloc[0]["Count"]
-                / next_bucket_total
-            )
-            not_winner_adj_bucket_total = int(reported_bucket_total * adj_margin)
-            winner_adj_bucket_total = (
-                reported_bucket_total - not_winner_adj_bucket_total
-            )
+            for future in futures:
+                future.result()
+        scores[:] = np.ndarray(scores.shape, dtype=float, buffer=scores_shm.buf)
+    finally:
+        vectors_shm.close()
+        vectors_shm.unlink()
+        scores_shm.close()
+        scores_shm.unlink()
+    return scores
+
+
+def score_pairs_in_shared_memory(
+    vectors_name: str,
+    shape: Tuple[int, int],
+    scores_name: str,
+    starts: np.ndarray,
+    stops: np.ndarray,
+):
+    """Scores the pairs of rows <starts>[k]:<stops>[k] of the vectors in the shared memory block
+    named <vectors_name> (an array of floats of shape <shape>), writing the scores to the
+    shared memory block named <scores_name> (see zscores_by_pair)"""
+    vectors_shm = shared_memory.SharedMemory(name=vectors_name)
+    scores_shm = shared_memory.SharedMemory(name=scores_name)
+    try:
+        vectors = np.ndarray(shape, dtype=float, buffer=vectors_shm.buf)
+        scores = np.ndarray(shape[0], dtype=float, buffer=scores_shm.buf)
+        for start, stop in zip(starts, stops):
+            scores[start:stop] = euclidean_zscore(vectors[start:stop])
+        del vectors, scores
+    finally:
+        vectors_shm.close()
+        scores_shm.close()
+    return
+
+
+def euclidean_distance_sums(
+    li: List[List[float]], tile_elements: int = constants.distance_tile_elements
+) -> np.ndarray:
+    """Take a list of vectors -- all in the same R^k,
+    returns array of the sums of the euclidean distances from each vector to all the vectors.
+    Squared distances come from the Gram matrix, |x|^2 + |y|^2 - 2 x.y, computed for a tile of
+    rows at a time, so that at most <tile_elements> distances are held in memory"""
+    vectors = np.asarray(li, dtype=float)
+    n = vectors.shape[0]
+    sums = np.zeros(n)
+    if n == 0:
+        return sums
+    vectors = vectors.reshape(n, -1)
+    # center the vectors (which leaves distances unchanged) to limit cancellation
+    vectors = vectors - vectors.mean(axis=0)
+    squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+    tile_rows = max(1, tile_elements // n)
+    for start in range(0, n, tile_rows):
+        stop = min(start + tile_rows, n)
+        squared = (-2 * vectors[start:stop]) @ vectors.T
+        squared += squared_norms[start:stop, np.newaxis]
+        squared += squared_norms[np.newaxis, :]
+        np.maximum(squared, 0, out=squared)
+        # distance from each vector to itself is exactly zero
+        squared[np.arange(stop - start), np.arange(start, stop)] = 0
+        np.sqrt(squared, out=squared)
+        sums[start:stop] = squared.sum(axis=1)
+    return sums
+
+
+def calculate_votes_at_stake(data: pd.DataFrame) -> (pd.DataFrame, Optional[str]):
+    """Move the most anomalous pairing to the equivalent of the second-most anomalous
+    and calculate the differences in votes that would be returned.
+    For each unit_id, the most anomalous row is the first with the unit's highest score, and
+    the equivalent is the row for the same selection, in another reporting unit, whose margin is
+    nearest (on either side), chosen as the argsort of the margin differences chose it when
+    some margins are NaN (e.g., for reporting units with no votes); all units are computed
+    at once, finding the nearest margin by a binary search in the sorted margins of each unit.
+    Returns dataframe with columns votes_at_stake and margin_ratio added (0 for any unit
+    that cannot be scored) and a string listing the units that cannot be scored, if any"""
+    if data.empty:
+        return pd.DataFrame(), None
+    # keep units in order of first appearance
+    unit_code, unit_ids = pd.factorize(data["unit_id"])
+    df = data.iloc[np.argsort(unit_code, kind="stable")]
+    unit_code = np.sort(unit_code, kind="stable")
+    n_units = unit_ids.size
+    # reason each unit cannot be scored (empty if it can be)
+    reason = np.full(n_units, "", dtype=object)
+
+    ru = df["ReportingUnit_Id"].to_numpy()
+    selection = df["Selection"].to_numpy()
+    rank = df["rank"].to_numpy()
+    count = df["Count"].to_numpy()
+    margin = df["margins_pct"].to_numpy(dtype=float)
+    score = df["score"].to_numpy(dtype=float)
+    # identical rows count once in any bucket
+    distinct = ~df.duplicated().to_numpy()
+
+    # most anomalous row of each unit: first row with the unit's highest score
+    max_score = np.full(n_units, -np.inf)
+    np.maximum.at(max_score, unit_code, score)
+    is_max = score == max_score[unit_code]
+    first_row = first_row_by_unit(is_max, unit_code, n_units)
+    reason[first_row < 0] = "no scored row"
+    first_row[first_row < 0] = 0
+    anomalous_ru = ru[first_row]
+    anomalous_selection = selection[first_row]
+    anomalous_margin = margin[first_row]
+
+    # the anomalous bucket: most anomalous row, plus the leader in its reporting unit
+    in_ru = ru == anomalous_ru[unit_code]
+    bucket = in_ru & (is_max | (rank == 1)) & distinct
+    is_leader = bucket & (rank == 1)
+    is_other = bucket & (rank != 1)
+    leader_rows = np.bincount(unit_code[is_leader], minlength=n_units)
+    other_rows = np.bincount(unit_code[is_other], minlength=n_units)
+    reason[(leader_rows != 1) & (reason == "")] = "leader not unique in bucket"
+    reason[(other_rows != 1) & (reason == "")] = "challenger not unique in bucket"
+    winner_bucket_total = np.bincount(
+        unit_code[is_leader], weights=count[is_leader], minlength=n_units
+    )
+    not_winner_bucket_total = np.bincount(
+        unit_code[is_other], weights=count[is_other], minlength=n_units
+    )
+    reported_bucket_total = winner_bucket_total + not_winner_bucket_total
+    ind_total = df["ind_total"].to_numpy(dtype=float)
+    contest_margin_ttl = np.bincount(
+        unit_code[is_leader], weights=ind_total[is_leader], minlength=n_units
+    ) - np.bincount(unit_code[is_other], weights=ind_total[is_other], minlength=n_units)
+
+    # closest row (by margin) for the same selection in another reporting unit.
+    # # Ported from argsort of the absolute differences, which (in pandas 1.x) gives -1 for
+    # # each NaN and positions within the non-NaN values otherwise, so that
+    # # the first entry picks the last candidate if the first difference is NaN, and otherwise
+    # # the candidate at the position the nearest margin has among the non-NaN margins
+    candidate = (selection == anomalous_selection[unit_code]) & ~in_ru
+    all_candidate_rows = np.flatnonzero(candidate)
+    candidate_start = np.searchsorted(
+        unit_code[all_candidate_rows], np.arange(n_units), side="left"
+    )
+    candidate_stop = np.searchsorted(
+        unit_code[all_candidate_rows], np.arange(n_units), side="right"
+    )
+    has_candidate = candidate_stop > candidate_start
+    # # (pad with row 0, so that units without candidates index some row)
+    all_candidate_rows = np.append(all_candidate_rows, 0)
+    first_candidate = all_candidate_rows[candidate_start]
+    last_candidate = all_candidate_rows[np.maximum(candidate_stop - 1, 0)]
+    first_difference_nan = np.isnan(margin[first_candidate]) | np.isnan(
+        anomalous_margin
+    )
 
-            # calculate margins by raw numbers for the bucket
-            contest_margin = winner_bucket_total - not_winner_bucket_total
-            adj_contest_margin = winner_adj_bucket_total - not_winner_adj_bucket_total
+    valid = candidate & ~np.isnan(margin)
+    candidate_rows = np.flatnonzero(valid)
+    # # sort candidates by unit, then margin, then row; search for each unit's anomalous margin
+    margin_values = np.unique(margin[candidate_rows])
+    width = margin_values.size + 1
+    keys = unit_code[candidate_rows] * width + np.searchsorted(
+        margin_values, margin[candidate_rows]
+    )
+    order = np.lexsort((candidate_rows, keys))
+    keys = keys[order]
+    candidate_rows = candidate_rows[order]
+    target = np.arange(n_units) * width + np.searchsorted(
+        margin_values, anomalous_margin
+    )
+    # # (pad with a key beyond all units, so that every search lands on some key)
+    keys = np.append(keys, n_units * width)
+    candidate_rows = np.append(candidate_rows, 0)
+    above = np.searchsorted(keys, target, side="left")
+    has_above = keys[above] // width == np.arange(n_units)
+    has_below = (above > 0) & (
+        keys[np.maximum(above - 1, 0)] // width == np.arange(n_units)
+    )
+    # # first row with the margin just below the anomalous margin
+    below = np.searchsorted(keys, keys[np.maximum(above - 1, 0)], side="left")
+    above_row = candidate_rows[above]
+    below_row = candidate_rows[below]
+    with np.errstate(invalid="ignore"):
+        above_distance = np.where(
+            has_above, margin[above_row] - anomalous_margin, np.inf
+        )
+        below_distance = np.where(
+            has_below, anomalous_margin - margin[below_row], np.inf
+        )
+    use_below = (below_distance < above_distance) | (
+        (below_distance == above_distance) & (below_row < above_row)
+    )
+    nearest_row = np.where(use_below, below_row, above_row)
+    # # position of the nearest row among the unit's non-NaN candidates,
+    # # used as a position among all the unit's candidates
+    valid_before = np.cumsum(valid) - valid
+    nearest_position = valid_before[nearest_row] - valid_before[first_candidate]
+    next_row = all_candidate_rows[
+        np.minimum(candidate_start + nearest_position, candidate_stop)
+    ]
+    next_row = np.where(first_difference_nan, last_candidate, next_row)
+    reason[~has_candidate & (reason == "")] = "no comparable reporting unit"
+    next_row[~has_candidate] = 0
+    next_ru = ru[next_row]
+    next_margin = margin[next_row]
+
+    # the comparable bucket: rows with the same margin, plus the leader, in the closest reporting unit
+    next_bucket = (
+        (ru == next_ru[unit_code])
+        & ((margin == next_margin[unit_code]) | (rank == 1))
+        & distinct
+    )
+    next_bucket_total = np.bincount(
+        unit_code[next_bucket], weights=count[next_bucket], minlength=n_units
+    )
+    # # first challenger row in the comparable bucket
+    next_other_row = first_row_by_unit(next_bucket & (rank != 1), unit_code, n_units)
+    next_other_count = np.where(
+        next_other_row >= 0, count[np.maximum(next_other_row, 0)], np.nan
+    )
+    reason[
+        np.isnan(next_other_count) & (reason == "")
+    ] = "no challenger in comparable bucket"
+    reason[(next_bucket_total == 0) & (reason == "")] = "no votes in comparable bucket"
+
+    # move the most anomalous to the closest and calculate what the
+    # change to the Contest margin would be
+    scorable = reason == ""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        adj_margin = next_other_count / next_bucket_total
+        not_winner_adj_bucket_total = np.trunc(reported_bucket_total * adj_margin)
+    not_winner_adj_bucket_total[~scorable] = 0
+    winner_adj_bucket_total = reported_bucket_total - not_winner_adj_bucket_total
+
+    # calculate margins by raw numbers for the bucket
+    contest_margin = winner_bucket_total - not_winner_bucket_total
+    adj_contest_margin = winner_adj_bucket_total - not_winner_adj_bucket_total
+    votes_at_stake = np.where(scorable, contest_margin - adj_contest_margin, 0).astype(
+        np.int64
+    )
+    # calculate margins by raw numbers for the entire contest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin_ratio = np.where(
+            scorable, votes_at_stake / np.where(scorable, contest_margin_ttl, 1), 0
+        )
 
-            # calculate margins by raw numbers for the entire contest
-            contest_margin_ttl = (
-                anomalous_df[anomalous_df["rank"] == 1].iloc[0]["ind_total"]
-                - anomalous_df[anomalous_df["rank"] != 1].iloc[0]["ind_total"]
-            )
-            temp_df["votes_at_stake"] = contest_margin - adj_contest_margin
-            temp_df["margin_ratio"] = temp_df["votes_at_stake"] / contest_margin_ttl
-        except Exception:
-            temp_df["margin_ratio"] = 0
-            temp_df["votes_at_stake"] = 0
-        df = pd.concat([df, temp_df])
-    return df
+    df = df.assign(
+        votes_at_stake=votes_at_stake[unit_code], margin_ratio=margin_ratio[unit_code]
+    )
+    err_str = None
+    if not scorable.all():
+        unscorable = [
+            f"unit_id {unit_ids[k]}: {reason[k]}" for k in np.flatnonzero(~scorable)
+        ]
+        err_str = "Votes at stake could not be calculated for:\n" + "\n".join(
+            unscorable
+        )
+    return df, err_str
+
+
+def first_row_by_unit(
+    mask: np.ndarray, unit_code: np.ndarray, n_units: int
+) -> np.ndarray:
+    """Returns array with, for each of the <n_units> units, the position of the first row
+    where <mask> is true among the rows of the unit (unit of each row given by <unit_code>),
+    or -1 if there is none"""
+    rows = np.flatnonzero(mask)
+    first = np.full(n_units, np.iinfo(np.int64).max)
+    np.minimum.at(first, unit_code[rows], rows)
+    first[first == np.iinfo(np.int64).max] = -1
+    return first
 
 
 def create_candidate_contests(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
@@ -166,6 +166,55 @@ if 1:
     }
     contest_types_model = contest_type_mappings.keys()
 
+# database connections
+if 1:
+    # bounds for the connection pool shared by all database helpers
+    db_pool_size = 10
+    db_max_overflow = 10
+    # smallest connection pool for each worker process when loading in parallel
+    min_worker_pool_size = 2
+    # seconds to wait for a connection from a full pool before raising an error
+    db_pool_timeout = 60
+    # rows encoded per chunk when streaming dataframes to the database via COPY
+    copy_chunk_rows = 100000
+    # characters requested by psycopg2 per read during COPY
+    copy_read_size = 2**16
+    # rows per dataframe when streaming query results from a server-side cursor
+    stream_chunk_rows = 100000
+    # rows per batch when streaming rows parsed from a results file (e.g., xml)
+    read_chunk_rows = 100000
+    # bytes read at a time when computing the digest of a file
+    digest_read_size = 2**20
+    # on-disk cache of standard count frames (see ui.frame_cache_key);
+    # increment frame_cache_version whenever the frames produced for a given file and munger change
+    frame_cache_version = 1
+    # suffixes of the files storing cached frames, by format. "pickle" is for use only when pyarrow
+    # is unavailable and no one else can write to the cache directory
+    frame_cache_suffixes = {"parquet": ".frame.parquet", "pickle": ".frame.pkl"}
+    default_frame_cache_format = "parquet"
+    frame_cache_max_bytes = 2**30
+    # characters read at a time when tokenizing a json results file
+    json_read_size = 2**16
+    # json tokens: whitespace, and scalars other than strings
+    json_whitespace_pattern = re.compile(r"[ \t\n\r]*")
+    json_scalar_pattern = re.compile(
+        r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null|NaN|-?Infinity"
+    )
+    # most pairwise distances held in memory at once when scoring anomalies (see an.euclidean_distance_sums)
+    distance_tile_elements = 2**20
+    # relative spread below which distance sums are considered equal (and z-scores set to 0)
+    distance_rtol = 1e-9
+    # least total work (sum over pairs of squared numbers of reporting units) worth
+    # starting worker processes for when scoring anomalies, and batches of pairs per worker
+    min_parallel_scoring_cost = 2 * 10**8
+    scoring_batches_per_worker = 4
+    # prefix for names of schemas in which data is loaded and tested before publication
+    staging_schema_prefix = "staging"
+    # tables with at most this many rows are cached in memory for looking up Ids
+    max_rows_for_cached_lookup = 200000
+    # COPY's marker for null values (text format)
+    copy_null = "\\N"
+
 # encodings
 if 1:
     default_encoding = "utf_8"
@@ -476,6 +525,12 @@ if 1:
     ]
     optional_mdl_pars = [
         "unloaded_dir",
+        "db_pool_size",
+        "db_max_overflow",
+        "partition_vote_count",
+        "flat_text_chunk_rows",
+        "cache_dir",
+        "cache_format",
     ]
     req_for_combined_file_loading = [
         "results_file",
@@ -530,7 +585,31 @@ if 1:
         "merged_cells": "string",
         "max_blocks": "integer",
         "constant_over_file": "list-of-strings",
+        "chunk_rows": "integer",
     }
+    # munger parameters on which the reading of a results file depends
+    # (mungers that agree on all of them can share a single reading of the file)
+    munger_read_parameters = [
+        "file_type",
+        "encoding",
+        "thousands_separator",
+        "flat_text_delimiter",
+        "all_rows",
+        "multi_block",
+        "merged_cells",
+        "rows_to_skip",
+        "count_location",
+        "count_field_name_row",
+        "count_header_row_numbers",
+        "noncount_header_row",
+        "rows_with_constants",
+        "sheets_to_read_names",
+        "sheets_to_read_numbers",
+        "sheets_to_skip_names",
+        "namespace",
+    ]
+    # file types whose reading also depends on the munge formulas
+    formula_dependent_file_types = ["xml", "json-nested"]
     munger_dependent_reqs: Dict[str, Dict[str, List[str]]] = {
         "file_type": {
             "flat_text": ["flat_text_delimiter", "count_location"],
@@ -595,9 +674,13 @@ if 1:
         "warn-test",
     ]
     regex_failure_string = " <- Does not match regular expression"
+    # column numbering distinct combinations of non-count values during munging
+    distinct_key_column = "_distinct_key"
 # regex patterns
 if 1:
     brace_pattern = re.compile(r"{<([^,]*)>,([^{}]*|[^{}]*{[^{}]*}[^{}]*)}")
+    # run of whitespace characters (compressed to the first)
+    whitespace_run_pattern = re.compile(r"(\s)\s+")
     pandas_default_pattern = r"^Unnamed: (\d+)_level_(\d+)$"
 
 # constants dictated by NIST
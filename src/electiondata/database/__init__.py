@@ -5,6 +5,7 @@ import psycopg2
 import sqlalchemy
 import sqlalchemy as sa
 import sqlalchemy.orm
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from sqlalchemy import (
     MetaData,
@@ -25,12 +26,18 @@ from sqlalchemy import (
 import io
 import csv
 import inspect
+import weakref
+import time
+import tracemalloc
+from contextlib import contextmanager
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 from pathlib import Path
-from psycopg2 import sql
+from psycopg2 import sql, errors as pg_errors
 import datetime
 from configparser import MissingSectionHeaderError
 import pandas as pd
+import numpy as np
+from pandas.api.types import is_numeric_dtype
 
 from electiondata import munge as m, analyze as an, constants, userinterface as ui
 import re
@@ -38,13 +45,98 @@ import os
 
 # sqlalchemy imports below are necessary, even if syntax-checker doesn't think so!
 
-from typing import Optional, List, Dict, Any, Set
+from typing import Optional, List, Dict, Any, Set, Iterator, Tuple, Union
 
 
 # these form the universe of jurisdictions that can be displayed via the display_jurisdictions function.
 
 db_pars = ["host", "port", "dbname", "user", "password"]
 
+# usage counters for the connection pool of each engine created by sql_alchemy_connect
+pool_counters = weakref.WeakKeyDictionary()
+
+# elements whose name <-> Id correspondences are cached in memory, per engine.
+# Contest caches also serve lookups of CandidateContest and BallotMeasureContest
+name_id_cached_elements = [
+    "Election",
+    "ReportingUnit",
+    "Contest",
+    "Candidate",
+    "Party",
+    "Office",
+]
+contest_subtypes = {
+    "CandidateContest": "Candidate",
+    "BallotMeasureContest": "BallotMeasure",
+}
+# engine -> {element: (dictionary name->Id, dictionary Id->name)}
+name_id_caches = weakref.WeakKeyDictionary()
+# engine -> {(element, key columns): dataframe of Id and key columns, or None if table is too big}
+lookup_table_caches = weakref.WeakKeyDictionary()
+# engine -> {ReportingUnitType: (sorted array of descendant Ids, array of ancestor Ids)}
+ancestor_lookup_caches = weakref.WeakKeyDictionary()
+# transitive closure of the ReportingUnit hierarchy, maintained alongside ComposingReportingUnitJoin
+ru_closure_table = "_reporting_unit_closure"
+# VoteCount summed to every containing ReportingUnit, maintained per _datafile
+contest_total_table = "_contest_total"
+# datafiles whose contest totals are known to be current
+contest_total_datafile_table = "_contest_total_datafile"
+# scored vote counts of each election-jurisdiction pair (see analyze.score_vote_counts),
+# and the signature of the datafiles from which they were computed
+anomaly_score_table = "_anomaly_score"
+anomaly_score_source_table = "_anomaly_score_source"
+anomaly_score_columns = {
+    "unit_id": "integer",
+    "Contest_Id": "integer",
+    "Contest": "varchar",
+    "contest_type": "varchar",
+    "contest_district_type": "varchar",
+    "ReportingUnit_Id": "integer",
+    "Name": "varchar",
+    "ReportingUnitType": "varchar",
+    "CountItemType": "varchar",
+    "Candidate_Id": "integer",
+    "Selection": "varchar",
+    "Selection_Id": "integer",
+    "Party": "varchar",
+    "Count": "bigint",
+    "ind_total": "bigint",
+    "rank": "double precision",
+    "reporting_unit_total": "bigint",
+    "score": "double precision",
+    "margins_pct": "double precision",
+    "votes_at_stake": "bigint",
+    "margin_ratio": "double precision",
+}
+# tables whose records are not copied into a staging schema
+# (those for vote counts are loaded afresh; ExternalData is not needed for loading)
+staging_tables_not_copied = [
+    "VoteCount",
+    "_datafile",
+    contest_total_table,
+    contest_total_datafile_table,
+    anomaly_score_table,
+    anomaly_score_source_table,
+    "ExternalData",
+]
+# conditions selecting the records of a jurisdiction copied into a staging schema, in terms of
+# temporary tables of Ids: _staging_units (the jurisdiction's reporting units, its ancestors and
+# 'none or unknown'), _staging_contests (contests for offices in those units and ballot
+# measures in them) and _staging_selections (the standard ballot measure selections).
+# Tables not listed here (Election, Party, etc.) are small, and copied whole.
+staging_copy_conditions = {
+    "ReportingUnit": '"Id" IN (SELECT "Id" FROM _staging_units)',
+    "ComposingReportingUnitJoin": '"ChildReportingUnit_Id" IN (SELECT "Id" FROM _staging_units)',
+    ru_closure_table: '"Descendant_Id" IN (SELECT "Id" FROM _staging_units)',
+    "Office": '"ElectionDistrict_Id" IN (SELECT "Id" FROM _staging_units)',
+    "Contest": '"Id" IN (SELECT "Id" FROM _staging_contests)',
+    "CandidateContest": '"Id" IN (SELECT "Id" FROM _staging_contests)',
+    "BallotMeasureContest": '"Id" IN (SELECT "Id" FROM _staging_contests)',
+    "Candidate": '"Id" IN (SELECT "Candidate_Id" FROM _staging_selections)',
+    "Selection": '"Id" IN (SELECT "Id" FROM _staging_selections)',
+    "CandidateSelection": '"Id" IN (SELECT "Id" FROM _staging_selections)',
+}
+
 
 def get_database_names(con: psycopg2.extensions.connection):
     """Return dataframe with one column called `datname`"""
@@ -151,71 +243,6 @@ def restore_to_db(dbname: str, dump_file: str, url: sqlalchemy.engine.url.URL) -
     return err_str
 
 
-# TODO move to more appropriate module?
-def append_to_composing_reporting_unit_join(
-    engine: sqlalchemy.engine, ru: pd.DataFrame, error_type, error_name
-) -> Optional[dict]:
-    """<ru> is a dframe of reporting units, with cdf internal name in column 'Name'.
-    cdf internal name indicates nesting via semicolons `;`.
-    This routine calculates the nesting relationships from the Names and uploads to db.
-    Returns the *all* composing-reporting-unit-join data from the db.
-    By convention, a ReportingUnit is its own ancestor (ancestor_0).
-    NB: name Child/Parent is misleading. It's really Descendent/Ancestor"""
-    working = ru.copy()
-    err = None
-    if not working.empty:
-        working["split"] = working["Name"].apply(lambda x: x.split(";"))
-        working["length"] = working["split"].apply(len)
-
-        # pull ReportingUnit to get ids matched to names
-        ru_cdf = pd.read_sql_table("ReportingUnit", engine, index_col=None)
-        ru_static = working.copy()
-
-        # add db Id column to ru_static, if it's not already there
-        if "Id" not in working.columns:
-            ru_static = ru_static.merge(ru_cdf[["Name", "Id"]], on="Name", how="left")
-
-        # create a list of rows to append to the ComposingReportingUnitJoin element
-        cruj_dframe_list = []
-        for i in range(working["length"].max()):
-            # check that all components of all Reporting Units are themselves ReportingUnits
-            ru_for_cruj = (
-                ru_static.copy()
-            )  # start fresh, without detritus from previous i
-
-            # get name of ith ancestor
-            #  E.g., ancestor_0 is largest ancestor (i.e., shortest string, often the state);
-            #  ancestor_1 is the second-largest parent, etc.
-            ru_for_cruj[f"ancestor_{i}"] = ru_static["split"].apply(
-                lambda x: ";".join(x[: i + 1])
-            )
-            # get Id of ith ancestor
-            ru_for_cruj = ru_for_cruj.merge(
-                ru_cdf, left_on=f"ancestor_{i}", right_on="Name", suffixes=["", f"_{i}"]
-            )
-
-            # Add parent-child pair for ith ancestor.
-            cruj_dframe_list.append(
-                ru_for_cruj[["Id", f"Id_{i}"]].rename(
-                    columns={
-                        "Id": "ChildReportingUnit_Id",
-                        f"Id_{i}": "ParentReportingUnit_Id",
-                    }
-                )
-            )
-        if cruj_dframe_list:
-            cruj_dframe = pd.concat(cruj_dframe_list)
-            insert_err = insert_to_cdf_db(
-                engine,
-                cruj_dframe,
-                "ComposingReportingUnitJoin",
-                error_type,
-                error_name,
-            )
-            err = ui.consolidate_errors([err, insert_err])
-    return err
-
-
 def test_connection_and_tables(
     db_params: Optional[Dict[str, str]] = None,
     db_param_file: Optional[str] = None,
@@ -294,13 +321,18 @@ def test_connection_and_tables(
 
 
 def append_to_composing_reporting_unit_join(
-    engine: sqlalchemy.engine, ru: pd.DataFrame, error_type, error_name
+    engine: sqlalchemy.engine,
+    ru: pd.DataFrame,
+    error_type,
+    error_name,
+    cursor: Optional[psycopg2.extensions.cursor] = None,
 ) -> Optional[dict]:
     """<ru> is a dframe of reporting units, with cdf internal name in column 'Name'.
     cdf internal name indicates nesting via semicolons `;`.
-    This routine calculates the nesting relationships from the Names and uploads to db.
-    Returns the *all* composing-reporting-unit-join data from the db.
+    This routine calculates the nesting relationships from the Names and uploads to db,
+    both to ComposingReportingUnitJoin and to the closure table (with depth and ancestor type).
     By convention, a ReportingUnit is its own ancestor (ancestor_0).
+    If <cursor> is given, it is used (and committed) instead of a connection from the pool.
     NB: name Child/Parent is misleading. It's really Descendent/Ancestor"""
     working = ru.copy()
     err = None
@@ -309,7 +341,13 @@ def append_to_composing_reporting_unit_join(
         working["length"] = working["split"].apply(len)
 
         # pull ReportingUnit to get ids matched to names
-        ru_cdf = pd.read_sql_table("ReportingUnit", engine, index_col=None)
+        with borrowed_cursor(engine, cursor) as (connection, ru_cursor):
+            ru_cursor.execute(
+                'SELECT "Id", "Name", "ReportingUnitType" FROM "ReportingUnit"'
+            )
+            ru_cdf = pd.DataFrame(
+                ru_cursor.fetchall(), columns=["Id", "Name", "ReportingUnitType"]
+            )
         ru_static = working.copy()
 
         # add db Id column to ru_static, if it's not already there
@@ -318,21 +356,29 @@ def append_to_composing_reporting_unit_join(
 
         # create a list of rows to append to the ComposingReportingUnitJoin element
         cruj_dframe_list = []
+        closure_dframe_list = []
         for i in range(working["length"].max()):
             # check that all components of all Reporting Units are themselves ReportingUnits
-            ru_for_cruj = (
-                ru_static.copy()
-            )  # start fresh, without detritus from previous i
+            # start fresh, without detritus from previous i, and
+            # skip units with no ith ancestor (which would otherwise repeat the unit itself)
+            ru_for_cruj = ru_static[ru_static["length"] > i].copy()
 
             # get name of ith ancestor
             #  E.g., ancestor_0 is largest ancestor (i.e., shortest string, often the state);
             #  ancestor_1 is the second-largest parent, etc.
-            ru_for_cruj[f"ancestor_{i}"] = ru_static["split"].apply(
+            ru_for_cruj[f"ancestor_{i}"] = ru_for_cruj["split"].apply(
                 lambda x: ";".join(x[: i + 1])
             )
-            # get Id of ith ancestor
+            # get Id and type of ith ancestor
             ru_for_cruj = ru_for_cruj.merge(
-                ru_cdf, left_on=f"ancestor_{i}", right_on="Name", suffixes=["", f"_{i}"]
+                ru_cdf[["Name", "Id", "ReportingUnitType"]].rename(
+                    columns={
+                        "Name": f"ancestor_{i}",
+                        "Id": f"Id_{i}",
+                        "ReportingUnitType": f"ReportingUnitType_{i}",
+                    }
+                ),
+                on=f"ancestor_{i}",
             )
 
             # Add parent-child pair for ith ancestor.
@@ -344,6 +390,19 @@ def append_to_composing_reporting_unit_join(
                     }
                 )
             )
+            # Add closure record for ith ancestor
+            closure_dframe_list.append(
+                pd.DataFrame(
+                    {
+                        "Ancestor_Id": ru_for_cruj[f"Id_{i}"],
+                        "Descendant_Id": ru_for_cruj["Id"],
+                        "Depth": ru_for_cruj["length"] - (i + 1),
+                        "AncestorReportingUnitType": ru_for_cruj[
+                            f"ReportingUnitType_{i}"
+                        ],
+                    }
+                )
+            )
         if cruj_dframe_list:
             cruj_dframe = pd.concat(cruj_dframe_list)
             insert_err = insert_to_cdf_db(
@@ -352,18 +411,1108 @@ def append_to_composing_reporting_unit_join(
                 "ComposingReportingUnitJoin",
                 error_type,
                 error_name,
+                cursor=cursor,
             )
             err = ui.consolidate_errors([err, insert_err])
+            if not ui.fatal_error(insert_err):
+                err_str = append_to_reporting_unit_closure(
+                    engine, pd.concat(closure_dframe_list), cursor=cursor
+                )
+                if err_str:
+                    err = ui.add_new_error(err, error_type, error_name, err_str)
     return err
 
 
+def ensure_reporting_unit_closure(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    cursor: Optional[psycopg2.extensions.cursor] = None,
+) -> Optional[str]:
+    """Creates the closure table of the ReportingUnit hierarchy if it does not exist
+    (and the database has a ReportingUnit table), filling it from ComposingReportingUnitJoin
+    if it is empty. Uses (and commits) <cursor>, if given. Returns error string, if any"""
+    q_create = sql.SQL(
+        """CREATE TABLE IF NOT EXISTS {closure} (
+            "Ancestor_Id" integer NOT NULL REFERENCES "ReportingUnit"("Id"),
+            "Descendant_Id" integer NOT NULL REFERENCES "ReportingUnit"("Id"),
+            "Depth" integer NOT NULL,
+            "AncestorReportingUnitType" varchar,
+            PRIMARY KEY ("Descendant_Id", "Ancestor_Id")
+        );
+        CREATE INDEX IF NOT EXISTS {type_idx}
+            ON {closure} ("AncestorReportingUnitType", "Descendant_Id", "Ancestor_Id");
+        CREATE INDEX IF NOT EXISTS {ancestor_idx} ON {closure} ("Ancestor_Id", "Depth");
+        """
+    ).format(
+        closure=sql.Identifier(ru_closure_table),
+        type_idx=sql.Identifier(f"{ru_closure_table}_type_idx"),
+        ancestor_idx=sql.Identifier(f"{ru_closure_table}_ancestor_idx"),
+    )
+    q_empty = sql.SQL("SELECT NOT EXISTS (SELECT 1 FROM {closure})").format(
+        closure=sql.Identifier(ru_closure_table)
+    )
+    # depth is the difference in the number of components of the internal names
+    q_fill = sql.SQL(
+        """INSERT INTO {closure}
+            ("Ancestor_Id", "Descendant_Id", "Depth", "AncestorReportingUnitType")
+        SELECT DISTINCT cruj."ParentReportingUnit_Id", cruj."ChildReportingUnit_Id",
+            ARRAY_LENGTH(regexp_split_to_array(child."Name", ';'), 1)
+                - ARRAY_LENGTH(regexp_split_to_array(parent."Name", ';'), 1),
+            parent."ReportingUnitType"
+        FROM "ComposingReportingUnitJoin" cruj
+        JOIN "ReportingUnit" child ON cruj."ChildReportingUnit_Id" = child."Id"
+        JOIN "ReportingUnit" parent ON cruj."ParentReportingUnit_Id" = parent."Id"
+        ON CONFLICT DO NOTHING
+        """
+    ).format(closure=sql.Identifier(ru_closure_table))
+    err_str = None
+    with borrowed_cursor(bind, cursor) as (connection, cursor):
+        try:
+            if not table_exists(cursor, "ReportingUnit"):
+                # not (yet) a cdf database
+                return None
+            cursor.execute(q_create)
+            cursor.execute(q_empty)
+            if cursor.fetchone()[0]:
+                cursor.execute(q_fill)
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to create or fill {ru_closure_table}: {exc}"
+    invalidate_ancestor_lookups(bind)
+    return err_str
+
+
+def append_to_reporting_unit_closure(
+    engine: sqlalchemy.engine,
+    closure: pd.DataFrame,
+    cursor: Optional[psycopg2.extensions.cursor] = None,
+) -> Optional[str]:
+    """Adds records in <closure> (columns Ancestor_Id, Descendant_Id, Depth,
+    AncestorReportingUnitType) to the closure table, ignoring any already there.
+    Uses (and commits) <cursor>, if given. Returns error string, if any"""
+    columns = ["Ancestor_Id", "Descendant_Id", "Depth", "AncestorReportingUnitType"]
+    working = closure[columns].drop_duplicates(subset=["Ancestor_Id", "Descendant_Id"])
+    if working.empty:
+        return None
+    temp_table = table_named_to_avoid_conflict(engine, "__temp_closure")
+    fields = sql.SQL(",").join([sql.Identifier(c) for c in columns])
+    q_create = sql.SQL(
+        "CREATE TEMP TABLE {tt} ON COMMIT DROP AS SELECT {fields} FROM {closure} WITH NO DATA"
+    ).format(
+        tt=sql.Identifier(temp_table),
+        fields=fields,
+        closure=sql.Identifier(ru_closure_table),
+    )
+    q_copy = sql.SQL(
+        "COPY {tt} FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', NULL {null})"
+    ).format(tt=sql.Identifier(temp_table), null=sql.Literal(constants.copy_null))
+    q_insert = sql.SQL(
+        "INSERT INTO {closure} ({fields}) SELECT {fields} FROM {tt} ON CONFLICT DO NOTHING"
+    ).format(
+        closure=sql.Identifier(ru_closure_table),
+        fields=fields,
+        tt=sql.Identifier(temp_table),
+    )
+    err_str = ensure_reporting_unit_closure(engine, cursor)
+    if err_str:
+        return err_str
+    with borrowed_cursor(engine, cursor) as (connection, cursor):
+        try:
+            cursor.execute(q_create)
+            cursor.copy_expert(
+                q_copy, FrameCopyStream(working), size=constants.copy_read_size
+            )
+            cursor.execute(q_insert)
+            if cursor.rowcount > 0:
+                # new ancestors change the rollup of counts already loaded
+                mark_contest_totals_stale_cursor(cursor)
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to add records to {ru_closure_table}: {exc}"
+    invalidate_ancestor_lookups(engine)
+    return err_str
+
+
+def ancestor_lookup(
+    bind: Union[Session, sqlalchemy.engine.Engine], ancestor_type: str
+) -> (np.ndarray, np.ndarray):
+    """Returns sorted array of Ids of ReportingUnits with an ancestor of type <ancestor_type>,
+    and array of the corresponding ancestor Ids (nearest ancestor, if more than one).
+    By convention, a ReportingUnit of type <ancestor_type> is its own ancestor.
+    Arrays are cached in memory per engine."""
+    engine = get_engine(bind)
+    lookups = ancestor_lookup_caches.setdefault(engine, dict())
+    if ancestor_type in lookups.keys():
+        return lookups[ancestor_type]
+    q = sql.SQL(
+        """SELECT "Descendant_Id", "Ancestor_Id" FROM {closure}
+        WHERE "AncestorReportingUnitType" = %s
+        ORDER BY "Descendant_Id", "Depth"
+        """
+    ).format(closure=sql.Identifier(ru_closure_table))
+    with borrowed_cursor(engine) as (connection, cursor):
+        cursor.execute(q, [ancestor_type])
+        pairs = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+    # keep nearest ancestor (first listed) for each descendant
+    keep = np.ones(pairs.shape[0], dtype=bool)
+    keep[1:] = pairs[1:, 0] != pairs[:-1, 0]
+    lookups[ancestor_type] = (pairs[keep, 0], pairs[keep, 1])
+    return lookups[ancestor_type]
+
+
+def ancestor_ids(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    ru_ids: iter,
+    ancestor_type: str,
+) -> np.ndarray:
+    """Returns array with the Id of the ancestor of type <ancestor_type> of each
+    ReportingUnit in <ru_ids>, or -1 if there is none"""
+    descendants, ancestors = ancestor_lookup(bind, ancestor_type)
+    ru_ids = np.asarray(ru_ids, dtype=np.int64)
+    result = np.full(ru_ids.shape, -1, dtype=np.int64)
+    if descendants.size == 0:
+        return result
+    positions = np.searchsorted(descendants, ru_ids)
+    positions[positions == descendants.size] = 0
+    found = descendants[positions] == ru_ids
+    result[found] = ancestors[positions[found]]
+    return result
+
+
+def invalidate_ancestor_lookups(bind: Union[Session, sqlalchemy.engine.Engine]):
+    """Drops cached ancestor lookups for the engine of <bind>"""
+    ancestor_lookup_caches.pop(get_engine(bind), None)
+    return
+
+
+def ensure_contest_totals(
+    bind: Union[Session, sqlalchemy.engine.Engine]
+) -> Optional[str]:
+    """Creates the table of contest totals if it does not exist (and the closure table
+    of the ReportingUnit hierarchy does), and fills it from VoteCount for any datafiles
+    whose totals are not known to be current. Returns error string, if any"""
+    q_create = sql.SQL(
+        """CREATE TABLE {contest_total} (
+            "_datafile_Id" integer NOT NULL REFERENCES _datafile("Id") ON DELETE CASCADE,
+            "Election_Id" integer NOT NULL,
+            "Jurisdiction_Id" integer NOT NULL,
+            "ReportingUnit_Id" integer NOT NULL,
+            "ReportingUnitType" varchar,
+            "Contest_Id" integer NOT NULL,
+            "Selection_Id" integer NOT NULL,
+            "CountItemType" varchar NOT NULL,
+            "Count" bigint NOT NULL
+        );
+        CREATE INDEX {key_idx} ON {contest_total}
+            ("Election_Id", "Jurisdiction_Id", "ReportingUnitType", "Contest_Id");
+        CREATE INDEX {ru_idx} ON {contest_total} ("ReportingUnit_Id", "Election_Id");
+        CREATE INDEX {datafile_idx} ON {contest_total} ("_datafile_Id");
+        """
+    ).format(
+        contest_total=sql.Identifier(contest_total_table),
+        key_idx=sql.Identifier(f"{contest_total_table}_key_idx"),
+        ru_idx=sql.Identifier(f"{contest_total_table}_ru_idx"),
+        datafile_idx=sql.Identifier(f"{contest_total_table}_datafile_idx"),
+    )
+    q_create_current = sql.SQL(
+        """CREATE TABLE IF NOT EXISTS {current} (
+            "_datafile_Id" integer PRIMARY KEY REFERENCES _datafile("Id") ON DELETE CASCADE
+        )"""
+    ).format(current=sql.Identifier(contest_total_datafile_table))
+    q_stale = sql.SQL(
+        """SELECT d."Id" FROM _datafile d
+        WHERE NOT EXISTS (SELECT 1 FROM {current} c WHERE c."_datafile_Id" = d."Id")"""
+    ).format(current=sql.Identifier(contest_total_datafile_table))
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            if not table_exists(cursor, ru_closure_table):
+                return None
+            if not contest_totals_exist(cursor):
+                cursor.execute(q_create)
+            cursor.execute(q_create_current)
+            cursor.execute(q_stale)
+            stale = [datafile_id for (datafile_id,) in cursor.fetchall()]
+            if stale:
+                refresh_contest_totals_cursor(cursor, stale)
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to create or fill {contest_total_table}: {exc}"
+    return err_str
+
+
+def ensure_derived_tables(
+    bind: Union[Session, sqlalchemy.engine.Engine]
+) -> Optional[str]:
+    """Creates and fills (if necessary) the tables derived from the cdf tables:
+    the closure of the ReportingUnit hierarchy and the contest totals; creates
+    the (initially empty) anomaly-score store. Returns error string, if any"""
+    err_str_list = [
+        ensure_reporting_unit_closure(bind),
+        ensure_contest_totals(bind),
+        ensure_anomaly_scores(bind),
+    ]
+    err_str_list = [e for e in err_str_list if e]
+    if err_str_list:
+        return ";".join(err_str_list)
+    return None
+
+
+def derived_tables_exist(cursor: psycopg2.extensions.cursor) -> bool:
+    """Returns True if every table derived from the cdf tables (see ensure_derived_tables)
+    exists in the current schema"""
+    return all(
+        table_exists(cursor, t)
+        for t in [
+            ru_closure_table,
+            contest_total_table,
+            contest_total_datafile_table,
+            anomaly_score_table,
+            anomaly_score_source_table,
+        ]
+    )
+
+
+def add_derived_tables_if_missing(
+    db_params: Optional[Dict[str, str]] = None,
+    db_param_file: Optional[str] = None,
+    dbname: Optional[str] = None,
+) -> Optional[dict]:
+    """Migrates a database created before the tables derived from the cdf tables existed,
+    by creating and filling them (see ensure_derived_tables). Does nothing if they exist.
+    Returns error dictionary, if any"""
+    engine, err = sql_alchemy_connect(
+        db_params=db_params, db_param_file=db_param_file, dbname=dbname
+    )
+    if ui.fatal_error(err):
+        return err
+    try:
+        with borrowed_cursor(engine) as (connection, cursor):
+            missing = not derived_tables_exist(cursor)
+        if missing:
+            err_str = ensure_derived_tables(engine)
+            if err_str:
+                err = ui.add_new_error(err, "database", engine.url.database, err_str)
+    finally:
+        engine.dispose()
+    return err
+
+
+def table_exists(cursor: psycopg2.extensions.cursor, table: str) -> bool:
+    """Returns True if <table> exists in the current schema (first in the search path,
+    normally public; see sql_alchemy_connect for staging schemas)"""
+    cursor.execute(
+        "SELECT to_regclass(format('%%I.%%I', current_schema(), %s)) IS NOT NULL",
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def contest_totals_exist(cursor: psycopg2.extensions.cursor) -> bool:
+    return table_exists(cursor, contest_total_table)
+
+
+def contest_totals_current(
+    cursor: psycopg2.extensions.cursor, datafile_list: iter, by: str = "Id"
+) -> bool:
+    """Returns True if the contest totals are known to be current for every datafile
+    whose <by> (e.g., Id or short_name) is in <datafile_list>"""
+    datafile_list = tuple(datafile_list)
+    if not datafile_list or not table_exists(cursor, contest_total_datafile_table):
+        return False
+    cursor.execute(
+        sql.SQL(
+            """SELECT NOT EXISTS (
+                SELECT 1 FROM _datafile d WHERE d.{by} IN %s AND NOT EXISTS (
+                    SELECT 1 FROM {current} c WHERE c."_datafile_Id" = d."Id"
+                )
+            )"""
+        ).format(
+            by=sql.Identifier(by),
+            current=sql.Identifier(contest_total_datafile_table),
+        ),
+        [datafile_list],
+    )
+    return cursor.fetchone()[0]
+
+
+def mark_contest_totals_stale_cursor(
+    cursor: psycopg2.extensions.cursor, datafile_ids: Optional[iter] = None
+):
+    """Records that the contest totals of the datafiles in <datafile_ids> (or of all datafiles,
+    if <datafile_ids> is None) may not be current, so that they are not read until refreshed
+    (see ensure_contest_totals). Does not commit."""
+    if not table_exists(cursor, contest_total_datafile_table):
+        return
+    if datafile_ids is None:
+        cursor.execute(
+            sql.SQL("TRUNCATE {current}").format(
+                current=sql.Identifier(contest_total_datafile_table)
+            )
+        )
+        return
+    datafile_ids = tuple(int(n) for n in datafile_ids)
+    if datafile_ids:
+        cursor.execute(
+            sql.SQL('DELETE FROM {current} WHERE "_datafile_Id" in %s').format(
+                current=sql.Identifier(contest_total_datafile_table)
+            ),
+            [datafile_ids],
+        )
+    return
+
+
+def refresh_contest_totals_cursor(
+    cursor: psycopg2.extensions.cursor, datafile_ids: Optional[iter] = None
+):
+    """Recomputes contest totals for the datafiles in <datafile_ids> (or for all datafiles,
+    if <datafile_ids> is None): each vote count is summed to every ReportingUnit containing
+    its reporting unit, and the datafiles' totals are recorded as current.
+    Does nothing if the table of contest totals does not exist. Does not commit."""
+    if not contest_totals_exist(cursor):
+        return
+    if datafile_ids is None:
+        where = sql.SQL("")
+        delete = sql.SQL("TRUNCATE {contest_total}")
+        str_vars = []
+    else:
+        datafile_ids = tuple(int(n) for n in datafile_ids)
+        if not datafile_ids:
+            return
+        where = sql.SQL('WHERE vc."_datafile_Id" in %s')
+        delete = sql.SQL('DELETE FROM {contest_total} WHERE "_datafile_Id" in %s')
+        str_vars = [datafile_ids]
+    q_insert = sql.SQL(
+        """INSERT INTO {contest_total} ("_datafile_Id", "Election_Id", "Jurisdiction_Id",
+            "ReportingUnit_Id", "ReportingUnitType", "Contest_Id", "Selection_Id",
+            "CountItemType", "Count")
+        SELECT vc."_datafile_Id", vc."Election_Id", d."ReportingUnit_Id",
+            ruc."Ancestor_Id", ruc."AncestorReportingUnitType", vc."Contest_Id", vc."Selection_Id",
+            vc."CountItemType", sum(vc."Count")
+        FROM "VoteCount" vc
+        JOIN _datafile d ON vc."_datafile_Id" = d."Id"
+        JOIN {closure} ruc ON vc."ReportingUnit_Id" = ruc."Descendant_Id"
+        {where}
+        GROUP BY vc."_datafile_Id", vc."Election_Id", d."ReportingUnit_Id",
+            ruc."Ancestor_Id", ruc."AncestorReportingUnitType", vc."Contest_Id", vc."Selection_Id",
+            vc."CountItemType"
+        """
+    ).format(
+        contest_total=sql.Identifier(contest_total_table),
+        closure=sql.Identifier(ru_closure_table),
+        where=where,
+    )
+    cursor.execute(
+        delete.format(contest_total=sql.Identifier(contest_total_table)), str_vars
+    )
+    cursor.execute(q_insert, str_vars)
+
+    # record the refreshed totals as current (for datafiles not since removed)
+    if table_exists(cursor, contest_total_datafile_table):
+        if datafile_ids is None:
+            mark_contest_totals_stale_cursor(cursor)
+            where = sql.SQL("")
+        else:
+            where = sql.SQL('WHERE d."Id" in %s')
+        cursor.execute(
+            sql.SQL(
+                """INSERT INTO {current} ("_datafile_Id")
+                SELECT d."Id" FROM _datafile d {where} ON CONFLICT DO NOTHING"""
+            ).format(current=sql.Identifier(contest_total_datafile_table), where=where),
+            str_vars,
+        )
+    return
+
+
+def refresh_contest_totals(
+    bind: Union[Session, sqlalchemy.engine.Engine], datafile_ids: iter
+) -> Optional[str]:
+    """Recomputes, in one transaction, the contest totals of the datafiles in <datafile_ids>,
+    e.g., once all the vote counts of a datafile are loaded (see refresh_contest_totals_cursor).
+    Returns error string, if any"""
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            refresh_contest_totals_cursor(cursor, datafile_ids)
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to refresh {contest_total_table}: {exc}"
+    return err_str
+
+
+def ensure_anomaly_scores(
+    bind: Union[Session, sqlalchemy.engine.Engine]
+) -> Optional[str]:
+    """Creates the tables of the anomaly-score store if they do not exist.
+    Scores are stored pair by pair (see write_anomaly_scores). Returns error string, if any"""
+    q_create = sql.SQL(
+        """CREATE TABLE IF NOT EXISTS {scores} (
+            "Election_Id" integer NOT NULL,
+            "Jurisdiction_Id" integer NOT NULL,
+            "SubdivisionType" varchar NOT NULL,
+            row_order integer NOT NULL,
+            {columns}
+        );
+        CREATE INDEX IF NOT EXISTS {key_idx} ON {scores}
+            ("Election_Id", "Jurisdiction_Id", "SubdivisionType", row_order);
+        CREATE TABLE IF NOT EXISTS {source} (
+            "Election_Id" integer NOT NULL,
+            "Jurisdiction_Id" integer NOT NULL,
+            "SubdivisionType" varchar NOT NULL,
+            datafile_signature varchar NOT NULL,
+            PRIMARY KEY ("Election_Id", "Jurisdiction_Id", "SubdivisionType")
+        );
+        """
+    ).format(
+        scores=sql.Identifier(anomaly_score_table),
+        source=sql.Identifier(anomaly_score_source_table),
+        key_idx=sql.Identifier(f"{anomaly_score_table}_key_idx"),
+        columns=sql.SQL(",").join(
+            sql.SQL("{c} {t}").format(c=sql.Identifier(c), t=sql.SQL(t))
+            for c, t in anomaly_score_columns.items()
+        ),
+    )
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            cursor.execute(q_create)
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to create {anomaly_score_table}: {exc}"
+    return err_str
+
+
+def anomaly_score_signatures(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+) -> (str, Optional[str]):
+    """Returns the signature of the current _datafile records of the election-jurisdiction pair,
+    and the signature of the records from which its stored anomaly scores (for subdivisions of type
+    <subdivision_type>) were computed (None if no scores are stored, or if they have been marked stale;
+    see mark_anomaly_scores_stale). Any change to the pair's datafiles (e.g., loading, reloading or
+    removing a results file) changes the signature. Changes to the jurisdiction's reporting units,
+    candidates or parties do not, so loading jurisdiction files marks the scores stale instead."""
+    q = sql.SQL(
+        """SELECT (
+            SELECT md5(coalesce(string_agg(d::text, ',' ORDER BY d."Id"), ''))
+            FROM _datafile d
+            WHERE d."Election_Id" = %s AND d."ReportingUnit_Id" = %s
+        ), (
+            SELECT s.datafile_signature FROM {source} s
+            WHERE s."Election_Id" = %s AND s."Jurisdiction_Id" = %s
+                AND s."SubdivisionType" = %s
+        )"""
+    ).format(source=sql.Identifier(anomaly_score_source_table))
+    with borrowed_cursor(bind) as (connection, cursor):
+        cursor.execute(
+            q,
+            [
+                election_id,
+                jurisdiction_id,
+                election_id,
+                jurisdiction_id,
+                subdivision_type,
+            ],
+        )
+        signature, stored_signature = cursor.fetchone()
+    return signature, stored_signature
+
+
+def mark_anomaly_scores_stale(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    jurisdiction_id: Optional[int] = None,
+) -> Optional[str]:
+    """Marks the stored anomaly scores of all election-jurisdiction pairs with jurisdiction
+    <jurisdiction_id> (or of all pairs, if <jurisdiction_id> is None) as stale, so that they are
+    recomputed when next needed. Returns error string, if any"""
+    if jurisdiction_id is None:
+        q = sql.SQL("TRUNCATE {source}")
+        str_vars = []
+    else:
+        q = sql.SQL('DELETE FROM {source} WHERE "Jurisdiction_Id" = %s')
+        str_vars = [jurisdiction_id]
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            if not table_exists(cursor, anomaly_score_source_table):
+                return None
+            cursor.execute(
+                q.format(source=sql.Identifier(anomaly_score_source_table)), str_vars
+            )
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to mark anomaly scores stale: {exc}"
+    return err_str
+
+
+def write_anomaly_scores(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+    signature: str,
+    df: pd.DataFrame,
+) -> Optional[str]:
+    """Replaces the stored anomaly scores of the election-jurisdiction pair (for subdivisions of
+    type <subdivision_type>) with the scored vote counts in <df>, in a single transaction,
+    and records the <signature> of the datafiles from which they were computed.
+    Returns error string, if any"""
+    key_columns = ["Election_Id", "Jurisdiction_Id", "SubdivisionType"]
+    columns = key_columns + ["row_order"] + list(anomaly_score_columns.keys())
+    working = df.reset_index(drop=True).reindex(columns=anomaly_score_columns.keys())
+    for c, sql_type in anomaly_score_columns.items():
+        if sql_type in ("integer", "bigint"):
+            working[c] = nullable_int_to_copy_text(working[c])
+        elif sql_type == "double precision":
+            # nan and inf are written as text that postgres reads as NaN and Infinity
+            working[c] = working[c].astype(float).map(str)
+    working.insert(0, "row_order", np.arange(working.shape[0]))
+    for c, value in reversed(
+        list(zip(key_columns, [election_id, jurisdiction_id, subdivision_type]))
+    ):
+        working.insert(0, c, value)
+
+    key_clause = sql.SQL(
+        '"Election_Id" = %s AND "Jurisdiction_Id" = %s AND "SubdivisionType" = %s'
+    )
+    q_delete = sql.SQL("DELETE FROM {scores} WHERE {key_clause}").format(
+        scores=sql.Identifier(anomaly_score_table), key_clause=key_clause
+    )
+    q_copy = sql.SQL(
+        "COPY {scores} ({fields}) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', NULL {null})"
+    ).format(
+        scores=sql.Identifier(anomaly_score_table),
+        fields=sql.SQL(",").join(sql.Identifier(c) for c in columns),
+        null=sql.Literal(constants.copy_null),
+    )
+    q_source = sql.SQL(
+        """INSERT INTO {source} ("Election_Id", "Jurisdiction_Id", "SubdivisionType",
+            datafile_signature)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT ("Election_Id", "Jurisdiction_Id", "SubdivisionType")
+        DO UPDATE SET datafile_signature = EXCLUDED.datafile_signature"""
+    ).format(source=sql.Identifier(anomaly_score_source_table))
+    key_values = [election_id, jurisdiction_id, subdivision_type]
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            cursor.execute(q_delete, key_values)
+            cursor.copy_expert(
+                q_copy, FrameCopyStream(working), size=constants.copy_read_size
+            )
+            cursor.execute(q_source, key_values + [signature])
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to store anomaly scores in {anomaly_score_table}: {exc}"
+    return err_str
+
+
+def read_anomaly_scores(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    election_id: int,
+    jurisdiction_id: int,
+    subdivision_type: str,
+) -> pd.DataFrame:
+    """Returns the stored anomaly scores of the election-jurisdiction pair
+    (for subdivisions of type <subdivision_type>), in the order they were stored"""
+    columns = list(anomaly_score_columns.keys())
+    q = sql.SQL(
+        """SELECT {fields} FROM {scores}
+        WHERE "Election_Id" = %s AND "Jurisdiction_Id" = %s AND "SubdivisionType" = %s
+        ORDER BY row_order"""
+    ).format(
+        fields=sql.SQL(",").join(sql.Identifier(c) for c in columns),
+        scores=sql.Identifier(anomaly_score_table),
+    )
+    return read_query(
+        bind,
+        q,
+        params=[election_id, jurisdiction_id, subdivision_type],
+        columns=columns,
+    )
+
+
+def vote_count_is_partitioned(cursor: psycopg2.extensions.cursor) -> bool:
+    cursor.execute(
+        """SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON pt.partrelid = c.oid
+            WHERE c.oid = to_regclass(format('%I.%I', current_schema(), 'VoteCount'))
+        )"""
+    )
+    return cursor.fetchone()[0]
+
+
+def vote_count_partition_name(election_id: int) -> str:
+    """Returns name of the partition of VoteCount for <election_id>"""
+    return f"VoteCount_e{election_id}"
+
+
+def ensure_vote_count_partitions(
+    cursor: psycopg2.extensions.cursor, election_datafile_pairs: iter
+):
+    """If VoteCount is partitioned, creates any missing partitions for the
+    elections of the (Election_Id, _datafile_Id) pairs in <election_datafile_pairs>, so that
+    inserted rows are routed to them. Does not commit.
+    Safe to call from loaders running in parallel: if another transaction creates the same
+    partition first, waits for it and uses that partition."""
+    if not vote_count_is_partitioned(cursor):
+        return
+    for election_id in sorted({int(e) for (e, d) in election_datafile_pairs}):
+        q = sql.SQL(
+            """CREATE TABLE IF NOT EXISTS {election_partition} PARTITION OF "VoteCount"
+                FOR VALUES IN ({election_id})"""
+        ).format(
+            election_partition=sql.Identifier(vote_count_partition_name(election_id)),
+            election_id=sql.Literal(election_id),
+        )
+        cursor.execute("SAVEPOINT before_partition")
+        try:
+            cursor.execute(q)
+        except (pg_errors.DuplicateTable, pg_errors.UniqueViolation):
+            # partition was created concurrently; now that it is committed, IF NOT EXISTS skips it
+            cursor.execute("ROLLBACK TO SAVEPOINT before_partition")
+            cursor.execute(q)
+        cursor.execute("RELEASE SAVEPOINT before_partition")
+    return
+
+
+def delete_vote_counts_cursor(
+    cursor: psycopg2.extensions.cursor, election_id: int, datafile_id: int
+):
+    """Deletes the vote counts of <datafile_id> (for <election_id>, so that only the election's
+    partition is scanned if VoteCount is partitioned). If that leaves the election's partition
+    empty, detaches and drops it. Does not commit."""
+    cursor.execute(
+        'DELETE FROM "VoteCount" WHERE "Election_Id" = %s AND "_datafile_Id" = %s',
+        [election_id, datafile_id],
+    )
+    election_partition = vote_count_partition_name(election_id)
+    if not table_exists(cursor, election_partition):
+        return
+    cursor.execute(
+        sql.SQL("SELECT EXISTS (SELECT 1 FROM {election_partition})").format(
+            election_partition=sql.Identifier(election_partition)
+        )
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            sql.SQL(
+                'ALTER TABLE "VoteCount" DETACH PARTITION {election_partition}; DROP TABLE {election_partition};'
+            ).format(election_partition=sql.Identifier(election_partition))
+        )
+    return
+
+
+def public_tables_in_dependency_order(
+    cursor: psycopg2.extensions.cursor,
+) -> List[str]:
+    """Returns names of the tables in the public schema (not counting partitions),
+    each listed after every table it refers to via a foreign key"""
+    cursor.execute(
+        """SELECT c.relname FROM pg_class c
+        WHERE c.relnamespace = 'public'::regnamespace
+            AND c.relkind IN ('r', 'p') AND NOT c.relispartition"""
+    )
+    tables = [t for (t,) in cursor.fetchall()]
+    cursor.execute(
+        """SELECT child.relname, parent.relname FROM pg_constraint con
+        JOIN pg_class child ON con.conrelid = child.oid
+        JOIN pg_class parent ON con.confrelid = parent.oid
+        WHERE con.contype = 'f' AND con.connamespace = 'public'::regnamespace"""
+    )
+    refers_to = {t: set() for t in tables}
+    for child, parent in cursor.fetchall():
+        if child in refers_to.keys() and parent != child:
+            refers_to[child].add(parent)
+
+    ordered = list()
+    remaining = set(tables)
+    while remaining:
+        ready = sorted(t for t in remaining if not refers_to[t] & remaining)
+        if not ready:
+            # circular references; nothing can be ordered further
+            ready = sorted(remaining)
+        ordered.extend(ready)
+        remaining -= set(ready)
+    return ordered
+
+
+def unique_column_lists_cursor(
+    cursor: psycopg2.extensions.cursor, table: str
+) -> List[List[str]]:
+    """Returns the list of columns of each unique constraint (not counting the primary key)
+    of public table <table>"""
+    cursor.execute(
+        """SELECT array_agg(a.attname ORDER BY k.ord) FROM pg_constraint con
+        CROSS JOIN LATERAL unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+        WHERE con.contype = 'u'
+            AND con.conrelid = to_regclass(format('%%I.%%I', 'public', %s))
+        GROUP BY con.oid""",
+        [table],
+    )
+    return [columns for (columns,) in cursor.fetchall()]
+
+
+def map_staged_ids_to_live_cursor(
+    cursor: psycopg2.extensions.cursor, schema: str, tables: List[str]
+):
+    """For each table in <tables> (listed in order of foreign-key dependence), finds records
+    of staging schema <schema> matching a public record with a different Id on some unique
+    constraint (e.g., a record with the same name published from another staging schema after
+    <schema> was created), and gives each such staged record the Id of the public record,
+    both in the table itself and in every column of <schema> referring to it. Does not commit."""
+    cursor.execute(
+        """SELECT child.relname, ca.attname, parent.relname, pa.attname
+        FROM pg_constraint con
+        JOIN pg_class child ON con.conrelid = child.oid
+        JOIN pg_class parent ON con.confrelid = parent.oid
+        JOIN pg_attribute ca ON ca.attrelid = con.conrelid AND ca.attnum = con.conkey[1]
+        JOIN pg_attribute pa ON pa.attrelid = con.confrelid AND pa.attnum = con.confkey[1]
+        WHERE con.contype = 'f' AND con.connamespace = 'public'::regnamespace
+            AND array_length(con.conkey, 1) = 1"""
+    )
+    foreign_keys = [
+        (child, column, parent)
+        for (child, column, parent, parent_column) in cursor.fetchall()
+        if parent_column == "Id"
+    ]
+    id_map = sql.Identifier("_staged_id_map")
+    for table in tables:
+        unique_column_lists = unique_column_lists_cursor(cursor, table)
+        if not unique_column_lists:
+            continue
+        cursor.execute(
+            sql.SQL(
+                'CREATE TEMP TABLE {id_map} ("staged_Id" integer PRIMARY KEY, "live_Id" integer)'
+            ).format(id_map=id_map)
+        )
+        for columns in unique_column_lists:
+            cursor.execute(
+                sql.SQL(
+                    """INSERT INTO {id_map} SELECT s."Id", l."Id" FROM {staged} s
+                    JOIN {live} l ON {match} WHERE s."Id" <> l."Id" ON CONFLICT DO NOTHING"""
+                ).format(
+                    id_map=id_map,
+                    staged=sql.Identifier(schema, table),
+                    live=sql.Identifier("public", table),
+                    match=sql.SQL(" AND ").join(
+                        sql.SQL("s.{c} = l.{c}").format(c=sql.Identifier(c))
+                        for c in columns
+                    ),
+                )
+            )
+        cursor.execute(sql.SQL("SELECT count(*) FROM {id_map}").format(id_map=id_map))
+        if cursor.fetchone()[0] > 0:
+            # Ids of <table> may also be Ids of the tables it extends
+            # (e.g., CandidateSelection extends Selection)
+            same_ids = {table} | {
+                parent
+                for (child, column, parent) in foreign_keys
+                if child == table and column == "Id"
+            }
+            # (including the Ids of the tables it extends, so no orphaned Ids are published)
+            to_update = [(t, "Id") for t in [table] + sorted(same_ids - {table})]
+            to_update += [
+                (child, column)
+                for (child, column, parent) in foreign_keys
+                if parent in same_ids and (child, column) not in to_update
+            ]
+            for child, column in to_update:
+                cursor.execute(
+                    sql.SQL(
+                        """UPDATE {staged} t SET {column} = m."live_Id" FROM {id_map} m
+                        WHERE t.{column} = m."staged_Id" """
+                    ).format(
+                        staged=sql.Identifier(schema, child),
+                        column=sql.Identifier(column),
+                        id_map=id_map,
+                    )
+                )
+        cursor.execute(sql.SQL("DROP TABLE {id_map}").format(id_map=id_map))
+    return
+
+
+def create_staging_schema(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    schema: str,
+    jurisdiction_id: Optional[int],
+) -> Optional[str]:
+    """Creates schema <schema> with a table for each table in the public schema, with the
+    same columns, defaults, constraints and indexes (but no foreign keys). Ids are drawn from
+    the same sequence as Ids in the public tables, so they do not collide.
+    Copies into the new tables the records of the jurisdiction with Id <jurisdiction_id>
+    (None if the jurisdiction is not yet in the database) selected by <staging_copy_conditions>,
+    and all records of the other tables except those in <staging_tables_not_copied>, so
+    the time taken depends on the size of the jurisdiction, not of the database.
+    Returns error string, if any"""
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            tables = public_tables_in_dependency_order(cursor)
+            cursor.execute(
+                """CREATE TEMP TABLE _staging_units ON COMMIT DROP AS
+                SELECT "Id" FROM public."ReportingUnit"
+                WHERE "Id" = %(jurisdiction_id)s OR "Name" = 'none or unknown'
+                UNION SELECT "ChildReportingUnit_Id" FROM public."ComposingReportingUnitJoin"
+                WHERE "ParentReportingUnit_Id" = %(jurisdiction_id)s
+                UNION SELECT "ParentReportingUnit_Id" FROM public."ComposingReportingUnitJoin"
+                WHERE "ChildReportingUnit_Id" = %(jurisdiction_id)s;
+                CREATE TEMP TABLE _staging_contests ON COMMIT DROP AS
+                SELECT cc."Id" FROM public."CandidateContest" cc
+                JOIN public."Office" o ON cc."Office_Id" = o."Id"
+                WHERE o."ElectionDistrict_Id" IN (SELECT "Id" FROM _staging_units)
+                UNION SELECT "Id" FROM public."BallotMeasureContest"
+                WHERE "ElectionDistrict_Id" IN (SELECT "Id" FROM _staging_units);
+                CREATE TEMP TABLE _staging_selections ON COMMIT DROP AS
+                SELECT cs."Id", cs."Candidate_Id" FROM public."CandidateSelection" cs
+                JOIN public."Party" p ON cs."Party_Id" = p."Id"
+                WHERE p."Name" = 'ballot measure selection';""",
+                {"jurisdiction_id": jurisdiction_id},
+            )
+            cursor.execute(
+                sql.SQL("CREATE SCHEMA {schema}").format(schema=sql.Identifier(schema))
+            )
+            for table in tables:
+                cursor.execute(
+                    sql.SQL("CREATE TABLE {staged} (LIKE {live} INCLUDING ALL)").format(
+                        staged=sql.Identifier(schema, table),
+                        live=sql.Identifier("public", table),
+                    )
+                )
+                if table in staging_tables_not_copied:
+                    continue
+                q = "INSERT INTO {staged} SELECT * FROM {live}"
+                if table in staging_copy_conditions.keys():
+                    q = f"{q} WHERE {staging_copy_conditions[table]}"
+                cursor.execute(
+                    sql.SQL(q).format(
+                        staged=sql.Identifier(schema, table),
+                        live=sql.Identifier("public", table),
+                    )
+                )
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to create staging schema {schema}: {exc}"
+    return err_str
+
+
+def publish_staging_schema(
+    bind: Union[Session, sqlalchemy.engine.Engine], schema: str
+) -> Optional[str]:
+    """Publishes the contents of staging schema <schema> to the public tables in a
+    single transaction:
+        removes from the public tables the vote counts (and datafile records) of any
+            election-jurisdiction pair with a datafile in <schema>;
+        gives records in <schema> the Ids of any public records they duplicate on a
+            unique constraint (e.g., the same name), so publishing cannot violate the constraint;
+        inserts (or updates, by Id) records new or changed in <schema>, table by table,
+            in order of foreign-key dependence (except derived tables such as the anomaly scores),
+            comparing each staged record only with the public record with the same key;
+        marks the stored anomaly scores of the jurisdictions of the datafiles in <schema> stale;
+        inserts the vote counts of <schema> (creating partitions if necessary)
+            and computes their contest totals.
+    If anything fails, the public tables are left as they were. Returns error string, if any"""
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            # remove data to be replaced
+            cursor.execute(
+                sql.SQL(
+                    """SELECT d."Id", d."Election_Id" FROM public._datafile d
+                    WHERE (d."Election_Id", d."ReportingUnit_Id") IN (
+                        SELECT "Election_Id", "ReportingUnit_Id" FROM {staged_datafile}
+                    )"""
+                ).format(staged_datafile=sql.Identifier(schema, "_datafile"))
+            )
+            for datafile_id, election_id in cursor.fetchall():
+                delete_vote_counts_cursor(cursor, election_id, datafile_id)
+                # contest totals for the datafile are removed by cascade
+                cursor.execute(
+                    'DELETE FROM public._datafile WHERE "Id" = %s', [datafile_id]
+                )
+
+            # give staged records the Ids of public records they duplicate
+            tables = public_tables_in_dependency_order(cursor)
+            map_staged_ids_to_live_cursor(
+                cursor,
+                schema,
+                [t for t in tables if t not in staging_tables_not_copied],
+            )
+
+            # publish records other than vote counts
+            for table in tables:
+                if table in [
+                    "VoteCount",
+                    contest_total_table,
+                    contest_total_datafile_table,
+                    anomaly_score_table,
+                    anomaly_score_source_table,
+                ]:
+                    continue
+                cursor.execute(
+                    """SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = %s""",
+                    [table],
+                )
+                columns = [c for (c,) in cursor.fetchall()]
+                fields = sql.SQL(",").join([sql.Identifier(c) for c in columns])
+                update_columns = [c for c in columns if c != "Id"]
+                new_records = sql.SQL("SELECT {fields} FROM {staged} s").format(
+                    fields=fields, staged=sql.Identifier(schema, table)
+                )
+                if (
+                    table not in staging_tables_not_copied
+                    and "Id" in columns
+                    and update_columns
+                    and not unique_column_lists_cursor(cursor, table)
+                ):
+                    # no unique constraint (e.g., a join) to map the staged records to public
+                    # ones, so skip new records duplicating a public record
+                    new_records = new_records + sql.SQL(
+                        " WHERE NOT EXISTS (SELECT 1 FROM {live} p WHERE {match})"
+                    ).format(
+                        live=sql.Identifier("public", table),
+                        match=sql.SQL(" AND ").join(
+                            sql.SQL("p.{c} = s.{c}").format(c=sql.Identifier(c))
+                            for c in update_columns
+                        ),
+                    )
+                if "Id" in columns and update_columns:
+                    # update public records (by Id) only if changed in <schema>
+                    on_conflict = sql.SQL(
+                        '("Id") DO UPDATE SET {updates} WHERE ({live_fields}) IS DISTINCT FROM ({new_fields})'
+                    ).format(
+                        updates=sql.SQL(",").join(
+                            sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c))
+                            for c in update_columns
+                        ),
+                        live_fields=sql.SQL(",").join(
+                            sql.SQL("l.{c}").format(c=sql.Identifier(c))
+                            for c in update_columns
+                        ),
+                        new_fields=sql.SQL(",").join(
+                            sql.SQL("EXCLUDED.{c}").format(c=sql.Identifier(c))
+                            for c in update_columns
+                        ),
+                    )
+                else:
+                    on_conflict = sql.SQL("DO NOTHING")
+                cursor.execute(
+                    sql.SQL(
+                        "INSERT INTO {live} AS l ({fields}) {new_records} ON CONFLICT {on_conflict}"
+                    ).format(
+                        live=sql.Identifier("public", table),
+                        fields=fields,
+                        new_records=new_records,
+                        on_conflict=on_conflict,
+                    )
+                )
+
+            # stored anomaly scores of the jurisdictions may be out of date
+            cursor.execute(
+                "SELECT to_regclass(format('%%I.%%I', 'public', %s)) IS NOT NULL",
+                [anomaly_score_source_table],
+            )
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    sql.SQL(
+                        """DELETE FROM {source} WHERE "Jurisdiction_Id" IN (
+                            SELECT "ReportingUnit_Id" FROM {staged_datafile}
+                        )"""
+                    ).format(
+                        source=sql.Identifier("public", anomaly_score_source_table),
+                        staged_datafile=sql.Identifier(schema, "_datafile"),
+                    )
+                )
+
+            # publish vote counts
+            cursor.execute(
+                sql.SQL(
+                    'SELECT DISTINCT "Election_Id", "_datafile_Id" FROM {staged}'
+                ).format(staged=sql.Identifier(schema, "VoteCount"))
+            )
+            election_datafile_pairs = cursor.fetchall()
+            ensure_vote_count_partitions(cursor, election_datafile_pairs)
+            cursor.execute(
+                sql.SQL(
+                    """SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = 'VoteCount'"""
+                )
+            )
+            fields = sql.SQL(",").join(
+                [sql.Identifier(c) for (c,) in cursor.fetchall()]
+            )
+            cursor.execute(
+                sql.SQL(
+                    "INSERT INTO {live} ({fields}) SELECT {fields} FROM {staged}"
+                ).format(
+                    live=sql.Identifier("public", "VoteCount"),
+                    staged=sql.Identifier(schema, "VoteCount"),
+                    fields=fields,
+                )
+            )
+            refresh_contest_totals_cursor(
+                cursor, [datafile_id for (e, datafile_id) in election_datafile_pairs]
+            )
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to publish staging schema {schema}: {exc}"
+    # cached names, Ids and ancestors may be out of date
+    invalidate_caches(bind)
+    return err_str
+
+
+def drop_staging_schema(
+    bind: Union[Session, sqlalchemy.engine.Engine], schema: str
+) -> Optional[str]:
+    """Drops staging schema <schema> and everything in it. Returns error string, if any"""
+    err_str = None
+    with borrowed_cursor(bind) as (connection, cursor):
+        try:
+            cursor.execute(
+                sql.SQL("DROP SCHEMA IF EXISTS {schema} CASCADE").format(
+                    schema=sql.Identifier(schema)
+                )
+            )
+            connection.commit()
+        except Exception as exc:
+            connection.rollback()
+            err_str = f"Unable to drop staging schema {schema}: {exc}"
+    return err_str
+
+
+def latest_download_date(session: Session) -> Optional[str]:
+    """Returns the latest download date (yyyy-mm-dd) of any datafile in the database
+    (or None if there are no datafiles)"""
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute("SELECT max(download_date) FROM _datafile")
+        (date,) = cursor.fetchone()
+    if date is None:
+        return None
+    return date.strftime("%Y-%m-%d")
+
+
 def create_or_reset_db(
     content_root: str,
     db_param_file: Optional[str] = None,
     db_params: Optional[Dict[str, str]] = None,
     dbname: Optional[str] = None,
+    partition_vote_count: bool = False,
 ) -> Optional[dict]:
-    """if no dbname is given, name will be taken from db_params, db_param_file or db_params."""
+    """if no dbname is given, name will be taken from db_params, db_param_file or db_params.
+    If <partition_vote_count>, VoteCount is partitioned by election"""
 
     params, err = get_params_from_various(
         db_params=db_params, db_param_file=db_param_file, dbname=dbname
@@ -416,6 +1565,7 @@ def create_or_reset_db(
     create_common_data_format_tables(
         sess_new,
         dirpath=os.path.join(content_root, "electiondata", "CDF_schema_def_info"),
+        partition_vote_count=partition_vote_count,
     )
     new_err = add_standard_records(content_root, sess_new)
     err = ui.consolidate_errors([err, new_err])
@@ -452,16 +1602,24 @@ def sql_alchemy_connect(
     db_params: Optional[Dict[str, str]] = None,
     db_param_file: Optional[str] = None,
     dbname: Optional[str] = None,
+    pool_size: int = constants.db_pool_size,
+    max_overflow: int = constants.db_max_overflow,
+    schema: Optional[str] = None,
 ) -> (sqlalchemy.engine, Optional[dict]):
     """
     Inputs:
         db_params: Optional[Dict[str, str]],
         db_param_file: Optional[str] = None,
         dbname: Optional[str] = None,
+        pool_size: int = constants.db_pool_size, number of connections kept open in the pool
+        max_overflow: int = constants.db_max_overflow, number of connections allowed beyond <pool_size>
+        schema: Optional[str] = None, if given, schema searched (and written) before public,
+            e.g., a staging schema created by create_staging_schema
 
     Returns:
         sqlalchemy.engine, uses parameters in <db_params> if given, otherwise uses <db_param_file>,
-            otherwise defaults to run_time.ini parameter file
+            otherwise defaults to run_time.ini parameter file. The engine's connection pool
+            is bounded by <pool_size> + <max_overflow>, and its usage is tracked (see pool_metrics())
         Optional[dict], error dictionary
     """
     params, err = get_params_from_various(
@@ -474,18 +1632,161 @@ def sql_alchemy_connect(
     url = "postgresql://{user}:{password}@{host}:{port}/{dbname}"
     url = url.format(**params)
 
+    # unqualified table names resolve to tables in <schema>, if given
+    if schema:
+        connect_args = {"options": f"-c search_path={schema},public"}
+    else:
+        connect_args = dict()
+
     # The return value of create_engine() is our connection object
     engine = sa.create_engine(
-        url, client_encoding=constants.default_encoding, pool_size=20, max_overflow=40
+        url,
+        connect_args=connect_args,
+        client_encoding=constants.default_encoding,
+        pool_size=int(pool_size),
+        max_overflow=int(max_overflow),
+        pool_timeout=constants.db_pool_timeout,
+        pool_pre_ping=True,
     )
+    track_pool_usage(engine)
     return engine, err
 
 
+def get_engine(
+    bind: Union[Session, sqlalchemy.engine.Engine]
+) -> sqlalchemy.engine.Engine:
+    """Returns the engine underlying <bind>, which may be either a session or an engine"""
+    if isinstance(bind, Session):
+        return bind.bind
+    return bind
+
+
+def track_pool_usage(engine: sqlalchemy.engine.Engine):
+    """Registers listeners counting connections opened, borrowed and returned
+    in the connection pool of <engine>"""
+    counters = {
+        "connections_opened": 0,
+        "checkouts": 0,
+        "checkins": 0,
+        "peak_checked_out": 0,
+    }
+
+    def on_connect(dbapi_connection, connection_record):
+        counters["connections_opened"] += 1
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+        counters["peak_checked_out"] = max(
+            counters["peak_checked_out"], engine.pool.checkedout()
+        )
+
+    def on_checkin(dbapi_connection, connection_record):
+        counters["checkins"] += 1
+
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+    pool_counters[engine] = counters
+    return
+
+
+def pool_metrics(bind: Union[Session, sqlalchemy.engine.Engine]) -> Dict[str, int]:
+    """
+    Required inputs:
+        bind: Union[Session, sqlalchemy.engine.Engine], session or engine whose pool is reported
+
+    Returns:
+        Dict[str, int], current state of the connection pool (pool_size, checked_in,
+            checked_out, overflow) together with running totals (connections_opened,
+            checkouts, checkins, peak_checked_out) since the engine was created
+    """
+    engine = get_engine(bind)
+    pool = engine.pool
+    metrics = {
+        "pool_size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    metrics.update(pool_counters.get(engine, dict()))
+    return metrics
+
+
+@contextmanager
+def borrowed_cursor(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    cursor: Optional[psycopg2.extensions.cursor] = None,
+) -> Iterator[Tuple[psycopg2.extensions.connection, psycopg2.extensions.cursor]]:
+    """Borrows a connection from the pool of the engine underlying <bind> (session or engine),
+    yields a (connection, cursor) pair, and returns the connection to the pool on exit,
+    even if an exception is raised. Anything not committed is rolled back on return.
+    If a <cursor> already borrowed by the caller is given, yields it (and its connection)
+    instead, leaving it open, so that nested calls never wait on the pool for a second connection."""
+    if cursor is not None:
+        yield cursor.connection, cursor
+        return
+    connection = get_engine(bind).raw_connection()
+    cursor = connection.cursor()
+    try:
+        yield connection, cursor
+    finally:
+        if not cursor.closed:
+            cursor.close()
+        connection.close()
+
+
+def stream_query(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    q: Union[str, sql.Composable],
+    params: Optional[Union[list, tuple, dict]] = None,
+    columns: Optional[List[str]] = None,
+    chunk_rows: int = constants.stream_chunk_rows,
+) -> Iterator[pd.DataFrame]:
+    """Yields the results of query <q> (with parameters <params>) as dataframes of at most
+    <chunk_rows> rows, read from a named (server-side) cursor, so that the full result
+    is never held in memory at once. Columns are named <columns> if given, otherwise
+    as in the query. The connection is borrowed until the iteration finishes (or the
+    generator is closed)."""
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    with borrowed_cursor(bind) as (connection, cursor):
+        server_cursor = connection.cursor(name=f"stream_{ts}")
+        server_cursor.itersize = chunk_rows
+        try:
+            server_cursor.execute(q, params)
+            while True:
+                rows = server_cursor.fetchmany(chunk_rows)
+                if columns is None:
+                    columns = [d[0] for d in server_cursor.description]
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+        finally:
+            server_cursor.close()
+            # end the read-only transaction holding the cursor
+            connection.rollback()
+
+
+def read_query(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    q: Union[str, sql.Composable],
+    params: Optional[Union[list, tuple, dict]] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Returns the results of query <q> (with parameters <params>) as a single dataframe,
+    built from streamed chunks. The whole result is held in memory; callers that need
+    bounded memory should iterate over stream_query instead"""
+    chunks = list(stream_query(bind, q, params=params, columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
 def create_db_if_not_ok(
     content_root: str,
     dbname: Optional[str] = None,
     db_param_file: Optional[str] = None,
     db_params: Optional[Dict[str, str]] = None,
+    partition_vote_count: bool = False,
 ) -> Optional[dict]:
     # create db if it does not already exist and have right tables
     ok, err = test_connection_and_tables(
@@ -497,6 +1798,12 @@ def create_db_if_not_ok(
             dbname=dbname,
             db_params=db_params,
             db_param_file=db_param_file,
+            partition_vote_count=partition_vote_count,
+        )
+        err = ui.consolidate_errors([err, new_err])
+    elif not ui.fatal_error(err):
+        new_err = add_derived_tables_if_missing(
+            dbname=dbname, db_params=db_params, db_param_file=db_param_file
         )
         err = ui.consolidate_errors([err, new_err])
     return err
@@ -540,10 +1847,15 @@ def name_from_id_cursor(
 
 
 def name_from_id(session: Session, element: str, idx: int) -> Optional[str]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    name = name_from_id_cursor(cursor, element, idx)
-    connection.close()
+    """Returns name of the <element> record with Id <idx>, from the in-memory cache
+    if <element> is cached (see name_id_cached_elements), otherwise from the database"""
+    cache = element_cache(session, element)
+    if cache and idx in cache[1].keys():
+        return cache[1][idx]
+    with borrowed_cursor(session) as (connection, cursor):
+        name = name_from_id_cursor(cursor, element, idx)
+    if cache and name is not None:
+        add_to_element_cache(cache, name, idx)
     return name
 
 
@@ -575,15 +1887,112 @@ def name_to_id_cursor(
 
 
 def name_to_id(session: Session, element: str, name: str) -> Optional[int]:
-    """Condition can be a field/value pair, e.g., ('contest_type','Candidate')"""
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    idx = name_to_id_cursor(cursor, element, name)
-
-    connection.close()
+    """Returns Id of the <element> record named <name>, from the in-memory cache
+    if <element> is cached (see name_id_cached_elements), otherwise from the database.
+    Names not in the cache are looked up in the database, in case they were inserted
+    by another process."""
+    cache = element_cache(session, element)
+    if cache and name in cache[0].keys():
+        return cache[0][name]
+    with borrowed_cursor(session) as (connection, cursor):
+        idx = name_to_id_cursor(cursor, element, name)
+    if cache and idx is not None:
+        add_to_element_cache(cache, name, idx)
     return idx
 
 
+def cached_table(element: str) -> Optional[str]:
+    """Returns the database table whose names and Ids are cached for <element>,
+    or None if <element> is not cached"""
+    if element in contest_subtypes.keys():
+        return "Contest"
+    elif element in name_id_cached_elements:
+        return element
+    return None
+
+
+def warm_name_id_cache(
+    bind: Union[Session, sqlalchemy.engine.Engine],
+    elements: Optional[List[str]] = None,
+):
+    """(Re)loads the name <-> Id caches for the tables in <elements> (default: all
+    of name_id_cached_elements) with one query per table"""
+    engine = get_engine(bind)
+    if elements is None:
+        elements = name_id_cached_elements
+    caches = name_id_caches.setdefault(engine, dict())
+    with borrowed_cursor(engine) as (connection, cursor):
+        for element in elements:
+            if element == "Contest":
+                q = sql.SQL('SELECT "Id", "Name", contest_type FROM "Contest"')
+            else:
+                q = sql.SQL("SELECT {id}, {name_field} FROM {element}").format(
+                    id=sql.Identifier("Id"),
+                    name_field=sql.Identifier(get_name_field(element)),
+                    element=sql.Identifier(element),
+                )
+            cursor.execute(q)
+            results = cursor.fetchall()
+            if element == "Contest":
+                for subtype, contest_type in contest_subtypes.items():
+                    caches[subtype] = (
+                        {n: i for (i, n, t) in results if t == contest_type},
+                        {i: n for (i, n, t) in results if t == contest_type},
+                    )
+                results = [(i, n) for (i, n, t) in results]
+            caches[element] = (
+                {n: i for (i, n) in results},
+                {i: n for (i, n) in results},
+            )
+    return
+
+
+def element_cache(
+    bind: Union[Session, sqlalchemy.engine.Engine], element: str
+) -> Optional[tuple]:
+    """Returns the (name->Id, Id->name) pair of dictionaries cached for <element>,
+    warming the cache for its table if necessary. Returns None if <element> is not cached."""
+    table = cached_table(element)
+    if table is None:
+        return None
+    engine = get_engine(bind)
+    caches = name_id_caches.get(engine, dict())
+    if element not in caches.keys():
+        warm_name_id_cache(engine, [table])
+        caches = name_id_caches[engine]
+    return caches[element]
+
+
+def add_to_element_cache(cache: tuple, name: str, idx: int):
+    cache[0][name] = idx
+    cache[1][idx] = name
+    return
+
+
+def invalidate_caches(
+    bind: Union[Session, sqlalchemy.engine.Engine], element: Optional[str] = None
+):
+    """Drops cached names and Ids and cached lookup tables for <element> (and the other
+    elements stored in the same table), or for all elements if <element> is None"""
+    engine = get_engine(bind)
+    lookup_tables = lookup_table_caches.get(engine, dict())
+    caches = name_id_caches.get(engine, dict())
+    if element in [None, "ReportingUnit", "ComposingReportingUnitJoin"]:
+        invalidate_ancestor_lookups(engine)
+    if element is None:
+        lookup_tables.clear()
+        caches.clear()
+        return
+    table = cached_table(element)
+    for k in [k for k in lookup_tables.keys() if k[0] == element or k[0] == table]:
+        lookup_tables.pop(k, None)
+    if table is None:
+        return
+    for k in [table] + [s for s in contest_subtypes.keys() if table == "Contest"]:
+        caches.pop(k, None)
+    return
+
+
 def get_name_field(element: str) -> str:
     if element in ["CandidateSelection", "BallotMeasureSelection"]:
         field = "Id"
@@ -597,26 +2006,39 @@ def get_name_field(element: str) -> str:
 
 
 def get_reporting_unit_type(session: Session, reporting_unit: str) -> Optional[str]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
     q = sql.SQL(
         """
     SELECT "ReportingUnitType" FROM "ReportingUnit" WHERE "Name" = {name}
     """
     ).format(name=sql.Literal(reporting_unit))
-    cursor.execute(q)
-    results = cursor.fetchone()
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q)
+        results = cursor.fetchone()
     if results:
         rut = results[0]
     else:
         rut = None
-    if cursor:
-        cursor.close()
-    if connection:
-        connection.close()
     return rut
 
 
+def get_reporting_unit_types(
+    session: Session, reporting_units: List[str]
+) -> Dict[str, str]:
+    """Returns dictionary of ReportingUnitTypes of the reporting units named in <reporting_units>.
+    Names not found in the database are omitted."""
+    if not reporting_units:
+        return dict()
+    q = sql.SQL(
+        """
+    SELECT "Name", "ReportingUnitType" FROM "ReportingUnit" WHERE "Name" in %s
+    """
+    )
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q, [tuple(reporting_units)])
+        results = cursor.fetchall()
+    return {name: rut for (name, rut) in results}
+
+
 def insert_to_cdf_db(
     engine: sqlalchemy.engine,
     df: pd.DataFrame,
@@ -627,10 +2049,22 @@ def insert_to_cdf_db(
     encoding: str = constants.default_encoding,
     timestamp: Optional[str] = None,
     on_conflict: str = "NOTHING",
+    chunk_rows: int = constants.copy_chunk_rows,
+    stats: Optional[Dict[str, float]] = None,
+    cursor: Optional[psycopg2.extensions.cursor] = None,
 ) -> Optional[dict]:
     """Inserts any new records in <df> into <element>; if <element> has a timestamp column
     it must be specified in <timestamp>; <df> must have columns matching <element>,
-    except Id and <timestamp> if any. Returns an error message (or None)"""
+    except Id and <timestamp> if any. Returns an error message (or None).
+
+    Rows are streamed to the database <chunk_rows> at a time via a single COPY into a
+    temporary table (dropped at commit), and the whole insert is committed once.
+    If a dictionary <stats> is given, the number of rows, elapsed seconds, seconds per million rows
+    and peak memory (MB) allocated during the insert are added to it (see add_insert_stats).
+    If <cursor> is given, it is used (and committed) instead of a connection from the pool;
+    either way, the lookups and nesting records for new ReportingUnits use the same connection."""
+
+    started = start_insert_stats(stats)
 
     err = None
     matched_with_old = pd.DataFrame()  # to satisfy syntax-checker
@@ -640,114 +2074,98 @@ def insert_to_cdf_db(
         working["BallotName"] = m.regularize_candidate_names(working["BallotName"])
         working.drop_duplicates(inplace=True)
 
-    # initialize connection and cursor
-    connection = engine.raw_connection()
-    cursor = connection.cursor()
-
-    # identify new ReportingUnits, must later enter nesting info in db
-    if element == "ReportingUnit":
-        working = m.clean_strings(working, ["Name"])
-        # append ids (if matched) and nulls (if not matched)
-
-        matched_with_old = append_id_to_dframe(
-            engine, working, "ReportingUnit", {"Name": "Name"}, null_ids_to_zero=False
-        )
+    # borrow connection and cursor from the pool (unless given)
+    with borrowed_cursor(engine, cursor) as (connection, cursor):
+        # identify new ReportingUnits, must later enter nesting info in db
+        if element == "ReportingUnit":
+            working = m.clean_strings(working, ["Name"])
+            # append ids (if matched) and nulls (if not matched)
 
-    # name temp table by username and timestamp to avoid conflict
-    temp_table = table_named_to_avoid_conflict(engine, "__temp_insert")
+            matched_with_old = append_id_to_dframe(
+                engine,
+                working,
+                "ReportingUnit",
+                {"Name": "Name"},
+                null_ids_to_zero=False,
+                cursor=cursor,
+            )
 
-    if element in [
-        "BallotMeasureSelection",
-        "BallotMeasureContest",
-        "CandidateSelection",
-        "CandidateContest",
-    ]:
-        # create temp table with Id column
-        q = sql.SQL(
-            "CREATE TABLE {temp_table} AS TABLE {element} WITH NO DATA;"
-        ).format(element=sql.Identifier(element), temp_table=sql.Identifier(temp_table))
-    else:
-        # create temp table without Id
-        q = sql.SQL(
-            'CREATE TABLE {temp_table} AS TABLE {element} WITH NO DATA; ALTER TABLE {temp_table} DROP COLUMN "Id";'
-        ).format(element=sql.Identifier(element), temp_table=sql.Identifier(temp_table))
+        # get columns for temp table: those of <element>, without timestamp
+        # and (except for elements whose Id is inherited from another table) without Id
+        element_columns, type_map = get_column_names(cursor, element)
+        keep_id = element in [
+            "BallotMeasureSelection",
+            "BallotMeasureContest",
+            "CandidateSelection",
+            "CandidateContest",
+        ]
+        temp_columns = [
+            c
+            for c in element_columns
+            if (c != "Id" or keep_id) and (timestamp is None or c != timestamp)
+        ]
+        if timestamp and timestamp in working.columns:
+            working = working.drop([timestamp], axis=1)
 
-    cursor.execute(q)
-    if timestamp:
-        # drop timestamp column
-        q = sql.SQL("ALTER TABLE {temp_table} DROP COLUMN {ts_col}").format(
-            ts_col=sql.Identifier(timestamp), temp_table=temp_table
+        # name temp table by username and timestamp to avoid conflict
+        temp_table = table_named_to_avoid_conflict(engine, "__temp_insert")
+        q = sql.SQL(
+            "CREATE TEMP TABLE {temp_table} ON COMMIT DROP AS SELECT {fields} FROM {element} WITH NO DATA"
+        ).format(
+            temp_table=sql.Identifier(temp_table),
+            fields=sql.SQL(",").join([sql.Identifier(c) for c in temp_columns]),
+            element=sql.Identifier(element),
         )
-        cursor.execute(q)
-        working = working.drop([timestamp], axis=1)
-    connection.commit()
-
-    # make sure datatypes of working match the types of target
-    # get set <mixed_int> of cols with integers & nulls and kludge only those
-    temp_columns, type_map = get_column_names(cursor, temp_table)
-    mixed_int = [
-        c  # TODO Selection_Id was numerical but not int here for AZ (xml)
-        for c in temp_columns
-        if c in working.columns
-        and type_map[c] == "integer"
-        and working[c].dtype != "int64"
-    ]
-    for c in mixed_int:
-        # set nulls to 0 (kludge because pandas can't have NaN in 'int64' column)
-        working[c] = working[c].fillna(0).astype("int64", errors="ignore")
-
-    # Prepare data
-    output = io.StringIO()
-    temp_only_cols = [c for c in temp_columns if c not in working.columns]
-
-    # add any missing columns needed for temp table to working
-    for c in temp_only_cols:
-        working = m.add_constant_column(working, c, None)
-    working[temp_columns].drop_duplicates().to_csv(
-        output,
-        sep=sep,
-        header=False,
-        encoding=encoding,
-        index=False,
-        quoting=csv.QUOTE_MINIMAL,
-    )
-    # set current position for the StringIO object to the beginning of the string
-    output.seek(0)
-
-    # Insert data
-    q_copy = sql.SQL("COPY {temp_table} FROM STDOUT").format(
-        temp_table=sql.Identifier(temp_table)
-    )
-    try:
-        cursor.copy_expert(q_copy, output)
-        connection.commit()
 
-        #  undo kludge (see above) setting 0 values to nulls inside db in temp table
+        # make sure datatypes of working match the types of target:
+        # integer columns with nulls are passed to COPY with explicit nulls.
+        # As always, 0 in such a column (e.g., an unmatched Id) is loaded as null
+        mixed_int = [
+            c
+            for c in temp_columns
+            if c in working.columns
+            and type_map[c] == "integer"
+            and working[c].dtype != "int64"
+        ]
         for c in mixed_int:
-            q_kludge = sql.SQL(
-                "UPDATE {temp_table} SET {c} = NULL WHERE {c} = 0"
-            ).format(temp_table=sql.Identifier(temp_table), c=sql.Identifier(c))
-            cursor.execute(q_kludge)
-        connection.commit()  # TODO when Selection_Id was in mixed_int, this emptied temp table, why?
+            working[c] = nullable_int_to_copy_text(working[c], zero_as_null=True)
 
-        # define update clause if necessary
-        name_field = get_name_field(element)
-        if on_conflict.upper() == "UPDATE":
-            conflict_action = sql.SQL("({name_field}) DO UPDATE SET").format(
-                name_field=sql.Identifier(name_field)
+        # add any missing columns needed for temp table to working
+        temp_only_cols = [c for c in temp_columns if c not in working.columns]
+        for c in temp_only_cols:
+            working = m.add_constant_column(working, c, None)
+        working = working[temp_columns].drop_duplicates()
+
+        # Insert data
+        q_copy = sql.SQL("COPY {temp_table} FROM STDIN").format(
+            temp_table=sql.Identifier(temp_table)
+        )
+        inserted = False
+        try:
+            cursor.execute(q)
+            cursor.copy_expert(
+                q_copy,
+                FrameCopyStream(working, sep=sep, chunk_rows=chunk_rows),
+                size=constants.copy_read_size,
             )
-            update_list = [
-                sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(col))
-                for col in temp_columns
-            ]
-            conflict_target = sql.SQL(",").join(update_list)
 
-        else:
-            conflict_action = sql.SQL("DO NOTHING")
-            conflict_target = sql.SQL("")
+            # define update clause if necessary
+            name_field = get_name_field(element)
+            if on_conflict.upper() == "UPDATE":
+                conflict_action = sql.SQL("({name_field}) DO UPDATE SET").format(
+                    name_field=sql.Identifier(name_field)
+                )
+                update_list = [
+                    sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(col))
+                    for col in temp_columns
+                ]
+                conflict_target = sql.SQL(",").join(update_list)
 
-        # insert records from temp table into <element> table
-        try:
+            else:
+                conflict_action = sql.SQL("DO NOTHING")
+                conflict_target = sql.SQL("")
+
+            # insert records from temp table into <element> table
             q_insert = sql.SQL(
                 "INSERT INTO {t}({fields}) SELECT * FROM {temp_table} ON CONFLICT {conflict_action} {conflict_target}"
             ).format(
@@ -757,11 +2175,25 @@ def insert_to_cdf_db(
                 conflict_action=conflict_action,
                 conflict_target=conflict_target,
             )
-            cursor.execute(q_insert)
-            connection.commit()
-        except Exception as exc:
-            if on_conflict.upper() != "NOTHING":
+            # create any partitions the new vote counts need
+            if element == "VoteCount" and {"Election_Id", "_datafile_Id"}.issubset(
+                df.columns
+            ):
+                ensure_vote_count_partitions(
+                    cursor,
+                    df[["Election_Id", "_datafile_Id"]]
+                    .drop_duplicates()
+                    .itertuples(index=False),
+                )
+            # savepoint allows retry without losing the temp table
+            cursor.execute("SAVEPOINT before_insert")
+            try:
+                cursor.execute(q_insert)
+            except Exception as exc:
+                if on_conflict.upper() == "NOTHING":
+                    raise
                 # try again, with no action on conflict
+                cursor.execute("ROLLBACK TO SAVEPOINT before_insert")
                 q_insert = sql.SQL(
                     "INSERT INTO {t}({fields}) SELECT * FROM {temp_table} ON CONFLICT DO NOTHING"
                 ).format(
@@ -770,7 +2202,6 @@ def insert_to_cdf_db(
                     temp_table=sql.Identifier(temp_table),
                 )
                 cursor.execute(q_insert)
-                connection.commit()
                 err = ui.add_new_error(
                     err,
                     f"warn-{error_type}",
@@ -778,50 +2209,240 @@ def insert_to_cdf_db(
                     f"Error upserting {element} resolved by only inserting and not updating. "
                     f"Exception: {exc}",
                 )
+            # contest totals are not read until refreshed, once per datafile (see refresh_contest_totals)
+            if element == "VoteCount" and "_datafile_Id" in df.columns:
+                mark_contest_totals_stale_cursor(cursor, df["_datafile_Id"].unique())
+            # one commit for the batch; this also drops the temp table
+            connection.commit()
+            inserted = True
 
-    except Exception as exc:
-        print(exc)
-        err = ui.add_new_error(
-            err,
-            error_type,
-            error_name,
-            f"Exception inserting element {element}: {exc}",
-        )
-        q_insert = "<unknown query>"
+        except Exception as exc:
+            print(exc)
+            err = ui.add_new_error(
+                err,
+                error_type,
+                error_name,
+                f"Exception inserting element {element}: {exc}",
+            )
+            # discard the whole batch, including the temp table
+            connection.rollback()
 
-    # remove temp table
-    try:
-        q_remove = sql.SQL("DROP TABLE IF EXISTS {temp_table}").format(
-            temp_table=sql.Identifier(temp_table)
+        # cached names and Ids for the element may be out of date
+        if inserted:
+            invalidate_caches(engine, element)
+
+        if inserted and element == "ReportingUnit":
+            # check get RUs not matched and process them
+            mask = (matched_with_old.ReportingUnit_Id.notnull()) & (
+                matched_with_old.ReportingUnit_Id > 0
+            )
+            new_rus = matched_with_old[~mask]
+            if not new_rus.empty:
+                append_err = append_to_composing_reporting_unit_join(
+                    engine, new_rus, error_type, error_name, cursor=cursor
+                )
+                if append_err:
+                    err = ui.consolidate_errors([err, append_err])
+
+    add_insert_stats(stats, started, working.shape[0])
+    return err
+
+
+def start_insert_stats(
+    stats: Optional[Dict[str, float]]
+) -> Optional[Tuple[bool, float]]:
+    """If a dictionary <stats> is given, starts timing an insert and tracing the memory it allocates.
+    Returns whether memory was already being traced and the start time, to be passed to add_insert_stats"""
+    if stats is None:
+        return None
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    return tracing, time.perf_counter()
+
+
+def add_insert_stats(
+    stats: Optional[Dict[str, float]],
+    started: Optional[Tuple[bool, float]],
+    rows: int,
+):
+    """If a dictionary <stats> is given, adds the <rows> and elapsed seconds of the insert <started>
+    (see start_insert_stats) to those already in <stats>, recomputes the seconds per million rows
+    and keeps the larger of the peak memory (MB) in <stats> and the peak allocated during the insert"""
+    if stats is None:
+        return
+    tracing, start_time = started
+    elapsed = time.perf_counter() - start_time
+    peak = tracemalloc.get_traced_memory()[1]
+    if not tracing:
+        tracemalloc.stop()
+    stats["rows"] = stats.get("rows", 0) + rows
+    stats["seconds"] = stats.get("seconds", 0) + elapsed
+    stats["seconds_per_million_rows"] = (
+        stats["seconds"] * 1_000_000 / stats["rows"] if stats["rows"] else 0
+    )
+    stats["peak_memory_mb"] = max(stats.get("peak_memory_mb", 0), peak / 2**20)
+
+
+def create_vote_count_chunk_table_cursor(cursor: psycopg2.extensions.cursor) -> str:
+    """Creates an empty, unconstrained temporary table with the columns of VoteCount other than
+    Id, for staging the vote counts of a results file loaded in chunks. The table is dropped at
+    the end of the transaction (or when the connection closes, e.g., if the loading process dies),
+    so everything staged in it must be inserted into VoteCount (see
+    insert_vote_counts_from_chunk_table_cursor) before committing. Returns the name of the table.
+    Does not commit."""
+    # temp tables are private to the connection, so a timestamp suffices to avoid conflicts
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    chunk_table = f"__vote_count_chunks_{ts}"
+    columns, _ = get_column_names(cursor, "VoteCount")
+    cursor.execute(
+        sql.SQL(
+            'CREATE TEMP TABLE {chunk_table} ON COMMIT DROP AS SELECT {fields} FROM "VoteCount" WITH NO DATA'
+        ).format(
+            chunk_table=sql.Identifier(chunk_table),
+            fields=sql.SQL(",").join([sql.Identifier(c) for c in columns if c != "Id"]),
         )
-        cursor.execute(q_remove)
-    except psycopg2.errors.InFailedSqlTransaction as exc:
-        err = ui.add_new_error(
-            err,
-            "system",
-            f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
-            f"During insert/update of {element}, previous query caused transaction to fail:\n"
-            f"{cursor.mogrify(q_insert)}",
+    )
+    return chunk_table
+
+
+def copy_to_vote_count_chunk_table_cursor(
+    cursor: psycopg2.extensions.cursor, chunk_table: str, df: pd.DataFrame
+):
+    """Copies the vote counts in <df> (whose columns are columns of VoteCount other than Id)
+    into <chunk_table> (see create_vote_count_chunk_table_cursor). Does not commit."""
+    _, type_map = get_column_names(cursor, "VoteCount")
+    working = df.copy()
+    for c in working.columns:
+        if type_map.get(c) in ["integer", "bigint"] and working[c].dtype != "int64":
+            working[c] = nullable_int_to_copy_text(working[c])
+    cursor.copy_expert(
+        sql.SQL("COPY {chunk_table} ({fields}) FROM STDIN").format(
+            chunk_table=sql.Identifier(chunk_table),
+            fields=sql.SQL(",").join([sql.Identifier(c) for c in working.columns]),
+        ),
+        FrameCopyStream(working),
+        size=constants.copy_read_size,
+    )
+
+
+def insert_vote_counts_from_chunk_table_cursor(
+    cursor: psycopg2.extensions.cursor, chunk_table: str
+) -> int:
+    """Sums the vote counts staged in <chunk_table> (see create_vote_count_chunk_table_cursor) for
+    each datafile, election, contest, selection, reporting unit and count item type, so that counts
+    from different chunks of a file are added as they would be if the file were loaded whole,
+    and inserts the sums into VoteCount (creating partitions if necessary). The contest totals
+    of the datafiles are marked stale until refreshed (see refresh_contest_totals).
+    Returns the number of rows staged in <chunk_table>. Does not commit."""
+    columns, _ = get_column_names(cursor, "VoteCount")
+    key_fields = sql.SQL(",").join(
+        [sql.Identifier(c) for c in columns if c not in ["Id", "Count"]]
+    )
+    cursor.execute(
+        sql.SQL(
+            'SELECT DISTINCT "Election_Id", "_datafile_Id" FROM {chunk_table}'
+        ).format(chunk_table=sql.Identifier(chunk_table))
+    )
+    election_datafile_pairs = cursor.fetchall()
+    cursor.execute(
+        sql.SQL("SELECT count(*) FROM {chunk_table}").format(
+            chunk_table=sql.Identifier(chunk_table)
         )
-        return err
+    )
+    staged = cursor.fetchone()[0]
+    ensure_vote_count_partitions(cursor, election_datafile_pairs)
+    cursor.execute(
+        sql.SQL(
+            """INSERT INTO "VoteCount" ({key_fields}, "Count")
+            SELECT {key_fields}, sum("Count") FROM {chunk_table} GROUP BY {key_fields}
+            ON CONFLICT DO NOTHING"""
+        ).format(key_fields=key_fields, chunk_table=sql.Identifier(chunk_table))
+    )
+    mark_contest_totals_stale_cursor(
+        cursor, [datafile_id for (e, datafile_id) in election_datafile_pairs]
+    )
+    return staged
 
-    if element == "ReportingUnit":
-        # check get RUs not matched and process them
-        mask = (matched_with_old.ReportingUnit_Id.notnull()) & (
-            matched_with_old.ReportingUnit_Id > 0
+
+def nullable_int_to_copy_text(s: pd.Series, zero_as_null: bool = False) -> pd.Series:
+    """Returns <s> as text suitable for COPY, with integers written without decimal
+    points and nulls (and zeros, if <zero_as_null>) written as COPY's null marker.
+    If <s> is not integer-valued, returns <s> unchanged (and COPY will report the problem)."""
+    try:
+        as_int = pd.to_numeric(s).astype("Int64")
+    except (ValueError, TypeError):
+        return s
+    is_null = as_int.isna()
+    if zero_as_null:
+        is_null = is_null | (as_int == 0).fillna(False)
+    return as_int.astype(str).where(~is_null, constants.copy_null)
+
+
+class FrameCopyStream(io.TextIOBase):
+    """Read-only file-like view of a dataframe, for use with cursor.copy_expert.
+    Rows are converted to delimited text <chunk_rows> at a time, as COPY asks for them,
+    so the text of the whole dataframe is never held in memory at once."""
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        sep: str = "\t",
+        chunk_rows: int = constants.copy_chunk_rows,
+    ):
+        super().__init__()
+        self.df = df
+        self.sep = sep
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.next_row = 0
+        self.buffer = ""
+        self.offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def fill_buffer(self) -> bool:
+        """Encodes the next chunk of rows; returns False if there are none left"""
+        if self.next_row >= self.df.shape[0]:
+            return False
+        chunk = self.df.iloc[self.next_row : self.next_row + self.chunk_rows]
+        self.next_row += self.chunk_rows
+        self.buffer = chunk.to_csv(
+            sep=self.sep,
+            header=False,
+            index=False,
+            quoting=csv.QUOTE_MINIMAL,
         )
-        new_rus = matched_with_old[~mask]
-        if not new_rus.empty:
-            append_err = append_to_composing_reporting_unit_join(
-                engine, new_rus, error_type, error_name
-            )
-            if append_err:
-                err = ui.consolidate_errors([err, append_err])
+        self.offset = 0
+        return True
 
-    connection.commit()
-    cursor.close()
-    connection.close()
-    return err
+    def read(self, size: int = -1) -> str:
+        pieces = list()
+        while size < 0 or size > 0:
+            if self.offset >= len(self.buffer) and not self.fill_buffer():
+                break
+            if size < 0:
+                end = len(self.buffer)
+            else:
+                end = min(self.offset + size, len(self.buffer))
+                size -= end - self.offset
+            pieces.append(self.buffer[self.offset : end])
+            self.offset = end
+        return "".join(pieces)
+
+    def readline(self, size: int = -1) -> str:
+        pieces = list()
+        while True:
+            if self.offset >= len(self.buffer) and not self.fill_buffer():
+                break
+            newline = self.buffer.find("\n", self.offset)
+            end = len(self.buffer) if newline < 0 else newline + 1
+            pieces.append(self.buffer[self.offset : end])
+            self.offset = end
+            if newline >= 0:
+                break
+        return "".join(pieces)
 
 
 def table_named_to_avoid_conflict(engine: sqlalchemy.engine, prefix: str) -> str:
@@ -838,10 +2459,15 @@ def append_id_to_dframe(
     element: str,
     col_map: Optional[dict] = None,
     null_ids_to_zero: bool = True,
+    cursor: Optional[psycopg2.extensions.cursor] = None,
 ) -> pd.DataFrame:
     """Using <col_map> to map columns of <df> onto defining columns of <table>, returns
     a copy of <df> with appended column <table>_Id. Unmatched items returned with
-    null value for <table>_Id"""
+    null value for <table>_Id.
+    Tables with at most constants.max_rows_for_cached_lookup rows are matched in memory
+    against a cached copy of the table; larger tables are matched in the database,
+    via a temp table loaded with COPY and a single join. Uses <cursor>, if given,
+    instead of a connection from the pool (committing it if the match is in the database)"""
     if col_map is None:
         col_map = {element: get_name_field(element)}
 
@@ -851,19 +2477,120 @@ def append_id_to_dframe(
             if v == "BallotName" and k in df.columns:
                 df[k] = m.regularize_candidate_names(df[k])
 
-    connection = engine.raw_connection()
-
-    temp_table = table_named_to_avoid_conflict(engine, "__temp_append")
-
     df_cols = list(col_map.keys())
 
-    # create temp db table with info from df, without index
     id_cols = [c for c in df.columns if c[-3:] == "_Id"]
     df, err_df = m.clean_ids(df, id_cols)
-    df[df_cols].fillna("").to_sql(temp_table, engine, index_label="dataframe_index")
-    # TODO fillna('') probably redundant
 
-    # join <table>_Id
+    # prepare frame of lookup keys, with position of each row in df
+    keys = df[df_cols].copy()
+    for c in df_cols:
+        if not is_numeric_dtype(keys[c]):
+            keys[c] = keys[c].fillna("")
+    keys.insert(0, "dataframe_position", np.arange(keys.shape[0]))
+
+    # find Ids for each row (more than one, if keys are not unique in <element>)
+    matched = None
+    table = cached_lookup_table(
+        engine, element, [col_map[c] for c in df_cols], cursor=cursor
+    )
+    if table is not None:
+        matched = hash_join_ids(keys, table, col_map)
+    if matched is None:
+        matched = copy_join_ids(engine, keys, element, col_map, cursor=cursor)
+
+    matched.sort_values("dataframe_position", kind="stable", inplace=True)
+    df_appended = df.iloc[matched["dataframe_position"].to_numpy()].copy()
+    df_appended[f"{element}_Id"] = matched["Id"].to_numpy()
+    if null_ids_to_zero:
+        df_appended, _ = m.clean_ids(df_appended, [f"{element}_Id"])
+    return df_appended
+
+
+def cached_lookup_table(
+    engine: sqlalchemy.engine,
+    element: str,
+    columns: List[str],
+    cursor: Optional[psycopg2.extensions.cursor] = None,
+) -> Optional[pd.DataFrame]:
+    """Returns dataframe of Id and <columns> for all records of <element> with no nulls in <columns>,
+    from the cache if possible, otherwise from the database (caching the result).
+    Returns None if <element> has more than constants.max_rows_for_cached_lookup rows.
+    Uses <cursor>, if given, instead of a connection from the pool."""
+    tables = lookup_table_caches.setdefault(engine, dict())
+    key = (element, tuple(columns))
+    if key in tables.keys():
+        return tables[key]
+
+    q_count = sql.SQL(
+        "SELECT count(*) FROM (SELECT 1 FROM {element} LIMIT %s) s"
+    ).format(element=sql.Identifier(element))
+    fields = ["Id"] + [c for c in columns if c != "Id"]
+    q = sql.SQL("SELECT {fields} FROM {element}").format(
+        fields=sql.SQL(",").join([sql.Identifier(c) for c in fields]),
+        element=sql.Identifier(element),
+    )
+    with borrowed_cursor(engine, cursor) as (connection, cursor):
+        cursor.execute(q_count, [constants.max_rows_for_cached_lookup + 1])
+        if cursor.fetchone()[0] > constants.max_rows_for_cached_lookup:
+            tables[key] = None
+            return None
+        cursor.execute(q)
+        table = pd.DataFrame(cursor.fetchall(), columns=fields)
+    # nulls never match in sql join, so remove them
+    table = table.dropna(subset=columns)
+    tables[key] = table
+    return table
+
+
+def hash_join_ids(
+    keys: pd.DataFrame, table: pd.DataFrame, col_map: dict
+) -> Optional[pd.DataFrame]:
+    """Left-joins <keys> (dataframe_position and the columns in <col_map>) with <table>
+    in memory, returning dataframe with columns dataframe_position and Id.
+    Returns None if the types of the columns do not allow the join."""
+    df_cols = list(col_map.keys())
+    right = table[["Id"]].copy()
+    for c in df_cols:
+        right[c] = table[col_map[c]]
+    try:
+        matched = keys.merge(right, how="left", on=df_cols)
+    except (ValueError, TypeError):
+        return None
+    return matched[["dataframe_position", "Id"]]
+
+
+def copy_join_ids(
+    engine: sqlalchemy.engine,
+    keys: pd.DataFrame,
+    element: str,
+    col_map: dict,
+    cursor: Optional[psycopg2.extensions.cursor] = None,
+) -> pd.DataFrame:
+    """Left-joins <keys> (dataframe_position and the columns in <col_map>) with <element>
+    in the database, via a temp table loaded by COPY. Returns dataframe with columns
+    dataframe_position and Id. Uses (and commits) <cursor>, if given, instead of a connection
+    from the pool"""
+    df_cols = list(col_map.keys())
+    temp_table = table_named_to_avoid_conflict(engine, "__temp_append")
+    # temp table columns have types of the corresponding columns in <element>
+    q_create = sql.SQL(
+        "CREATE TEMP TABLE {tt} ON COMMIT DROP AS SELECT 0::bigint AS dataframe_position, {fields} FROM {t} WITH NO DATA"
+    ).format(
+        tt=sql.Identifier(temp_table),
+        fields=sql.SQL(",").join(
+            [
+                sql.SQL("{t_col} AS {tt_col}").format(
+                    t_col=sql.Identifier(col_map[c]), tt_col=sql.Identifier(c)
+                )
+                for c in df_cols
+            ]
+        ),
+        t=sql.Identifier(element),
+    )
+    q_copy = sql.SQL(
+        "COPY {tt} FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', NULL {null})"
+    ).format(tt=sql.Identifier(temp_table), null=sql.Literal(constants.copy_null))
     on_clause = sql.SQL(" AND ").join(
         [
             sql.SQL("t.{t_col} = tt.{tt_col}").format(
@@ -872,24 +2599,33 @@ def append_id_to_dframe(
             for c in df_cols
         ]
     )
-
     q = sql.SQL(
-        "SELECT t.*, tt.dataframe_index FROM {tt} tt LEFT JOIN {t} t ON {on_clause}"
+        "SELECT tt.dataframe_position, t.{id} FROM {tt} tt LEFT JOIN {t} t ON {on_clause}"
     ).format(
-        tt=sql.Identifier(temp_table), t=sql.Identifier(element), on_clause=on_clause
+        id=sql.Identifier("Id"),
+        tt=sql.Identifier(temp_table),
+        t=sql.Identifier(element),
+        on_clause=on_clause,
     )
-    w = pd.read_sql_query(q, connection).set_index("dataframe_index")
 
-    # drop temp db table
-    q = sql.SQL("DROP TABLE {temp_table}").format(temp_table=sql.Identifier(temp_table))
-    cur = connection.cursor()
-    cur.execute(q)
-    connection.commit()
-    connection.close()
-    df_appended = df.join(w[["Id"]]).rename(columns={"Id": f"{element}_Id"})
-    if null_ids_to_zero:
-        df_appended, _ = m.clean_ids(df_appended, [f"{element}_Id"])
-    return df_appended
+    with borrowed_cursor(engine, cursor) as (connection, cursor):
+        cursor.execute(q_create)
+        # pass integer key columns with explicit nulls
+        temp_columns, type_map = get_column_names(cursor, element)
+        working = keys.copy()
+        for c in df_cols:
+            if type_map.get(col_map[c]) in ("integer", "bigint"):
+                working[c] = nullable_int_to_copy_text(working[c])
+        cursor.copy_expert(
+            q_copy,
+            FrameCopyStream(working),
+            size=constants.copy_read_size,
+        )
+        cursor.execute(q)
+        matched = pd.DataFrame(cursor.fetchall(), columns=["dataframe_position", "Id"])
+        # commit drops the temp table
+        connection.commit()
+    return matched
 
 
 def get_column_names(
@@ -897,7 +2633,7 @@ def get_column_names(
 ) -> (List[str], Dict[str, Any]):
     q = sql.SQL(
         """SELECT column_name, data_type FROM information_schema.columns 
-        WHERE table_schema = 'public' AND table_name = %s"""
+        WHERE table_schema = current_schema() AND table_name = %s"""
     )
     cursor.execute(q, [table])
     results = cursor.fetchall()
@@ -909,15 +2645,12 @@ def get_column_names(
 def add_records_to_selection_table(engine: sqlalchemy.engine, n: int) -> List[int]:
     "Returns a list of the Ids of the inserted records"
     id_list = []
-    connection = engine.raw_connection()
-    cursor = connection.cursor()
     q = sql.SQL('INSERT INTO "Selection" DEFAULT VALUES RETURNING "Id";')
-    for k in range(n):
-        cursor.execute(q)
-        id_list.append(cursor.fetchall()[0][0])
-    connection.commit()
-    cursor.close()
-    connection.close()
+    with borrowed_cursor(engine) as (connection, cursor):
+        for k in range(n):
+            cursor.execute(q)
+            id_list.append(cursor.fetchall()[0][0])
+        connection.commit()
     return id_list
 
 
@@ -959,15 +2692,10 @@ def jurisdiction_id_list(session: Session) -> List[int]:
     q = """
     SELECT DISTINCT "ReportingUnit_Id" FROM _datafile;
     """
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q)
-    results = cursor.fetchall()
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q)
+        results = cursor.fetchall()
     juris_id_list = [x[0] for x in results]
-    if cursor:
-        cursor.close()
-    if connection:
-        connection.close()
     return juris_id_list
 
 
@@ -1001,12 +2729,10 @@ def data_file_list(
     reporting_unit_id: Optional[int] = None,
     by: str = "Id",
 ) -> (List[pd.DataFrame], Optional[str]):
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    df_list, err_str = data_file_list_cursor(
-        cursor, election_id, reporting_unit_id=reporting_unit_id, by=by
-    )
-    connection.close()
+    with borrowed_cursor(session) as (connection, cursor):
+        df_list, err_str = data_file_list_cursor(
+            cursor, election_id, reporting_unit_id=reporting_unit_id, by=by
+        )
     return df_list, err_str
 
 
@@ -1015,6 +2741,27 @@ def active_vote_types_from_ids(
     election_id: Optional[int] = None,
     jurisdiction_id: Optional[int] = None,
 ) -> List[str]:
+    if (
+        election_id
+        and jurisdiction_id
+        and contest_totals_exist(cursor)
+        and contest_totals_current(
+            cursor,
+            data_file_list_cursor(
+                cursor, election_id, reporting_unit_id=jurisdiction_id
+            )[0]
+            or list(),
+        )
+    ):
+        # contest totals include a record for each count summed to the jurisdiction
+        cursor.execute(
+            sql.SQL(
+                """SELECT distinct ct."CountItemType" FROM {contest_total} ct
+                WHERE ct."Election_Id" = %s AND ct."ReportingUnit_Id" = %s"""
+            ).format(contest_total=sql.Identifier(contest_total_table)),
+            (election_id, jurisdiction_id),
+        )
+        return [x for (x,) in cursor.fetchall()]
     if election_id:
         if jurisdiction_id:
             q = """SELECT distinct vc."CountItemType"
@@ -1065,13 +2812,10 @@ def active_vote_types(session: Session, election, jurisdiction):
 
     election_id = name_to_id(session, "Election", election)
     jurisdiction_id = name_to_id(session, "ReportingUnit", jurisdiction)
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    active_list = active_vote_types_from_ids(
-        cursor, election_id=election_id, jurisdiction_id=jurisdiction_id
-    )
-    cursor.close()
-    connection.close()
+    with borrowed_cursor(session) as (connection, cursor):
+        active_list = active_vote_types_from_ids(
+            cursor, election_id=election_id, jurisdiction_id=jurisdiction_id
+        )
     return active_list
 
 
@@ -1079,15 +2823,12 @@ def remove_record_from_datafile_table(session, idx) -> Optional[str]:
 
     err_str = None
     try:
-        connection = session.bind.raw_connection()
-        cursor = connection.cursor()
         q = sql.SQL("""DELETE FROM _datafile WHERE "Id" = {idx}""").format(
             idx=sql.Literal(str(idx))
         )
-        cursor.execute(q)
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with borrowed_cursor(session) as (connection, cursor):
+            cursor.execute(q)
+            connection.commit()
     except Exception as exc:
         err_str = f"Error deleting record from _datafile table: {exc}"
         print(err_str)
@@ -1095,34 +2836,33 @@ def remove_record_from_datafile_table(session, idx) -> Optional[str]:
 
 
 def remove_vote_counts(session: Session, id: int) -> Optional[str]:
-    """Remove all VoteCount data from a particular file, and remove that file from _datafile"""
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    try:
-        q = 'SELECT "Id", file_name, download_date, created_at, is_preliminary FROM _datafile WHERE _datafile."Id"=%s;'
-        cursor.execute(q, [id])
-        (
-            datafile_id,
-            file_name,
-            download_date,
-            created_at,
-            preliminary,
-        ) = cursor.fetchall()[0]
-    except KeyError as exc:
-        cursor.close()
-        connection.close()
-        return f"No datafile found with Id = {id}: {exc}"
-    try:
-        q = 'DELETE FROM "VoteCount" where "_datafile_Id"=%s;Delete from _datafile where "Id"=%s;'
-        cursor.execute(q, [id, id])
-        connection.commit()
-        print(f"{file_name}: VoteCounts deleted from db for datafile id {id}\n")
-        err_str = None
-    except Exception as exc:
-        err_str = f"{file_name}: Error deleting data: {exc}"
-        print(err_str)
-    cursor.close()
-    connection.close()
+    """Remove all VoteCount data from a particular file, and remove that file from _datafile.
+    If VoteCount is partitioned, only the election's partition is scanned, and it is detached
+    and dropped if no other file has vote counts in it"""
+    with borrowed_cursor(session) as (connection, cursor):
+        try:
+            q = 'SELECT "Id", file_name, download_date, created_at, is_preliminary, "Election_Id" FROM _datafile WHERE _datafile."Id"=%s;'
+            cursor.execute(q, [id])
+            (
+                datafile_id,
+                file_name,
+                download_date,
+                created_at,
+                preliminary,
+                election_id,
+            ) = cursor.fetchall()[0]
+        except KeyError as exc:
+            return f"No datafile found with Id = {id}: {exc}"
+        try:
+            delete_vote_counts_cursor(cursor, election_id, id)
+            cursor.execute('Delete from _datafile where "Id"=%s;', [id])
+            refresh_contest_totals_cursor(cursor, [id])
+            connection.commit()
+            print(f"{file_name}: VoteCounts deleted from db for datafile id {id}\n")
+            err_str = None
+        except Exception as exc:
+            err_str = f"{file_name}: Error deleting data: {exc}"
+            print(err_str)
     return err_str
 
 
@@ -1239,25 +2979,23 @@ def get_jurisdiction_hierarchy(session: Session, jurisdiction_id: int) -> Option
         LIMIT   1
     """
     )
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    try:
-        cursor.execute(
-            q,
-            [
-                jurisdiction_id,
-                tuple(
-                    constants.contest_types_model
-                ),  # list of election-district reporting-unit types
-                jurisdiction_id,
-                jurisdiction_id,
-            ],
-        )
-        result = cursor.fetchall()
-        subdivision_type = result[0][0]
-    except:
-        subdivision_type = None
-    cursor.close()
+    with borrowed_cursor(session) as (connection, cursor):
+        try:
+            cursor.execute(
+                q,
+                [
+                    jurisdiction_id,
+                    tuple(
+                        constants.contest_types_model
+                    ),  # list of election-district reporting-unit types
+                    jurisdiction_id,
+                    jurisdiction_id,
+                ],
+            )
+            result = cursor.fetchall()
+            subdivision_type = result[0][0]
+        except:
+            subdivision_type = None
     return subdivision_type
 
 
@@ -1271,17 +3009,15 @@ def unsummed_vote_counts_with_rollup_subdivision_id(
     the id of the subdivision (e.g. county) containing the reporting unit (e.g., precinct)
      attached to each vote count.
     """
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
     q = sql.SQL(
         """
             SELECT  vc."Id" AS "VoteCount_Id", "Count", 
                     vc."ReportingUnit_Id", "Contest_Id", "Selection_Id",
-                    vc."Election_Id", cruj."ParentReportingUnit_Id",
-                    cru."Name", 
+                    vc."Election_Id", ruc."Ancestor_Id" AS "ParentReportingUnit_Id",
+                    cru."Name",
                     cru."ReportingUnitType",
-                    IntermediateRU."Name" AS "ParentName", 
-                    IntermediateRU."ReportingUnitType" AS "ParentReportingUnitType",
+                    IntermediateRU."Name" AS "ParentName",
+                    ruc."AncestorReportingUnitType" AS "ParentReportingUnitType",
                     vc."CountItemType", C."Name" AS "Contest",
                     Cand."BallotName" AS "Selection", 
                     "ElectionDistrict_Id", ED."Name" as "ElectionDistrict",
@@ -1295,27 +3031,18 @@ def unsummed_vote_counts_with_rollup_subdivision_id(
                     JOIN "CandidateContest" ON C."Id" = "CandidateContest"."Id"
                     JOIN "Office" O ON "CandidateContest"."Office_Id" = O."Id"
                     JOIN "ReportingUnit" ED ON O."ElectionDistrict_Id" = ED."Id" -- election district
-                    JOIN "ComposingReportingUnitJoin" cruj ON cruj."ChildReportingUnit_Id" = vc."ReportingUnit_Id"
-                    JOIN "ReportingUnit" cru ON cruj."ChildReportingUnit_Id" = cru."Id" -- reporting unit for count
-                    JOIN "ReportingUnit" IntermediateRU ON cruj."ParentReportingUnit_Id" = IntermediateRU."Id" -- reporting unit for county (or county-like) 
+                    JOIN {closure} ruc ON ruc."Descendant_Id" = vc."ReportingUnit_Id"
+                        AND ruc."AncestorReportingUnitType" = %s --  subdivision type
+                    JOIN "ReportingUnit" cru ON vc."ReportingUnit_Id" = cru."Id" -- reporting unit for count
+                    JOIN "ReportingUnit" IntermediateRU ON ruc."Ancestor_Id" = IntermediateRU."Id" -- reporting unit for county (or county-like)
                     JOIN "CandidateSelection" CS ON CS."Id" = vc."Selection_Id"
                     JOIN "Candidate" Cand ON CS."Candidate_Id" = Cand."Id"
                      JOIN "Party" p on CS."Party_Id" = p."Id"
                 WHERE d."Election_Id" = %s  -- election_id
                     AND d."ReportingUnit_Id" = %s  -- jurisdiction_id
-                        AND IntermediateRU."ReportingUnitType" = %s --  subdivision type
                         AND C.contest_type = 'Candidate'
     """
-    )
-    cursor.execute(
-        q,
-        [
-            election_id,
-            jurisdiction_id,
-            subdivision_type,
-        ],
-    )
-    result = cursor.fetchall()
+    ).format(closure=sql.Identifier(ru_closure_table))
     columns = [
         "VoteCount_Id",
         "Count",
@@ -1338,16 +3065,18 @@ def unsummed_vote_counts_with_rollup_subdivision_id(
         "contest_district_type",
         "Party",
     ]
-    result_df = pd.DataFrame(result, columns=columns)
+    result_df = read_query(
+        session,
+        q,
+        params=[subdivision_type, election_id, jurisdiction_id],
+        columns=columns,
+    )
     return result_df
 
 
 def get_contest_with_unknown(
     session: Session, election_id: int, top_ru_id: int
 ) -> List[str]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-
     q = sql.SQL(
         """select distinct c."Name"
 from "VoteCount" vc
@@ -1362,20 +3091,19 @@ where
 and cruj."ParentReportingUnit_Id" = %s
 ;"""
     )
-    cursor.execute(q, (election_id, top_ru_id))
-    result = cursor.fetchall()
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q, (election_id, top_ru_id))
+        result = cursor.fetchall()
     contests = [x[0] for x in result]
     return contests
 
 
 def selection_ids_from_candidate_id(session: Session, candidate_id: int) -> List[int]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-
     q = sql.SQL("""SELECT "Id" from "CandidateSelection" where "Candidate_Id" = %s""")
 
-    cursor.execute(q, (candidate_id,))
-    selection_id_list = [x for (x,) in cursor.fetchall()]
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q, (candidate_id,))
+        selection_id_list = [x for (x,) in cursor.fetchall()]
 
     return selection_id_list
 
@@ -1392,13 +3120,15 @@ def export_rollup_from_db(
     by_vote_type: bool = False,
     include_party_column: bool = False,
     contest: Optional[str] = None,
+    use_contest_totals: bool = True,
 ) -> (pd.DataFrame, Optional[str]):
     """Return a dataframe of rolled-up results and an error string.
     If by_vote_type, return separate rows for each vote type.
-    If exclude_redundant_total then, if both total and other vote types are given, exclude total"""
+    If exclude_redundant_total then, if both total and other vote types are given, exclude total.
+    If use_contest_totals, read from the precomputed contest totals if they are known to be
+    current for every datafile in <datafile_list>; otherwise sum VoteCount"""
+    datafile_list = tuple(datafile_list)
 
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
     # define the 'where' sql clause based on restrictions from parameters
     # and the string variables to be passed to query
     restrict = sql.SQL("")
@@ -1515,11 +3245,12 @@ def export_rollup_from_db(
         count_item_type_sql = sql.Literal("total")
 
     if exclude_redundant_total:
-        election_id = name_to_id_cursor(cursor, "Election", election)
-        jurisdiction_id = name_to_id_cursor(cursor, "ReportingUnit", top_ru)
-        active = active_vote_types_from_ids(
-            cursor, election_id=election_id, jurisdiction_id=jurisdiction_id
-        )
+        election_id = name_to_id(session, "Election", election)
+        jurisdiction_id = name_to_id(session, "ReportingUnit", top_ru)
+        with borrowed_cursor(session) as (connection, cursor):
+            active = active_vote_types_from_ids(
+                cursor, election_id=election_id, jurisdiction_id=jurisdiction_id
+            )
         if len(active) > 1 and "total" in active:
             restrict = sql.Composed(
                 [
@@ -1541,7 +3272,7 @@ def export_rollup_from_db(
             ]
         )
 
-    q = sql.SQL(
+    q_template = sql.SQL(
         """
     SELECT %s contest_type,  -- contest_type
         C."Name" "Contest",
@@ -1549,33 +3280,29 @@ def export_rollup_from_db(
         {selection} "Selection",
         IntermediateRU."Name" "ReportingUnit",
         {count_item_type_sql} "CountItemType",
-        sum(vc."Count") "Count" 
+        sum(vc."Count") "Count"
         {select_party}
-    FROM "VoteCount" vc
+    FROM {counts} vc
     LEFT JOIN _datafile d on vc."_datafile_Id" = d."Id"
     LEFT JOIN "Contest" C on vc."Contest_Id" = C."Id"
     {selection_join}
     {party_join}
-    LEFT JOIN "Election" e on vc."Election_Id" = e."Id"
-    -- sum over all children
-    LEFT JOIN "ReportingUnit" ChildRU on vc."ReportingUnit_Id" = ChildRU."Id"
-    LEFT JOIN "ComposingReportingUnitJoin" CRUJ_sum on ChildRU."Id" = CRUJ_sum."ChildReportingUnit_Id"
-    -- roll up to the intermediate RUs
-    LEFT JOIN "ReportingUnit" IntermediateRU on CRUJ_sum."ParentReportingUnit_Id" =IntermediateRU."Id"
+    {rollup_join}
     -- intermediate RUs must nest in top RU
-    LEFT JOIN "ComposingReportingUnitJoin" CRUJ_top on IntermediateRU."Id" = CRUJ_top."ChildReportingUnit_Id"
-    LEFT JOIN "ReportingUnit" TopRU on CRUJ_top."ParentReportingUnit_Id" = TopRU."Id"
+    JOIN {closure} RUC_top on IntermediateRU."Id" = RUC_top."Descendant_Id"
+    LEFT JOIN "ReportingUnit" TopRU on RUC_top."Ancestor_Id" = TopRU."Id"
     {election_district_join}
     WHERE C.contest_type = %s -- contest type
-        AND e."Name" = %s -- election name
+        AND vc."Election_Id" = (SELECT "Id" FROM "Election" WHERE "Name" = %s) -- election name
         AND TopRU."Name" = %s  -- top RU
-         AND %s = IntermediateRU."ReportingUnitType"  -- intermediate_reporting_unit_type
+         AND %s = {intermediate_type}  -- intermediate_reporting_unit_type
        AND d.{by} in %s  -- tuple of datafile short_names (if by='short_name) or Ids (if by="Id")
         {restrict}
     GROUP BY {group_and_order_by}
     ORDER BY {group_and_order_by};
     """
-    ).format(
+    )
+    format_args = dict(
         count_item_type_sql=count_item_type_sql,
         by=sql.Identifier(by),
         group_and_order_by=group_and_order_by,
@@ -1585,17 +3312,50 @@ def export_rollup_from_db(
         party_join=party_join,
         election_district_join=election_district_join,
         select_party=select_party,
+        closure=sql.Identifier(ru_closure_table),
+    )
+    # contest totals are already summed to each intermediate RU
+    q_totals = q_template.format(
+        counts=sql.Identifier(contest_total_table),
+        rollup_join=sql.SQL(
+            """LEFT JOIN "ReportingUnit" IntermediateRU on vc."ReportingUnit_Id" = IntermediateRU."Id" """
+        ),
+        intermediate_type=sql.SQL('vc."ReportingUnitType"'),
+        **format_args,
+    )
+    # otherwise roll up each child to the intermediate RU of the given type containing it
+    q = q_template.format(
+        counts=sql.Identifier("VoteCount"),
+        rollup_join=sql.SQL(
+            """JOIN {closure} RUC_sum on vc."ReportingUnit_Id" = RUC_sum."Descendant_Id"
+    LEFT JOIN "ReportingUnit" IntermediateRU on RUC_sum."Ancestor_Id" = IntermediateRU."Id" """
+        ).format(closure=sql.Identifier(ru_closure_table)),
+        intermediate_type=sql.SQL('RUC_sum."AncestorReportingUnitType"'),
+        **format_args,
     )
 
-    try:
-        cursor.execute(q, string_vars)
-        results = cursor.fetchall()
-        results_df = pd.DataFrame(results, columns=columns)
-        err_str = None
-    except Exception as exc:
-        results_df = pd.DataFrame()
-        err_str = f"No results exported due to database error: {exc}"
-    cursor.close()
+    with borrowed_cursor(session) as (connection, cursor):
+        results = None
+        if (
+            use_contest_totals
+            and contest_totals_exist(cursor)
+            and contest_totals_current(cursor, datafile_list, by=by)
+        ):
+            try:
+                cursor.execute(q_totals, string_vars)
+                results = cursor.fetchall()
+            except Exception:
+                connection.rollback()
+                results = None
+        try:
+            if results is None:
+                cursor.execute(q, string_vars)
+                results = cursor.fetchall()
+            results_df = pd.DataFrame(results, columns=columns)
+            err_str = None
+        except Exception as exc:
+            results_df = pd.DataFrame()
+            err_str = f"No results exported due to database error: {exc}"
     return results_df, err_str
 
 
@@ -1610,6 +3370,40 @@ def read_vote_count(
     election. But this table is the largest one, so we don't want to use pandas methods
     to read into a DF and then filter. Data returns is determined by <fields> (column names from SQL query);
     the columns in the returned database can be renamed as <aliases>"""
+    q = read_vote_count_query(
+        election_id=election_id, jurisdiction_id=jurisdiction_id, fields=fields
+    )
+    return read_query(session, q, columns=aliases)
+
+
+def read_vote_count_chunks(
+    session: Session,
+    election_id: Optional[int] = None,
+    jurisdiction_id: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    aliases: Optional[List[str]] = None,
+    order_by: Optional[List[str]] = None,
+    chunk_rows: int = constants.stream_chunk_rows,
+) -> Iterator[pd.DataFrame]:
+    """As read_vote_count, but yields the results in dataframes of at most <chunk_rows> rows.
+    If <order_by> (a list of fields) is given, rows are sorted by those fields in the database."""
+    q = read_vote_count_query(
+        election_id=election_id,
+        jurisdiction_id=jurisdiction_id,
+        fields=fields,
+        order_by=order_by,
+    )
+    return stream_query(session, q, columns=aliases, chunk_rows=chunk_rows)
+
+
+def read_vote_count_query(
+    election_id: Optional[int] = None,
+    jurisdiction_id: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    order_by: Optional[List[str]] = None,
+) -> sql.Composed:
+    """Returns query for read_vote_count. Text fields in <order_by> are sorted
+    by code point (as in python), not by the database's collation."""
 
     # create the WHERE clause if necessary
     if not election_id and not jurisdiction_id:
@@ -1632,8 +3426,21 @@ def read_vote_count(
         else:
             where = sql.SQL("")
 
+    if order_by:
+        order = sql.SQL("ORDER BY {fields}").format(
+            fields=sql.SQL(",").join(
+                sql.SQL('{field} COLLATE "C"').format(field=sql.Identifier(field))
+                if field not in ["Count", "is_preliminary"]
+                else sql.Identifier(field)
+                for field in order_by
+            )
+        )
+    else:
+        order = sql.SQL("")
+
     q = sql.SQL(
         """
+        SELECT  * FROM (
         SELECT  DISTINCT {fields}
         FROM    (
                     SELECT  "Id" as "VoteCount_Id", "Contest_Id", "Selection_Id",
@@ -1661,17 +3468,15 @@ def read_vote_count(
                 JOIN (SELECT "Id" as "GP_Id", "Name" AS "GPReportingUnitName", "ReportingUnitType" AS "GPType" FROM "ReportingUnit") gpru on vc."ReportingUnit_Id" = gpru."GP_Id"
                 JOIN (SELECT "Id", "Name" as "ElectionName", "ElectionType" FROM "Election") e on vc."Election_Id" = e."Id"
         {where}
+        ) v
+        {order}
         """
     ).format(
         fields=sql.SQL(",").join(sql.Identifier(field) for field in fields),
         where=where,
+        order=order,
     )
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q)
-    results = cursor.fetchall()
-    results_df = pd.DataFrame(results, columns=aliases)
-    return results_df
+    return q
 
 
 def list_to_id(session: Session, element: str, names: List[str]) -> Optional[int]:
@@ -1848,13 +3653,11 @@ def display_jurisdictions(session: Session, cols: List[str]) -> pd.DataFrame:
         ORDER BY order_by
     """
     ).format(states=sql.Literal(constants.array_of_jurisdictions))
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q)
-    result = cursor.fetchall()
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q)
+        result = cursor.fetchall()
     result_df = pd.DataFrame(result)
     result_df.columns = cols
-    cursor.close()
     return result_df
 
 
@@ -1870,13 +3673,11 @@ def vote_types_by_juris(session: Session, election: str) -> Dict[str, List[str]]
     WHERE el."Name" = {election};
     """
     ).format(election=sql.Literal(election))
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q)
-    result = cursor.fetchall()
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q)
+        result = cursor.fetchall()
     result_df = pd.DataFrame(result, columns=["jurisdiction", "CountItemType"])
 
-    cursor.close()
     vote_types = dict(result_df.groupby("jurisdiction")["CountItemType"].apply(list))
     return vote_types
 
@@ -1905,10 +3706,9 @@ def contest_families_by_juris(
     ).format(
         election=sql.Literal(election),
     )
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q)
-    result = cursor.fetchall()
+    with borrowed_cursor(session) as (connection, cursor):
+        cursor.execute(q)
+        result = cursor.fetchall()
     result_df = pd.DataFrame(
         result,
         columns=[
@@ -1917,8 +3717,6 @@ def contest_families_by_juris(
             "ReportingUnitType",
         ],
     )
-
-    cursor.close()
     return result_df
 
 
@@ -1932,14 +3730,13 @@ def parents_by_cursor(
     ru_id_list = [int(n) for n in ru_id_list]
     q = sql.SQL(
         """
-    SELECT child."Id", parent."Id"
-    FROM "ReportingUnit" as child
-    LEFT JOIN "ComposingReportingUnitJoin" as cruj on cruj."ChildReportingUnit_Id" = child."Id"
-    LEFT JOIN "ReportingUnit" as parent on cruj."ParentReportingUnit_Id" = parent."Id"
-    WHERE  (parent."ReportingUnitType" = {subunit_type})
-    and child."Id" in {ru_id_list}
+    SELECT ruc."Descendant_Id", ruc."Ancestor_Id"
+    FROM {closure} ruc
+    WHERE  ruc."AncestorReportingUnitType" = {subunit_type}
+    and ruc."Descendant_Id" in {ru_id_list}
     """
     ).format(
+        closure=sql.Identifier(ru_closure_table),
         subunit_type=sql.Literal(subunit_type),
         ru_id_list=sql.Literal(tuple(ru_id_list)),
     )
@@ -1965,12 +3762,19 @@ def parents(
 ) -> (pd.DataFrame, Optional[str]):
     """returns dataframe of all reporting units of the given type that are
     parents of a reporting unit identified by an id in ru_id_list
+    (looked up in memory, from the closure of the ReportingUnit hierarchy)
     """
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    parent_df, err_str = parents_by_cursor(
-        cursor, ru_id_list, subunit_type=subunit_type
-    )
+    err_str = None
+    try:
+        child_ids = np.unique(np.asarray(list(ru_id_list), dtype=np.int64))
+        parent_ids = ancestor_ids(session, child_ids, subunit_type)
+        found = parent_ids >= 0
+        parent_df = pd.DataFrame(
+            {"child_id": child_ids[found], "parent_id": parent_ids[found]}
+        )
+    except Exception as exc:
+        parent_df = pd.DataFrame()
+        err_str = f"No results exported due to database error: {exc}"
     return parent_df, err_str
 
 
@@ -2003,10 +3807,8 @@ def get_vote_count_types_cursor(
 def get_vote_count_types(
     session: Session, election: str, jurisdiction: str
 ) -> Set[str]:
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    vct_set = get_vote_count_types_cursor(cursor, election, jurisdiction)
-    connection.close()
+    with borrowed_cursor(session) as (connection, cursor):
+        vct_set = get_vote_count_types_cursor(cursor, election, jurisdiction)
     return vct_set
 
 
@@ -2045,7 +3847,7 @@ def read_vote_count_nist(
                     FROM    "VoteCount"
                 ) vc
                 JOIN (SELECT "Id", "Name" as "ContestName" , contest_type as "ContestType" FROM "Contest") con on vc."Contest_Id" = con."Id"
-                JOIN "ComposingReportingUnitJoin" cruj ON vc."ReportingUnit_Id" = cruj."ChildReportingUnit_Id"
+                JOIN {closure} ruc ON vc."ReportingUnit_Id" = ruc."Descendant_Id"
                 JOIN "CandidateSelection" cs ON vc."Selection_Id" = cs."Id"
                 JOIN "Candidate" c on cs."Candidate_Id" = c."Id"
                 JOIN (SELECT "Id", "Name" AS "PartyName" FROM "Party") p ON cs."Party_Id" = p."Id"
@@ -2057,16 +3859,15 @@ def read_vote_count_nist(
                 JOIN (SELECT "Id" as "GP_Id", "Name" AS "GPReportingUnitName", "ReportingUnitType" AS "GPType" FROM "ReportingUnit") gpru on vc."ReportingUnit_Id" = gpru."GP_Id"
                 JOIN (SELECT "Id", "Name" as "ElectionName",  "ElectionType" FROM "Election") e on vc."Election_Id" = e."Id"
         WHERE   "Election_Id" = %s
-                AND "ParentReportingUnit_Id" = %s
+                AND ruc."Ancestor_Id" = %s
         """
     ).format(
         fields=sql.SQL(",").join(sql.Identifier(field) for field in fields),
+        closure=sql.Identifier(ru_closure_table),
+    )
+    unrolled_df = read_query(
+        session, q, params=[election_id, reporting_unit_id], columns=fields
     )
-    connection = session.bind.raw_connection()
-    cursor = connection.cursor()
-    cursor.execute(q, [election_id, reporting_unit_id])
-    results = cursor.fetchall()
-    unrolled_df = pd.DataFrame(results, columns=fields)
 
     if rollup_ru_type:
         results_df, new_err = an.rollup_dataframe(
@@ -2084,9 +3885,13 @@ def read_vote_count_nist(
     return results_df
 
 
-def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
+def create_common_data_format_tables(
+    session, dirpath="CDF_schema_def_info/", partition_vote_count: bool = False
+):
     """schema example: 'cdf'; Creates cdf tables in the given schema
-    (or directly in the db if schema == None)
+    (or directly in the db if schema == None).
+    If <partition_vote_count>, VoteCount is created partitioned by Election_Id
+    (see ensure_vote_count_partitions)
     """
     eng = session.bind
     metadata = MetaData(bind=eng)
@@ -2131,6 +3936,11 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
             # create_indices = [[get_name_field(element)]]
             create_indices = None
             # TODO fix for efficiency -- note <contest_type>Contest, <contest_type>Selection may need special treatment
+        if element == "VoteCount" and partition_vote_count:
+            # see ensure_vote_count_partitions
+            partition_key = "Election_Id"
+        else:
+            partition_key = None
 
         # create db table for element
         create_table(
@@ -2140,6 +3950,7 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
             "elements",
             dirpath,
             create_indices=create_indices,
+            partition_key=partition_key,
         )
         # remove element from list of yet-to-be-processed
         elements_to_process.remove(element)
@@ -2179,14 +3990,27 @@ def create_common_data_format_tables(session, dirpath="CDF_schema_def_info/"):
     # push all tables to db
     metadata.create_all()
     session.flush()
+
+    # create tables derived from cdf tables (not part of the cdf schema)
+    err_str = ensure_derived_tables(session)
+    if err_str:
+        print(err_str)
     return metadata
 
 
 def create_table(
-    metadata, id_seq, name, table_type, dirpath, create_indices: list = None
+    metadata,
+    id_seq,
+    name,
+    table_type,
+    dirpath,
+    create_indices: list = None,
+    partition_key: Optional[str] = None,
 ):
     """Each element of the list <create_indices>, should be a list of
-    columns on which an index should be created."""
+    columns on which an index should be created.
+    If <partition_key> is given (elements only), the table is partitioned by list
+    on that column, which becomes part of the primary key."""
     t_path = os.path.join(dirpath, table_type, name)
     if name == "Selection":
         # Selection table has only Id column
@@ -2236,12 +4060,21 @@ def create_table(
         ]
         # omit 'foreign keys' that refer to more than one table,
         #  e.g. Contest_Id to BallotMeasureContest and CandidateContest
+        # primary key of a partitioned table must include the partition key
         foreign_key_list = [
-            Column(r["fieldname"], ForeignKey(f'{r["refers_to"]}.Id'))
+            Column(
+                r["fieldname"],
+                ForeignKey(f'{r["refers_to"]}.Id'),
+                primary_key=(r["fieldname"] == partition_key),
+            )
             for i, r in df["foreign_keys"].iterrows()
             if ";" not in r["refers_to"]
         ]
         foreign_ish_keys = [r["fieldname"] for i, r in df["foreign_keys"].iterrows()]
+        if partition_key:
+            partition_args = {"postgresql_partition_by": f'LIST ("{partition_key}")'}
+        else:
+            partition_args = dict()
 
         # specified unique constraints
         df["unique_constraints"]["arg_list"] = df["unique_constraints"][
@@ -2298,6 +4131,7 @@ def create_table(
                 *null_constraint_list,
                 *unique_constraint_list,
                 *time_stamp_list,
+                **partition_args,
             )
             Index(f"{t}_parent", t.c.Id)
 
@@ -2475,7 +4309,13 @@ def reset_db(session, dirpath):
 
     join_path = os.path.join(dirpath, "Joins")
     joins_to_process = [f for f in os.listdir(join_path) if f[0] != "."]
-    for table in joins_to_process:
+    for table in joins_to_process + [
+        ru_closure_table,
+        contest_total_table,
+        contest_total_datafile_table,
+        anomaly_score_table,
+        anomaly_score_source_table,
+    ]:
         conn.execute(f'DROP TABLE IF EXISTS "{table}" CASCADE;')
         session.commit()
     conn.close()
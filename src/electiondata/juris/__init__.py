@@ -406,9 +406,9 @@ def clean_and_dedupe(f_path: str, clean_candidates=False):
         df = df[df.Name != "none or unknown"]
     for c in df.columns:
         if not is_numeric_dtype(df.dtypes[c]):
-            df[c].fillna("", inplace=True)
             try:
-                df[c] = df[c].apply(m.compress_whitespace)
+                # nulls become the empty string
+                df[c] = m.normalize_strings(df[c])
             except Exception:
                 # failure shouldn't break anything
                 print(f"No whitespace compression on column {c} of {f_path}")
@@ -674,7 +674,7 @@ def load_or_update_juris_to_db(
         )
         err = ui.consolidate_errors([err, new_err])
         if ui.fatal_error(new_err):
-            return err
+            return mark_anomaly_scores_stale(session, juris_true_name, err)
 
     # Load CandidateContests and BallotMeasureContests
     for contest_type in ["BallotMeasure", "Candidate"]:
@@ -686,6 +686,21 @@ def load_or_update_juris_to_db(
             err,
         )
         err = ui.consolidate_errors([err, new_err])
+    return mark_anomaly_scores_stale(session, juris_true_name, err)
+
+
+def mark_anomaly_scores_stale(
+    session: Session, juris_true_name: str, err: Optional[dict]
+) -> Optional[dict]:
+    """Marks the stored anomaly scores of the jurisdiction's election-jurisdiction pairs as stale,
+    since its reporting units, candidates or parties may have changed. Returns <err>, with any
+    error from marking added"""
+    jurisdiction_id = db.name_to_id(session, "ReportingUnit", juris_true_name)
+    if jurisdiction_id is None:
+        return err
+    err_str = db.mark_anomaly_scores_stale(session, jurisdiction_id)
+    if err_str:
+        err = ui.add_new_error(err, "warn-database", session.bind.url.database, err_str)
     return err
 
 
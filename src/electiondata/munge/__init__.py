@@ -8,13 +8,21 @@ from electiondata import (
     constants,
 )
 import pandas as pd
+import numpy as np
 from pandas.api.types import is_numeric_dtype
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 import re
 import os
 from sqlalchemy.orm.session import Session, engine
 import copy
 
+# absolute path of munger file -> CompiledMunger, for each munger compiled since it was last modified
+compiled_mungers = dict()
+# absolute path of dictionary file -> DictionaryIndex, for each dictionary compiled since it was last modified
+compiled_dictionaries = dict()
+# fields in munge formulas, e.g. <County> in <County>;<Precinct>
+angle_field_pattern = re.compile("<([^>]*)>")
+
 
 def clean_count_cols(
     df: pd.DataFrame, cols: Optional[List[str]], thousands: Optional[str] = None
@@ -87,31 +95,85 @@ def clean_strings(
         except Exception as exc:
             print(f"Could not convert column {c} to strings: {exc}")
 
-        if c in cols:
-            # change nulls to the empty string
-            working[c] = working[c].fillna("")
-            # replace any double quotes with single quotes
-            try:
-                # replace any " by '
-                mask = working[c].str.contains('"').fillna(False)
-                working.loc[mask, c] = working[c].str.replace('"', "'")[mask]
-            except AttributeError or TypeError:
-                pass
-            try:
-                # strip extraneous whitespace from any value recognized as string
-                mask = working[c].apply(lambda x: isinstance(x, str))
-                working.loc[mask, c] = working[c][mask].apply(compress_whitespace)
-            except (AttributeError, TypeError):
-                pass
+        # change nulls to the empty string, replace any double quotes with single quotes
+        # and strip extraneous whitespace (once per distinct value), leaving a column of str objects
+        try:
+            working[c] = normalize_strings(working[c], replace_double_quotes=True)
+        except (AttributeError, TypeError):
+            pass
     return working
 
 
+def apply_to_distinct(
+    s: pd.Series, func, dtype: Optional[str] = None, na_value: Any = None
+) -> pd.Series:
+    """
+    Inputs:
+        s: pd.Series, a series (of any dtype, including categorical)
+        func: function taking and returning a series, applied elementwise in effect
+        dtype: Optional[str] = None, dtype of returned series (defaults to object)
+        na_value: Any = None, value for null entries of <s> (if None, <func> is applied to null as well)
+
+    Returns:
+        pd.Series, with index of <s>, whose entries are the results of <func> applied to the entries of <s>.
+            <func> is applied only to the distinct values of <s>, and results are broadcast back
+            by integer codes, so the work done by <func> depends on the number of distinct values,
+            not the number of entries
+    """
+    codes, uniques = pd.factorize(s)
+    values = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    if na_value is None:
+        na_value = func(pd.Series([np.nan], dtype=object)).iloc[0]
+    results = np.empty(values.size + 1, dtype=object)
+    results[: values.size] = func(values).to_numpy(dtype=object)
+    # code -1 marks nulls
+    results[-1] = na_value
+    return pd.Series(results[codes], index=s.index, dtype=dtype)
+
+
+def normalize_unique_strings(
+    values: pd.Series, replace_double_quotes: bool = False
+) -> pd.Series:
+    """Vectorized compress_whitespace (see there), applied to each entry of <values>.
+    Entries that are not strings become the empty string. If <replace_double_quotes>,
+    double quotes are first replaced by single quotes."""
+    is_str = values.map(lambda x: isinstance(x, str)).astype(bool)
+    normalized = pd.Series("", index=values.index, dtype=object)
+    text = values[is_str].astype(object)
+    if replace_double_quotes:
+        text = text.str.replace('"', "'", regex=False)
+    text = (
+        text.str.replace(constants.whitespace_run_pattern, r"\1", regex=True)
+        .str.strip()
+        .str.replace("\n", " ", regex=False)
+    )
+    normalized[is_str] = text
+    return normalized
+
+
+def normalize_strings(
+    s: pd.Series, replace_double_quotes: bool = False, dtype: Optional[str] = None
+) -> pd.Series:
+    """Returns <s> with compress_whitespace applied to each entry (nulls and non-strings
+    become the empty string), and, if <replace_double_quotes>, with double quotes replaced by
+    single quotes. The work is done once per distinct value of <s>."""
+    return apply_to_distinct(
+        s,
+        lambda v: normalize_unique_strings(
+            v, replace_double_quotes=replace_double_quotes
+        ),
+        dtype=dtype,
+        na_value="",
+    )
+
+
 def add_regex_column(
     df: pd.DataFrame,
     old_col: str,
     new_col: str,
     pattern_str: str,
     munger_name: str,
+    pattern: Optional[re.Pattern] = None,
 ) -> (pd.DataFrame, Optional[dict]):
     """
     Required inputs:
@@ -121,6 +183,8 @@ def add_regex_column(
         pattern_str: str, regular expression with at least one capturing group
             (NB: only the first capturing group will matter)
         munger_name: str, for error reporting
+    Optional inputs:
+        pattern: Optional[re.Pattern] = None, <pattern_str> already compiled, if available
 
     Returns:
         pd.DataFrame, <df> with one column named <new_col> appended. The <new_col> column value for each row is
@@ -132,7 +196,10 @@ def add_regex_column(
     err = None
     working = df.copy()
     try:
-        p = re.compile(pattern_str)
+        if pattern is None:
+            p = re.compile(pattern_str)
+        else:
+            p = pattern
         # replace via regex if possible; otherwise msg
         # # put informative error message in new_col (to be overwritten if no error)
         old = working[old_col].copy()
@@ -142,9 +209,7 @@ def add_regex_column(
 
         # # where regex succeeds, replace error message with good value
         mask = working[old_col].str.match(p)
-        working.loc[mask, new_col] = working[mask][old_col].str.extract(
-            pattern_str, expand=False
-        )
+        working.loc[mask, new_col] = working[mask][old_col].str.extract(p, expand=False)
 
     except re.error as e:
         err = ui.add_new_error(
@@ -185,10 +250,12 @@ def add_column_from_formula(
     err: Optional[dict],
     munger_name: str,
     suffix=None,
+    regexes: Optional[Dict[str, re.Pattern]] = None,
 ) -> (pd.DataFrame, Optional[dict]):
     """If <suffix> is given, add it to each field in the formula
     If formula is enclosed in braces, parse first entry as formula, second as a
-    regex (with one parenthesized group) as a recipe for pulling the value via regex analysis
+    regex (with one parenthesized group) as a recipe for pulling the value via regex analysis.
+    Regexes found in <regexes> (keyed by pattern string) are used without recompiling
     """
     working = df.copy()
     #  for each {} pair in the formula, create a new column
@@ -200,7 +267,12 @@ def add_column_from_formula(
             old_col, pattern_str = x.groups()
             temp_col = f"extracted_from_{old_col}"
             working, new_err = add_regex_column(
-                working, old_col, temp_col, pattern_str, munger_name
+                working,
+                old_col,
+                temp_col,
+                pattern_str,
+                munger_name,
+                pattern=(regexes or dict()).get(pattern_str),
             )
             # change the formula to use the temp column
             formula = formula.replace(f"{{<{old_col}>,{pattern_str}}}", f"<{temp_col}>")
@@ -263,7 +335,7 @@ def compress_whitespace(s: Optional[str]) -> str:
     leading and trailing whitespace is eliminated
     and any carriage returns are changed to spaces"""
     try:
-        new_s = re.sub(r"(\s)\s+", "\\1", s)
+        new_s = constants.whitespace_run_pattern.sub("\\1", s)
         new_s = new_s.strip()
         new_s = new_s.replace("\n", " ")
     except Exception as exc:
@@ -271,41 +343,54 @@ def compress_whitespace(s: Optional[str]) -> str:
     return new_s
 
 
-def raw_to_internal_dictionary_df(
-    dictionary_df: pd.DataFrame,
-    element: str,
-):
-    """creates two-column dictionary dataframe labeled
-    <element>, <element>_raw
-    """
-
-    dictionary = dictionary_df.copy()
-    # restrict to the element at hand, drop column naming element
-    dictionary = (
-        dictionary[dictionary["cdf_element"] == element]
-        .copy()
-        .drop("cdf_element", axis=1)
-        .rename(
-            columns={
-                "cdf_internal_name": element,
-                "raw_identifier_value": f"{element}_raw",
-            }
-        )
-    )
-    # map NIST standard CountItemTypes to themselves if not already assigned in the dictionary
-    if element in constants.nist_standard.keys():
-        nist_standards = [
-            [x, x]
-            for x in constants.nist_standard[element]
-            if x not in dictionary[f"{element}_raw"]
-        ]
-        dictionary.append(nist_standards)
-    if element == "Candidate":
-        # Regularize candidate names from dictionary (to match what's done during upload of candidates to Candidate
-        #  table in db)
-        dictionary[element] = regularize_candidate_names(dictionary[element])
-
-    return dictionary
+class DictionaryIndex:
+    def __init__(self, dictionary_path: str):
+        """
+        Inputs:
+            dictionary_path: str, path to dictionary file (e.g., a jurisdiction's dictionary.txt)
+
+        Reads the dictionary file once into a hash map for each cdf_element, with attributes:
+            path: path to dictionary file
+            by_element: for each cdf_element, dictionary mapping raw identifier values to internal names
+                (for Candidate, internal names are regularized, to match what's done during
+                upload of candidates to the Candidate table in the db; raw identifier values are regularized too)
+        If a raw identifier value appears more than once for an element, the first entry is used.
+        """
+        self.path = dictionary_path
+        dictionary_df = pd.read_csv(dictionary_path, sep="\t")
+        self.by_element = dict()
+        for element, element_df in dictionary_df.groupby("cdf_element", sort=False):
+            raw = element_df["raw_identifier_value"]
+            internal = element_df["cdf_internal_name"]
+            if element == "Candidate":
+                # NB: regularizing can create duplicates (e.g., HILLARY CLINTON and Hillary Clinton
+                # regularize to the same)
+                raw = regularize_candidate_names(raw)
+                internal = regularize_candidate_names(internal)
+            pairs = pd.DataFrame({"raw": raw.values, "internal": internal.values})
+            pairs = pairs.drop_duplicates(subset=["raw"])
+            self.by_element[element] = dict(zip(pairs["raw"], pairs["internal"]))
+
+    def internal_names(self, element: str) -> Dict[Any, str]:
+        """Returns dictionary mapping raw identifier values to internal names for <element>
+        (empty if the dictionary file has no entries for <element>)"""
+        return self.by_element.get(element, dict())
+
+
+def compile_dictionary(dictionary_path: str) -> DictionaryIndex:
+    """Returns the index of the dictionary file at <dictionary_path>, compiling it only if it has not
+    been compiled since the dictionary file was last modified.
+    NB: indexes are kept in memory only, like compiled mungers. Compiling is a single read of the
+    file, so it is done once per process; writing indexes to disk would put generated files in the
+    jurisdiction directories of the repository, and reading them back would need to be at least
+    as safe as reading dictionary.txt itself."""
+    key = os.path.abspath(dictionary_path)
+    stat = os.stat(key)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = compiled_dictionaries.get(key)
+    if cached is None or cached[0] != version:
+        compiled_dictionaries[key] = (version, DictionaryIndex(dictionary_path))
+    return compiled_dictionaries[key][1]
 
 
 def replace_raw_with_internal_name(
@@ -313,16 +398,15 @@ def replace_raw_with_internal_name(
     munger_name: str,  # for error reporting
     file_name: str,  # for error reporting
     element: str,
-    dictionary_df: pd.DataFrame,
+    dictionary: DictionaryIndex,
     dictionary_path: str,
     drop_unmatched: bool = False,
     drop_all_ok: bool = False,
 ) -> (pd.DataFrame, Optional[dict]):
-    """Uses dictionary_df to replace raw names with names
+    """Uses <dictionary> (compiled from dictionary.txt) to replace raw names with names
     matching internal db standard. dictionary_path is for error reporting"""
     err = None
     working = df.copy()
-    dictionary = raw_to_internal_dictionary_df(dictionary_df, element)
 
     # report values not matched by regex
     regex_fail_mask = working[f"{element}_raw"].str.contains(
@@ -340,19 +424,12 @@ def replace_raw_with_internal_name(
             working = working[~regex_fail_mask]
 
     if element == "Candidate":
-        # Regularize candidate names from results file and from dictionary.txt
+        # Regularize candidate names from results file
+        # (raw names from dictionary.txt were regularized when the dictionary was compiled)
         working.Candidate_raw = regularize_candidate_names(working.Candidate_raw)
-        dictionary[f"Candidate_raw"] = regularize_candidate_names(
-            dictionary[f"Candidate_raw"]
-        )
-        # NB: regularizing can create duplicates (e.g., HILLARY CLINTON and Hillary Clinton regularize to the same)
-        dictionary.drop_duplicates(inplace=True)
 
-    working = working.merge(
-        dictionary,
-        how="left",
-        on=f"{element}_raw",
-    )
+    working = working.reset_index(drop=True)
+    working[element] = working[f"{element}_raw"].map(dictionary.internal_names(element))
 
     # identify where regex succeeded but result unmatched in dictionary
     unmatched = working[working[element].isnull() & working[f"{element}_raw"].notnull()]
@@ -485,7 +562,7 @@ def replace_raw_with_internal_ids(
     table_df: pd.DataFrame,
     element: str,
     internal_name_column: str,
-    dictionary_df: pd.DataFrame,
+    dictionary: DictionaryIndex,
     dictionary_path: str,
     drop_unmatched: bool = False,
     unmatched_id: int = 0,
@@ -502,7 +579,7 @@ def replace_raw_with_internal_ids(
         munger_name,
         file_name,
         element,
-        dictionary_df,
+        dictionary,
         dictionary_path,
         drop_unmatched=drop_unmatched,
         drop_all_ok=drop_all_ok,
@@ -541,10 +618,15 @@ def get_non_standard(
 def regularize_candidate_names(
     candidate_column: pd.Series,
 ) -> pd.Series:
-    ws = candidate_column.copy()
+    """Regularizes each distinct name once (see regularize_distinct_candidate_names)"""
+    return apply_to_distinct(candidate_column, regularize_distinct_candidate_names)
+
 
+def regularize_distinct_candidate_names(
+    candidate_column: pd.Series,
+) -> pd.Series:
     # compress whitespace
-    ws = ws.apply(compress_whitespace)
+    ws = normalize_unique_strings(candidate_column)
 
     mask = ws.str.isupper()
     # if original is all caps
@@ -663,6 +745,69 @@ def add_constant_column(
     return new_df
 
 
+def distinct_keys(
+    df: pd.DataFrame, count_cols: List[str]
+) -> (pd.DataFrame, np.ndarray):
+    """
+    Inputs:
+        df: pd.DataFrame, a dataframe
+        count_cols: List[str], columns of <df> holding counts
+
+    Returns:
+        pd.DataFrame, distinct combinations of the values in the columns of <df> other than <count_cols>,
+            in order of first appearance, with column <constants.distinct_key_column> numbering them 0, 1, 2, ...
+        np.ndarray, for each row of <df>, the number of its combination
+    """
+    key_cols = [c for c in df.columns if c not in count_cols]
+    if key_cols:
+        codes = (
+            df.groupby(key_cols, sort=False, dropna=False).ngroup().to_numpy("int64")
+        )
+    else:
+        codes = np.zeros(df.shape[0], dtype="int64")
+    n_keys, first_rows = np.unique(codes, return_index=True)
+    keys = df.iloc[first_rows][key_cols].reset_index(drop=True)
+    keys[constants.distinct_key_column] = n_keys
+    return keys, codes
+
+
+def broadcast_to_rows(
+    munged_keys: pd.DataFrame, codes: np.ndarray, counts: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Inputs:
+        munged_keys: pd.DataFrame, result of munging (some of) the distinct combinations returned by
+            distinct_keys(), with the column <constants.distinct_key_column> carried through
+        codes: np.ndarray, number of the combination for each row, as returned by distinct_keys()
+        counts: pd.DataFrame, the count columns of the original dataframe
+
+    Returns:
+        pd.DataFrame, the munged combination for each original row (rows whose combination
+            was dropped during munging are dropped), with the counts of that row
+    """
+    key_col = constants.distinct_key_column
+    # key may have been cast to string by cleaning steps
+    key = pd.to_numeric(munged_keys[key_col], errors="coerce")
+    munged = munged_keys[key.notnull()].drop(key_col, axis=1)
+    key = key[key.notnull()].to_numpy("int64")
+    if key.size == np.unique(key).size:
+        # each combination munged to at most one row: gather by position
+        position = np.full(codes.max() + 1 if codes.size else 0, -1, dtype="int64")
+        position[key] = np.arange(key.size)
+        row_position = position[codes]
+        kept = row_position >= 0
+        result = munged.iloc[row_position[kept]].reset_index(drop=True)
+        for c in counts.columns:
+            result[c] = counts[c].to_numpy()[kept]
+    else:
+        # some combination munged to several rows
+        code_df = counts.reset_index(drop=True).assign(**{key_col: codes})
+        result = code_df.merge(
+            munged.assign(**{key_col: key}), on=key_col, how="inner"
+        ).drop(key_col, axis=1)
+    return result
+
+
 def add_contest_id(
     df: pd.DataFrame,
     juris_true_name: str,
@@ -670,7 +815,7 @@ def add_contest_id(
     munger_name: str,
     err: Optional[dict],
     session: Session,
-    dictionary_df: pd.DataFrame,
+    dictionary: DictionaryIndex,
     dictionary_path: str,
 ) -> (pd.DataFrame, dict):
     working = df.copy()
@@ -696,7 +841,7 @@ def add_contest_id(
                 df_for_type[c_type],
                 f"{c_type}Contest",
                 "Name",
-                dictionary_df,
+                dictionary,
                 dictionary_path,
                 unmatched_id=none_or_unknown_id,
                 drop_all_ok=True,
@@ -869,7 +1014,7 @@ def raw_to_id_simple(
     file_name: str,
     munger_name: str,
     juris_system_name,
-    dictionary_df: pd.DataFrame,
+    dictionary: DictionaryIndex,
     dictionary_path: str,
 ) -> (pd.DataFrame, Optional[dict]):
     """Append ids to <df> for all elements given in <element_list>."""
@@ -885,9 +1030,8 @@ def raw_to_id_simple(
                 drop = False
             if element == "CountItemType":
                 # munge raw to internal CountItemType
-                r_i = raw_to_internal_dictionary_df(dictionary_df, "CountItemType")
-                recognized = r_i.CountItemType_raw.unique()
-                matched = working.CountItemType_raw.isin(recognized)
+                r_i = dictionary.internal_names("CountItemType")
+                matched = working.CountItemType_raw.isin(list(r_i.keys()))
                 if not matched.all():
                     unmatched = "\n".join(
                         (working[~matched]["CountItemType_raw"]).unique()
@@ -901,11 +1045,8 @@ def raw_to_id_simple(
                 # get list of raw CountItemTypes in case they are needed for error reporting
                 all_raw_cit = working.CountItemType_raw.unique().tolist()
                 # get internal CountItemType for all matched lines
-                working = working[matched].merge(
-                    r_i,
-                    how="left",
-                    on="CountItemType_raw",
-                )
+                working = working[matched].reset_index(drop=True)
+                working["CountItemType"] = working["CountItemType_raw"].map(r_i)
 
                 # if no CountItemTypes matched to dictionary
                 if working.CountItemType.isnull().all():
@@ -944,7 +1085,7 @@ def raw_to_id_simple(
                     element_df,
                     element,
                     name_field,
-                    dictionary_df,
+                    dictionary,
                     dictionary_path,
                     drop_unmatched=drop,
                     unmatched_id=none_or_unknown_id,
@@ -1024,12 +1165,12 @@ def munge_raw_to_ids(
     juris_system_name = Path(path_to_jurisdiction_dir).name
     working = df.copy()
 
-    # create dictionary dataframe
+    # get dictionary (compiled once for each version of the dictionary file)
     if alternate_dictionary:
         dictionary_path = alternate_dictionary
     else:
         dictionary_path = os.path.join(path_to_jurisdiction_dir, "dictionary.txt")
-    dictionary_df = pd.read_csv(dictionary_path, sep="\t")
+    dictionary = compile_dictionary(dictionary_path)
 
     # add Contest_Id column and contest_type column
     if "CandidateContest" in constant_dict.keys():
@@ -1069,7 +1210,7 @@ def munge_raw_to_ids(
                 munger_name,
                 err,
                 session,
-                dictionary_df,
+                dictionary,
                 dictionary_path,
             )
         except Exception as exc:
@@ -1127,7 +1268,7 @@ def munge_raw_to_ids(
         munger_name,
         file_name,
         juris_system_name,
-        dictionary_df,
+        dictionary,
         dictionary_path,
     )
     if new_err:
@@ -1163,8 +1304,126 @@ def munge_raw_to_ids(
     return working, err
 
 
+class CompiledMunger:
+    def __init__(self, munger_path: str):
+        """
+        Inputs:
+            munger_path: str, path to munger file
+
+        Parses the munger file once into a plan for munging, with attributes:
+            path, name: path to munger file and its stem (for error reporting)
+            params, lookup_source_files, params_err: checked and typed parameters from the
+                [format] section, source files named in lookup sections and error dictionary
+                (see read_munger_params)
+            all_formulas: formulas from the [munge formulas] section (including Election and Jurisdiction)
+            formulas, formulas_err: non-empty formulas and error dictionary (see read_munge_formulas)
+            elements: elements with a formula
+            regexes, regex_err: compiled regex (keyed by pattern string) for each {<field>,<regex>}
+                pair in the formulas, and error dictionary for any that do not compile
+            aux_params, lookup_map, lookup_fields, aux_err: lookup info for the formulas (see get_aux_info)
+            required_fields: source fields referenced by the formulas
+            ignore: values to be ignored for each element (see read_ignored_values)
+        """
+        self.path = munger_path
+        self.name = Path(munger_path).stem
+        self.params, self.lookup_source_files, self.params_err = read_munger_params(
+            munger_path
+        )
+        self.all_formulas, self.formulas_err = read_munge_formulas(
+            munger_path, drop_empty=False
+        )
+        self.formulas = {k: v for k, v in self.all_formulas.items() if v}
+        self.elements = [k for k in self.formulas.keys() if self.formulas[k] != "None"]
+
+        # compile regexes in brace pairs
+        self.regexes = dict()
+        self.regex_err = None
+        for formula in self.formulas.values():
+            for _, pattern_str in constants.brace_pattern.findall(formula):
+                try:
+                    self.regexes[pattern_str] = re.compile(pattern_str)
+                except re.error as e:
+                    self.regex_err = ui.add_new_error(
+                        self.regex_err,
+                        "munger",
+                        self.name,
+                        f"Regex error ({e}) in pattern:\n {pattern_str}",
+                    )
+
+        # get any lookup info (NB: does not include suffix)
+        combo_formula = " ".join([self.formulas[e] for e in self.elements])
+        try:
+            (
+                self.aux_params,
+                self.lookup_map,
+                self.lookup_fields,
+                self.aux_err,
+            ) = get_aux_info(combo_formula, munger_path)
+        except Exception as exc:
+            self.aux_params, self.lookup_map, self.lookup_fields = (
+                dict(),
+                dict(),
+                list(),
+            )
+            self.aux_err = ui.add_new_error(
+                None,
+                "munger",
+                self.name,
+                f"Unexpected exception while reading lookup info: {exc}",
+            )
+
+        self.required_fields = self.string_fields()
+        self.ignore = read_ignored_values(munger_path)
+        # suffix -> formulas with suffix appended to each field
+        self.suffixed_formulas = dict()
+
+    def string_fields(
+        self, extra_formula_keys: Optional[List[str]] = None
+    ) -> List[str]:
+        """Returns the field names expected by the formulas for the single-election-jurisdiction
+        elements and for any elements in <extra_formula_keys>"""
+        keys = constants.single_ej_munge_elements + (extra_formula_keys or list())
+        munge_field_list, _ = extract_fields_from_formulas(
+            [v for k, v in self.all_formulas.items() if k in keys]
+        )
+        return munge_field_list
+
+    def formulas_with_suffix(self, suffix: str) -> Dict[str, str]:
+        """Returns formulas with <suffix> appended to each field"""
+        if suffix not in self.suffixed_formulas.keys():
+            self.suffixed_formulas[suffix] = {
+                element: angle_field_pattern.sub(f"<\\1{suffix}>", formula)
+                for element, formula in self.formulas.items()
+            }
+        return self.suffixed_formulas[suffix]
+
+
+def compile_munger(munger_path: str) -> CompiledMunger:
+    """Returns the plan for the munger at <munger_path>, compiling it only if it has not
+    been compiled since the munger file was last modified"""
+    key = os.path.abspath(munger_path)
+    try:
+        mtime = os.path.getmtime(key)
+    except OSError:
+        # missing file: compile (and report) every time
+        return CompiledMunger(munger_path)
+    cached = compiled_mungers.get(key)
+    if cached is None or cached[0] != mtime:
+        compiled_mungers[key] = (mtime, CompiledMunger(munger_path))
+    return compiled_mungers[key][1]
+
+
 def get_munge_formulas(
     munger_path: str,
+) -> (Dict[str, str], Optional[dict]):
+    plan = compile_munger(munger_path)
+    if ui.fatal_error(plan.formulas_err):
+        return dict(), copy.deepcopy(plan.formulas_err)
+    return dict(plan.formulas), copy.deepcopy(plan.formulas_err)
+
+
+def read_munge_formulas(
+    munger_path: str, drop_empty: bool = True
 ) -> (Dict[str, str], Optional[dict]):
     err = None
     f, new_err = ui.get_parameters(
@@ -1174,7 +1433,8 @@ def get_munge_formulas(
         param_file=munger_path,
     )
     # drop any empty formulas
-    f = {k: v for k, v in f.items() if v}
+    if drop_empty:
+        f = {k: v for k, v in f.items() if v}
     if new_err:
         err = ui.consolidate_errors([err, new_err])
         if ui.fatal_error(new_err):
@@ -1212,20 +1472,14 @@ def munge_source_to_raw(
     munger_name = Path(munger_path).stem
     working = df.copy()
 
-    # # get munge formulas
-    # # for all but constant-over-file
-    formulas, new_err = get_munge_formulas(munger_path)
-
-    # # get list of all elements for which we have formulas
-    elements = [
-        k
-        for k in formulas.keys()
-        if (formulas[k] is not None) and (formulas[k] != "None")
-    ]
-    # get any lookup info (NB: does not include suffix)
-    combo_formula = " ".join([formulas[e] for e in elements])
-    aux_params, lookup_map, munge_fields, new_err = get_aux_info(
-        combo_formula, munger_path
+    # # get munge formulas, elements with formulas and lookup info, compiled once per munger
+    plan = compile_munger(munger_path)
+    elements = plan.elements
+    formulas = plan.formulas_with_suffix(suffix)
+    aux_params = copy.deepcopy(plan.aux_params)
+    lookup_map = plan.lookup_map
+    new_err = ui.consolidate_errors(
+        [copy.deepcopy(plan.aux_err), copy.deepcopy(plan.regex_err)]
     )
     if new_err:
         err = ui.consolidate_errors([err, new_err])
@@ -1265,13 +1519,17 @@ def munge_source_to_raw(
 
     for element in elements:
         try:
+            # formula with suffix appended to each field
             formula = formulas[element]
-            # if formula refers to any fields that need to be looked up, make appropriate replacements
-            formula = re.sub("<([^>]*)>", f"<\\1{suffix}>", formula)
 
             # add col with munged values
             working, new_err = add_column_from_formula(
-                working, formula, f"{element}_raw", err, munger_name
+                working,
+                formula,
+                f"{element}_raw",
+                err,
+                munger_name,
+                regexes=plan.regexes,
             )
             if new_err:
                 err = ui.consolidate_errors([err, new_err])
@@ -1295,23 +1553,7 @@ def munge_source_to_raw(
 
         try:
             # compress whitespace for <element>_raw
-            compression = pd.DataFrame(
-                [
-                    [x, compress_whitespace(x)]
-                    for x in working[f"{element}_raw"].unique()
-                ],
-                columns=["uncompressed", "compressed"],
-            )
-
-            working = (
-                working.merge(
-                    compression,
-                    left_on=f"{element}_raw",
-                    right_on="uncompressed",
-                )
-                .drop([f"{element}_raw", "uncompressed"], axis=1)
-                .rename(columns={"compressed": f"{element}_raw"})
-            )
+            working[f"{element}_raw"] = normalize_strings(working[f"{element}_raw"])
         except Exception as exc:
             err = ui.add_new_error(
                 err,
@@ -1391,7 +1633,32 @@ def get_and_check_munger_params(
 ) -> (dict, Optional[dict]):
     """Checks that munger parameter file is internally consistent.
     If results_dir is included, then existence of any required
-    auxiliary files is checked as well"""
+    auxiliary files is checked as well.
+    The munger file is parsed and checked only once (until it is modified)"""
+    plan = compile_munger(munger_path)
+    params = copy.deepcopy(plan.params)
+    err = copy.deepcopy(plan.params_err)
+    if results_dir:
+        for source_file in plan.lookup_source_files:
+            aux_file_path = os.path.join(results_dir, source_file)
+            if not os.path.isfile(aux_file_path):
+                err = ui.add_new_error(
+                    err,
+                    "munger",
+                    plan.name,
+                    f"Auxiliary file not found: {source_file}",
+                )
+    return params, err
+
+
+def read_munger_params(munger_path: str) -> (dict, List[str], Optional[dict]):
+    """Reads parameters from the [format] section of the munger file,
+    recasts them to their types and checks that they are internally consistent.
+    Returns
+        dict, parameters
+        List[str], source files named in lookup sections
+        Optional[dict], error dictionary"""
+    lookup_source_files = list()
     raw_params, err = ui.get_parameters(
         required_keys=list(constants.req_munger_parameters.keys()),
         optional_keys=list(constants.opt_munger_data_types.keys()),
@@ -1400,10 +1667,10 @@ def get_and_check_munger_params(
         err=None,
     )
     if ui.fatal_error(err):
-        return dict(), err
+        return dict(), lookup_source_files, err
 
     if raw_params["file_type"] in constants.no_param_file_types:
-        return raw_params, err
+        return raw_params, lookup_source_files, err
 
     # get name of munger for error reporting
     munger_name = Path(munger_path).stem
@@ -1478,7 +1745,7 @@ def get_and_check_munger_params(
                 f"count_locations parameter is missing, or missing information",
             )
         if ui.fatal_error(err):
-            return dict(), err
+            return dict(), lookup_source_files, err
 
     # # extra compatibility requirements for excel or flat text files
     elif params["file_type"] in ["excel", "flat_text"]:
@@ -1494,7 +1761,7 @@ def get_and_check_munger_params(
             )
 
     # get all munge fields
-    params["munge_fields"], new_err = get_string_fields_from_munger(munger_path)
+    params["munge_fields"], new_err = read_string_fields_from_munger(munger_path)
     if new_err:
         err = ui.consolidate_errors([err, new_err])
 
@@ -1606,7 +1873,7 @@ def get_and_check_munger_params(
     if new_err:
         err = ui.consolidate_errors([err, new_err])
         if ui.fatal_error(new_err):
-            return params, err
+            return params, lookup_source_files, err
 
     pattern = re.compile(r"^(.*) lookup$")
     for h in headers:
@@ -1623,24 +1890,34 @@ def get_and_check_munger_params(
         )
         if new_err:
             err = ui.consolidate_errors([err, new_err])
-        if results_dir:
-            aux_file_path = os.path.join(results_dir, required["source_file"])
-            if not os.path.isfile(aux_file_path):
-                err = ui.add_new_error(
-                    err,
-                    "munger",
-                    munger_name,
-                    f"Auxiliary file not found: {required['source_file']}",
-                )
+        if "source_file" in required.keys():
+            lookup_source_files.append(required["source_file"])
         # TODO check usual format items for reading aux file
 
-    return params, err
+    return params, lookup_source_files, err
 
 
 def get_string_fields_from_munger(
     munger_path: str, extra_formula_keys: Optional[List[str]] = None
 ) -> (List[str], Optional[dict]):
-    """Finds the field names expected by the munger formulas"""
+    """Finds the field names expected by the munger formulas
+    (from the munger as compiled by compile_munger)"""
+    plan = compile_munger(munger_path)
+    if ui.fatal_error(plan.formulas_err):
+        return list(), copy.deepcopy(plan.formulas_err)
+    extra = [k for k in (extra_formula_keys or list()) if k not in plan.all_formulas]
+    if extra:
+        # formulas not read when munger was compiled
+        return read_string_fields_from_munger(
+            munger_path, extra_formula_keys=extra_formula_keys
+        )
+    return plan.string_fields(extra_formula_keys), copy.deepcopy(plan.formulas_err)
+
+
+def read_string_fields_from_munger(
+    munger_path: str, extra_formula_keys: Optional[List[str]] = None
+) -> (List[str], Optional[dict]):
+    """Finds the field names expected by the munger formulas, reading them from the munger file"""
     err = None
     optional_keys = copy.deepcopy(constants.single_ej_munge_elements)
     if extra_formula_keys:
@@ -1654,7 +1931,7 @@ def get_string_fields_from_munger(
     if new_err:
         err = ui.consolidate_errors([err, new_err])
         if ui.fatal_error(new_err):
-            return dict(), err
+            return list(), err
     munge_field_list, _ = extract_fields_from_formulas(formulas.values())
     return munge_field_list, err
 
@@ -1805,15 +2082,46 @@ def to_standard_count_frame(
     p: dict,
     suffix: Optional[str] = None,
     extra_formula_keys: Optional[List[str]] = None,
+    raw_dict: Optional[Dict[str, pd.DataFrame]] = None,
+    row_constants_by_sheet: Optional[Dict[str, Dict[int, Any]]] = None,
+    read_cache: Optional[Dict[str, tuple]] = None,
+    cache_dir: Optional[str] = None,
+    cache_format: str = constants.default_frame_cache_format,
 ) -> (pd.DataFrame, Optional[dict]):
     """Read data from file at <f_path>; return a standard dataframe with one clean count column
     and all other columns typed as 'string'.
-     If <suffix> is given, append <suffix> to all non-count columns"""
+     If <suffix> is given, append <suffix> to all non-count columns.
+     If <raw_dict> is given (e.g., one chunk of a file read in chunks), it is used
+     instead of reading the file, together with <row_constants_by_sheet>.
+     If <read_cache> is given, the file is read only if it has not already been read
+     with the same reading parameters (see ui.read_single_datafile).
+     If <cache_dir> is given, the dataframe is taken from the on-disk cache in <cache_dir> if the
+     same file has already been processed with the same munger; otherwise, if the file is
+     processed without any error or warning, the dataframe is added to the cache, stored in
+     <cache_format> (see constants.frame_cache_suffixes)."""
 
     # set up
     file_name = Path(file_path).name
     munger_name = Path(munger_path).stem
     err = None
+
+    # use dataframe from on-disk cache if there is one for the current contents of file and munger
+    cache_key = None
+    if cache_dir and raw_dict is None:
+        try:
+            cache_key = ui.frame_cache_key(
+                file_path,
+                munger_path,
+                suffix=suffix,
+                extra_formula_keys=extra_formula_keys,
+            )
+        except OSError:
+            # e.g., missing file, which will be reported when the file is read
+            cache_key = None
+        if cache_key:
+            df = ui.read_cached_frame(cache_dir, cache_key, cache_format=cache_format)
+            if df is not None:
+                return df, err
     # initialize error, count_cols dictionaries
     error_by_df = dict()
     cc_by_name = dict()
@@ -1838,12 +2146,14 @@ def to_standard_count_frame(
     # read count dataframe(s) and constant-over-sheet elements from rows from file
     # # NB: sheet names are the keys
     try:
-        raw_dict, row_constants_by_sheet, new_err = ui.read_single_datafile(
-            file_path,
-            p,
-            munger_path,
-        )
-        err = ui.consolidate_errors([err, new_err])
+        if raw_dict is None:
+            raw_dict, row_constants_by_sheet, new_err = ui.read_single_datafile(
+                file_path,
+                p,
+                munger_path,
+                read_cache=read_cache,
+            )
+            err = ui.consolidate_errors([err, new_err])
 
         if len(raw_dict) == 0:  # no dfs at all returned
             err = ui.add_new_error(
@@ -2094,6 +2404,19 @@ def to_standard_count_frame(
                 f"Exception while appending suffix {suffix}: {exc}",
             )
 
+    # add dataframe to on-disk cache, unless there were problems worth reporting again
+    if cache_key and err is None and not df.empty:
+        err_str = ui.write_cached_frame(
+            cache_dir, cache_key, df, cache_format=cache_format
+        )
+        if err_str:
+            err = ui.add_new_error(
+                err,
+                "warn-system",
+                f"{Path(__file__).absolute().parents[0].name}.{inspect.currentframe().f_code.co_name}",
+                err_str,
+            )
+
     return df, err
 
 
@@ -2102,8 +2425,15 @@ def fill_vote_count(
     session,
     munger_name,
     err: Optional[dict],
+    chunk_table: Optional[str] = None,
+    chunk_cursor=None,
+    stats: Optional[Dict[str, float]] = None,
 ) -> Optional[dict]:
-
+    """Sums the vote counts in <df> by contest, selection, reporting unit, etc. and inserts them into
+    VoteCount or, if <chunk_table> and <chunk_cursor> are given, copies them into <chunk_table>
+    (the temp table staging the chunks of a file, see db.create_vote_count_chunk_table_cursor)
+    via <chunk_cursor>, without committing. If a dictionary <stats> is given, the statistics of the
+    insert into VoteCount are added to it (see db.insert_to_cdf_db)"""
     working = df.copy()
     # restrict to just the VoteCount columns (so that groupby.sum will work)
     vc_cols = [
@@ -2126,8 +2456,16 @@ def fill_vote_count(
 
     # Fill VoteCount
     try:
+        if chunk_table:
+            db.copy_to_vote_count_chunk_table_cursor(chunk_cursor, chunk_table, working)
+            return err
         new_err = db.insert_to_cdf_db(
-            session.bind, working, "VoteCount", "munger", munger_name
+            session.bind,
+            working,
+            "VoteCount",
+            "munger",
+            munger_name,
+            stats=stats,
         )
         if new_err:
             err = ui.consolidate_errors([err, new_err])
@@ -2345,7 +2683,19 @@ def file_to_raw_df(
     f_path: str,
     results_directory_path: str,
     extra_formula_keys: Optional[List[str]] = None,
+    distinct: bool = True,
+    raw_dict: Optional[Dict[str, pd.DataFrame]] = None,
+    row_constants_by_sheet: Optional[Dict[str, Dict[int, Any]]] = None,
+    read_cache: Optional[Dict[str, tuple]] = None,
+    cache_dir: Optional[str] = None,
+    cache_format: str = constants.default_frame_cache_format,
 ) -> (pd.DataFrame, Optional[dict]):
+    """If <distinct>, cleaning and munging of non-count columns is done once for each distinct combination
+    of their values (typically far fewer than the rows, which repeat each combination for each
+    vote type) and the results are broadcast back to the rows.
+    If <raw_dict> is given, the data are taken from it instead of from the file; if <read_cache> is given,
+    the file is read only if not already read with the same parameters; if <cache_dir> is given, the
+    standard count frame is taken from (or added to) the on-disk cache there (see to_standard_count_frame)"""
     err = None
 
     # read data into standard count format dataframe
@@ -2358,6 +2708,11 @@ def file_to_raw_df(
             p,
             suffix="_SOURCE",
             extra_formula_keys=extra_formula_keys,
+            raw_dict=raw_dict,
+            row_constants_by_sheet=row_constants_by_sheet,
+            read_cache=read_cache,
+            cache_dir=cache_dir,
+            cache_format=cache_format,
         )
         if ui.fatal_error(err):
             return pd.DataFrame(), err
@@ -2369,8 +2724,16 @@ def file_to_raw_df(
             f"Exception while converting data to standard form: {exc}",
         )
         return pd.DataFrame(), err
+    # munge only the distinct combinations of non-count values, then broadcast to rows
+    if distinct:
+        df_rows = df
+        counts = df_rows[["Count"]]
+        df, codes = distinct_keys(df_rows, ["Count"])
+
     # clean non-count columns
-    non_count = [c for c in df.columns if c != "Count"]
+    non_count = [
+        c for c in df.columns if c not in ["Count", constants.distinct_key_column]
+    ]
     df = clean_strings(df, non_count)
 
     # transform source to completely munged (possibly with foreign keys if there is aux data)
@@ -2387,6 +2750,8 @@ def file_to_raw_df(
             err = ui.consolidate_errors([err, new_err])
             if ui.fatal_error(new_err):
                 return df, err
+        if distinct:
+            df = broadcast_to_rows(df, codes, counts)
     except Exception as exc:
         err = ui.add_new_error(
             err,
@@ -2399,6 +2764,65 @@ def file_to_raw_df(
     return df, err
 
 
+def chunk_rows_for_munger(p: Dict[str, Any], chunk_rows: Optional[int]) -> int:
+    """Returns the number of data rows (or, for xml, counts) per chunk for streaming a results file read with
+    munger parameters <p>: the munger's chunk_rows if given, otherwise <chunk_rows>
+    (e.g., from run_time.ini). Returns 0 if the file should be read all at once, which is
+    the case unless the file is xml, json-nested, or flat_text and not multi-block"""
+    if p.get("chunk_rows") is not None:
+        chunk_rows = p["chunk_rows"]
+    if not chunk_rows:
+        return 0
+    if p["file_type"] in ["xml", "json-nested"] or (
+        p["file_type"] == "flat_text" and p["multi_block"] != "yes"
+    ):
+        return int(chunk_rows)
+    return 0
+
+
+def file_to_raw_df_in_chunks(
+    munger_path: str,
+    p: Dict[str, Any],
+    f_path: str,
+    results_directory_path: str,
+    chunk_rows: int,
+    extra_formula_keys: Optional[List[str]] = None,
+    distinct: bool = True,
+) -> Iterator[Tuple[pd.DataFrame, Optional[dict]]]:
+    """Streaming version of file_to_raw_df for flat_text, xml and json-nested files: reads the file <chunk_rows>
+    data rows (or counts) at a time and yields the raw dataframe and error for each chunk,
+    so that only one chunk need be in memory at a time. Stops after the first fatal error.
+    If the file turns out to need reading whole (flat_text records that must be padded),
+    yields None in place of the dataframe and stops."""
+    if p["file_type"] == "xml":
+        chunks = ui.read_xml_in_chunks(f_path, p, munger_path, chunk_rows)
+    elif p["file_type"] == "json-nested":
+        chunks = ui.read_json_in_chunks(f_path, p, munger_path, chunk_rows)
+    else:
+        chunks = ui.read_flat_text_in_chunks(f_path, p, munger_path, chunk_rows)
+    for raw_dict, row_constants_by_sheet, err in chunks:
+        if raw_dict is None:
+            yield None, err
+            return
+        if ui.fatal_error(err):
+            yield pd.DataFrame(), err
+            return
+        df, new_err = file_to_raw_df(
+            munger_path,
+            p,
+            f_path,
+            results_directory_path,
+            extra_formula_keys=extra_formula_keys,
+            distinct=distinct,
+            raw_dict=raw_dict,
+            row_constants_by_sheet=row_constants_by_sheet,
+        )
+        err = ui.consolidate_errors([err, new_err])
+        yield df, err
+        if ui.fatal_error(new_err):
+            return
+
+
 def add_constants_to_df(
     df: pd.DataFrame, constant_dict: Dict[str, Any]
 ) -> pd.DataFrame:
@@ -2429,6 +2853,18 @@ def get_lookedup_fields(raw_fields) -> Dict[str, List[str]]:
 
 def remove_ignored_rows(df: pd.DataFrame, munger_path: str) -> pd.DataFrame:
     working = df.copy()
+    ignore = compile_munger(munger_path).ignore
+
+    # delete rows to be ignored
+    for element, value_list in ignore.items():
+        working = working[~working[f"{element}_raw"].isin(value_list)]
+
+    return working
+
+
+def read_ignored_values(munger_path: str) -> Dict[str, List[str]]:
+    """Returns list of values to be ignored for each element in the [ignore] section
+    of the munger file (if any)"""
     ig, new_err = ui.get_parameters(
         header="ignore",
         required_keys=[],
@@ -2444,14 +2880,7 @@ def remove_ignored_rows(df: pd.DataFrame, munger_path: str) -> pd.DataFrame:
         param_file=munger_path,
     )
     # NB: errors ignored, as header is not required
-
-    # delete rows to be ignored
-    real_ig_keys = [x for x in ig.keys() if ig[x] is not None]
-    for element in real_ig_keys:
-        value_list = ig[element].split(",")
-        working = working[~working[f"{element}_raw"].isin(value_list)]
-
-    return working
+    return {k: v.split(",") for k, v in ig.items() if v is not None}
 
 
 def blank_out(df: pd.DataFrame, regex: str) -> pd.DataFrame:
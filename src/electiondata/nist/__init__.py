@@ -1,6 +1,8 @@
 import xml.etree.ElementTree as ET
-from typing import Optional, Dict, Any, List, Union, Pattern
+from typing import Optional, Dict, Any, List, Union, Pattern, Iterator, Tuple
 from urllib import request
+from collections import deque
+import re
 
 import pandas as pd
 from lxml import etree as lxml_et
@@ -359,6 +361,144 @@ def df_from_tree(
     return df, err
 
 
+def xml_row_chunks(
+    f_path: str,
+    main_path: str,
+    main_attrib: Optional[str],
+    xml_path_info: Dict[str, Dict[str, Dict[str, str]]],
+    file_name: str,
+    ns: Optional[str],
+    lookup_id: str = None,
+    chunk_rows: int = constants.read_chunk_rows,
+) -> Iterator[Tuple[List[Dict[str, Any]], Optional[dict]]]:
+    """Streaming version of df_from_tree: parses the file at <f_path> incrementally and yields
+    lists of (at most <chunk_rows>) rows, each a dictionary with the count (or lookup_id, if given)
+    and the munge string fields, in document order, together with an error dictionary.
+    Ancestors of the element being parsed are kept on a stack, and each element is cleared
+    once it is parsed, unless it is needed for a field read from the text of a sub-element
+    of an ancestor (e.g., Contest/Name). So memory depends on the depth of the tree,
+    not the size of the file. Values are found as in df_from_tree: if more than one
+    ancestor has the tag for a field, the outermost one is used."""
+    if ns:
+        ns = f"{{{ns}}}"
+    else:
+        ns = ""
+    driver_tags = [f"{ns}{s}" for s in main_path.split("/")]
+
+    # fields read from attributes, and fields read from text of sub-elements,
+    # by tag of the element they are read from
+    attrib_fields = dict()
+    text_fields = dict()
+    for field, info in xml_path_info.items():
+        if info["attrib"]:
+            attrib_fields.setdefault(info["local_root_tag"], list()).append(
+                (field, info["attrib"])
+            )
+        else:
+            # nb: namespaces (e.g., {http://...}) may contain slashes
+            text_fields.setdefault(info["local_root_tag"], list()).append(
+                (field, info["tail"], re.findall(r"(?:{[^}]*})?[^/]+", info["tail"]))
+            )
+
+    stack = list()  # open elements, starting from the root
+    tags = list()  # tags of elements in stack
+    waiting = list()  # for each element in stack, rows waiting for its text fields
+    pending = (
+        deque()
+    )  # rows in document order, each with the number of elements it waits for
+    ready = list()
+    for event, element in ET.iterparse(f_path, events=("start", "end")):
+        if event == "start":
+            if not stack and element.tag != driver_tags[0]:
+                err = ui.add_new_error(
+                    None,
+                    "file",
+                    file_name,
+                    f"Root element of file is not {driver_tags[0]}, as expected per munger",
+                )
+                yield list(), err
+                return
+            stack.append(element)
+            tags.append(element.tag)
+            waiting.append(list())
+            continue
+
+        # element is complete
+        depth = len(stack) - 1
+        if tags == driver_tags:
+            value = element.attrib[main_attrib] if main_attrib else element.text
+            if lookup_id:
+                row = {lookup_id: value}
+            else:
+                row = {"Count": int(value)}
+            # read attributes of outermost ancestors first, keeping first value found
+            entry = [row, 0]
+            waited_tags = set()
+            for level in range(depth + 1):
+                tag = tags[level]
+                for field, attrib in attrib_fields.get(tag, list()):
+                    if field not in row.keys() and attrib in stack[level].attrib:
+                        row[field] = stack[level].attrib[attrib]
+                # text fields are read when the outermost element with the tag is complete
+                if tag in text_fields.keys() and tag not in waited_tags:
+                    waited_tags.add(tag)
+                    waiting[level].append(entry)
+                    entry[1] += 1
+            pending.append(entry)
+
+        # fill text fields of rows waiting for this element
+        for entry in waiting[depth]:
+            for field, tail, _ in text_fields[tags[depth]]:
+                entry[0][field] = element.find(tail).text
+            entry[1] -= 1
+
+        # clear element unless it is on the path to a text field of an ancestor
+        needed = False
+        for level in range(depth):
+            relative = tags[level + 1 : depth + 1]
+            for field, tail, tail_tags in text_fields.get(tags[level], list()):
+                if tail_tags[: len(relative)] == relative:
+                    needed = True
+        if not needed:
+            element.clear()
+            if depth > 0:
+                stack[depth - 1].remove(element)
+        stack.pop()
+        tags.pop()
+        waiting.pop()
+
+        # pass on completed rows, in document order
+        while pending and pending[0][1] == 0:
+            ready.append(pending.popleft()[0])
+        while len(ready) >= chunk_rows:
+            yield ready[:chunk_rows], None
+            ready = ready[chunk_rows:]
+    if ready:
+        yield ready, None
+
+
+def df_from_xml_file(
+    f_path: str,
+    main_path: str,
+    main_attrib: Optional[str],
+    xml_path_info: Dict[str, Dict[str, Dict[str, str]]],
+    file_name: str,
+    ns: Optional[str],
+    lookup_id: str = None,
+) -> (pd.DataFrame, Optional[dict]):
+    """Reads all counts (or lookup_ids, if given), along with info from munge string paths,
+    from the xml file at <f_path> into a dataframe, as df_from_tree does for the parsed tree,
+    but without holding the whole tree in memory (see xml_row_chunks)"""
+    rows = list()
+    for chunk, err in xml_row_chunks(
+        f_path, main_path, main_attrib, xml_path_info, file_name, ns, lookup_id
+    ):
+        if ui.fatal_error(err):
+            return pd.DataFrame(), err
+        rows.extend(chunk)
+    return pd.DataFrame(rows), None
+
+
 def check_nist_namespace(f_path, key) -> Optional[dict]:
     """get the namespaces in the XML and return error if the one we're expecting
     is not found"""
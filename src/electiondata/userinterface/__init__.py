@@ -16,19 +16,26 @@ import pandas as pd
 from pandas.errors import ParserError
 import os
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator, Tuple
 import datetime
 import csv
 import numpy as np
 import inspect
 import xml.etree.ElementTree as et
 import json
+from collections import deque
 import shutil
+import copy
+import hashlib
+import pickle
 import xlrd
 
 # may need for certain excel imports: import openpyxl
 from sqlalchemy.orm import Session
 
+# absolute path of file -> ((modification time, size), sha256 digest), for each file digested
+file_digests = dict()
+
 
 # mapping from internal database reportingunit types to the user-facing contest types
 # (contests are categorized by the reporting unit type of their corresponding districts)
@@ -64,6 +71,263 @@ def json_kwargs(
     return json_kwargs, json_rename
 
 
+def json_events(
+    f, read_size: int = constants.json_read_size
+) -> Iterator[Tuple[str, Any]]:
+    """Tokenizes the json document in the open text file <f>, reading <read_size> characters
+    at a time, so that the document is never held in memory all at once. Yields events
+    ('start_map', None), ('map_key', key), ('end_map', None), ('start_array', None),
+    ('end_array', None) and ('value', value) for strings, numbers, booleans and nulls"""
+    buffer = f.read(read_size)
+    pos = 0
+    eof = not buffer
+    containers = list()  # "map" or "array" for each open container
+    expect_key = False
+    while True:
+        match = constants.json_whitespace_pattern.match(buffer, pos)
+        pos = match.end()
+        if pos == len(buffer):
+            if eof:
+                break
+            more = f.read(read_size)
+            eof = not more
+            buffer = more
+            pos = 0
+            continue
+        c = buffer[pos]
+        if c == ",":
+            expect_key = containers[-1] == "map"
+            pos += 1
+        elif c == ":":
+            expect_key = False
+            pos += 1
+        elif c == "{":
+            containers.append("map")
+            expect_key = True
+            pos += 1
+            yield "start_map", None
+        elif c == "}":
+            containers.pop()
+            pos += 1
+            yield "end_map", None
+        elif c == "[":
+            containers.append("array")
+            expect_key = False
+            pos += 1
+            yield "start_array", None
+        elif c == "]":
+            containers.pop()
+            pos += 1
+            yield "end_array", None
+        else:
+            # scalar (possibly cut off at the end of the buffer)
+            try:
+                if c == '"':
+                    value, end = json.decoder.scanstring(buffer, pos + 1)
+                else:
+                    match = constants.json_scalar_pattern.match(buffer, pos)
+                    if not match:
+                        raise json.JSONDecodeError("Expecting value", buffer, pos)
+                    end = match.end()
+                    # a number cut off by the end of the buffer may match in part
+                    if not eof and (
+                        end == len(buffer) or buffer[end] not in " \t\n\r,]}"
+                    ):
+                        raise json.JSONDecodeError("Value may continue", buffer, pos)
+                    value = json.loads(match.group())
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(read_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            pos = end
+            if expect_key:
+                expect_key = False
+                yield "map_key", value
+            else:
+                yield "value", value
+
+
+def json_value(events: Iterator[Tuple[str, Any]], event: str, value: Any) -> Any:
+    """Returns the json value starting with (<event>, <value>), reading the rest of it
+    from <events> (see json_events)"""
+    if event == "start_map":
+        d = dict()
+        for event, key in events:
+            if event == "end_map":
+                break
+            d[key] = json_value(events, *next(events))
+        return d
+    elif event == "start_array":
+        a = list()
+        for event, value in events:
+            if event == "end_array":
+                break
+            a.append(json_value(events, event, value))
+        return a
+    return value
+
+
+def skip_json_value(events: Iterator[Tuple[str, Any]], event: str):
+    """Reads (without keeping) the rest of the json value starting with <event> from <events>"""
+    depth = int(event in ["start_map", "start_array"])
+    while depth > 0:
+        event, _ = next(events)
+        if event in ["start_map", "start_array"]:
+            depth += 1
+        elif event in ["end_map", "end_array"]:
+            depth -= 1
+    return
+
+
+def flatten_json_record(record: Any, prefix: str = "") -> Dict[str, Any]:
+    """Flattens nested dictionaries of <record>, joining keys with '.', as pd.json_normalize does"""
+    if not isinstance(record, dict):
+        return {0: record}
+    flat = dict()
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(flatten_json_record(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def json_normalized_row_chunks(
+    f_path: str,
+    record_path: List[str],
+    meta: List[List[str]],
+    chunk_rows: int = constants.read_chunk_rows,
+    read_size: int = constants.json_read_size,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Streaming version of pd.json_normalize(data, record_path=<record_path>, meta=<meta>, errors="ignore")
+    for the json document in the file at <f_path>: yields lists of (at most <chunk_rows>) rows, in order.
+    The document is tokenized as it is read, <read_size> characters at a time (see json_events);
+    only the records themselves and the values needed for <meta> are built, and a row is passed on
+    as soon as all its meta values are known (which may be only when the enclosing object is complete, if
+    a meta value follows the records in the document)."""
+    depth = len(record_path)
+    # for each level of record_path, the meta columns read from objects at that level
+    level_meta = [list() for level in range(depth)]
+    for path in meta:
+        key = ".".join(path)
+        if len(path) < depth:
+            level_meta[len(path) - 1].append((key, path[-1:]))
+        else:
+            level_meta[depth - 1].append((key, path[depth - 1 :]))
+    # keys of objects at each level whose values are needed for meta
+    needed_keys = [
+        {spec[0] for key, spec in level_meta[level]} for level in range(depth)
+    ]
+
+    open_objects = list()  # for each level, keys and needed values of current object
+    waiting = (
+        list()
+    )  # for each level, rows waiting for the current object to be complete
+    pending = deque()  # rows in order, each with the number of objects it waits for
+    ready = list()
+
+    def pull_field(obj: dict, spec: List[str]) -> Any:
+        result = obj
+        try:
+            for field in spec:
+                result = result[field]
+        except KeyError:
+            return np.nan
+        return result
+
+    def add_record(record: Any):
+        row = flatten_json_record(record)
+        entry = [row, 0]
+        for level in range(depth):
+            for key, spec in level_meta[level]:
+                if key in row.keys():
+                    raise ValueError(
+                        f"Conflicting metadata name {key}, need distinguishing prefix "
+                    )
+            if all(
+                spec[0] in open_objects[level].keys() for key, spec in level_meta[level]
+            ):
+                for key, spec in level_meta[level]:
+                    row[key] = pull_field(open_objects[level], spec)
+            else:
+                # some meta value may come later in the object
+                waiting[level].append(entry)
+                entry[1] += 1
+        pending.append(entry)
+
+    def release() -> Iterator[List[Dict[str, Any]]]:
+        nonlocal ready
+        while pending and pending[0][1] == 0:
+            ready.append(pending.popleft()[0])
+        while len(ready) >= chunk_rows:
+            yield ready[:chunk_rows]
+            ready = ready[chunk_rows:]
+
+    def read_objects(level: int, event: str) -> Iterator[List[Dict[str, Any]]]:
+        # a value holding objects at <level>: an array of them or a single one
+        if event == "start_array":
+            for event, value in events:
+                if event == "end_array":
+                    break
+                yield from read_objects(level, event)
+        elif event == "start_map":
+            yield from read_object(level)
+        else:
+            skip_json_value(events, event)
+
+    def read_object(level: int) -> Iterator[List[Dict[str, Any]]]:
+        obj = dict()
+        open_objects.append(obj)
+        waiting.append(list())
+        found = False
+        for event, key in events:
+            if event == "end_map":
+                break
+            event, value = next(events)
+            if key == record_path[level]:
+                found = True
+                if level < depth - 1:
+                    yield from read_objects(level + 1, event)
+                elif event == "start_array":
+                    for event, value in events:
+                        if event == "end_array":
+                            break
+                        add_record(json_value(events, event, value))
+                        yield from release()
+                elif event != "value" or value is not None:
+                    raise TypeError(
+                        f"{record_path[level]} should be a list of records, not {json_value(events, event, value)}"
+                    )
+            elif key in needed_keys[level]:
+                obj[key] = json_value(events, event, value)
+            else:
+                skip_json_value(events, event)
+        if not found:
+            raise KeyError(
+                f"Key {record_path[level]} not found. If specifying a record_path, "
+                f"all elements of data should have the path."
+            )
+        # fill in meta values for rows waiting for this object
+        for entry in waiting[-1]:
+            for key, spec in level_meta[level]:
+                entry[0][key] = pull_field(obj, spec)
+            entry[1] -= 1
+        open_objects.pop()
+        waiting.pop()
+        yield from release()
+
+    with open(f_path, "r") as f:
+        events = json_events(f, read_size=read_size)
+        for event, value in events:
+            yield from read_objects(0, event)
+    if ready:
+        yield ready
+
+
 def tabular_kwargs(
     p: Dict[str, Any], kwargs: Dict[str, Any], aux=False
 ) -> Dict[str, Any]:
@@ -117,6 +381,20 @@ def basic_kwargs(p: Dict[str, Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
     return kwargs
 
 
+def flat_text_kwargs(p: Dict[str, Any], aux: bool = False) -> Dict[str, Any]:
+    """Returns keyword arguments for reading a flat_text file with pd.read_csv"""
+    kwargs = basic_kwargs(p, dict())
+    kwargs = tabular_kwargs(p, kwargs, aux=aux)
+    if p["multi_block"] == "yes":
+        kwargs["header"] = None
+    kwargs["quoting"] = csv.QUOTE_MINIMAL
+    if p["flat_text_delimiter"] in ["tab", "\\t"]:
+        kwargs["sep"] = "\t"
+    else:
+        kwargs["sep"] = p["flat_text_delimiter"]
+    return kwargs
+
+
 def get_row_constant_kwargs(kwargs: dict, rows_to_read: List[int]) -> dict:
     rck = kwargs.copy()
     rck["header"] = None
@@ -169,16 +447,43 @@ def read_single_datafile(
     aux: bool = False,
     driving_path: Optional[str] = None,
     lookup_id: Optional[str] = None,
+    read_cache: Optional[Dict[str, tuple]] = None,
 ) -> (Dict[str, pd.DataFrame], Dict[str, Dict[int, Any]], Optional[dict]):
     """Length of returned dictionary is the number of sheets read -- usually 1 except for multi-sheet Excel.
-    Auxiliary files have different parameters (e.g., no count locations)"""
+    Auxiliary files have different parameters (e.g., no count locations).
+    If <read_cache> is given, the file is read only if no file was read into <read_cache> with
+    the same reading parameters (e.g., by another munger for the same file); otherwise the earlier
+    reading is returned, with any munger errors reported for the munger at <munger_path>. Readings
+    with fatal errors are not kept. Callers must not change the returned dataframes in place."""
+    munger_name = Path(munger_path).stem
+    if read_cache is not None:
+        key = read_parameters_key(f_path, p, aux, driving_path, lookup_id)
+        if key not in read_cache.keys():
+            reading = read_single_datafile(
+                f_path,
+                p,
+                munger_path,
+                aux=aux,
+                driving_path=driving_path,
+                lookup_id=lookup_id,
+            )
+            if fatal_error(reading[2]):
+                return reading
+            read_cache[key] = (munger_name, reading)
+        reader_name, (df_dict, row_constants, err) = read_cache[key]
+        err = copy.deepcopy(err)
+        if err and reader_name != munger_name:
+            for err_type in ["munger", "warn-munger"]:
+                if reader_name in err.get(err_type, dict()).keys():
+                    err[err_type][munger_name] = err[err_type].pop(reader_name)
+        return dict(df_dict), copy.deepcopy(row_constants), err
+
     err = None
     kwargs = dict()  # for syntax checker
     df_dict = dict()  # for syntax checker
     row_constants = dict()  # for syntax checker
     rename = dict()  # for syntax checker
     file_name = Path(f_path).name
-    munger_name = Path(munger_path).stem
 
     # prepare keyword arguments for pandas read_* function
     if p["file_type"] in ["excel"]:
@@ -187,15 +492,7 @@ def read_single_datafile(
         if p["multi_block"] == "yes":
             kwargs["header"] = None
     elif p["file_type"] in ["flat_text"]:
-        kwargs = basic_kwargs(p, dict())
-        kwargs = tabular_kwargs(p, kwargs, aux=aux)
-        if p["multi_block"] == "yes":
-            kwargs["header"] = None
-        kwargs["quoting"] = csv.QUOTE_MINIMAL
-        if p["flat_text_delimiter"] in ["tab", "\\t"]:
-            kwargs["sep"] = "\t"
-        else:
-            kwargs["sep"] = p["flat_text_delimiter"]
+        kwargs = flat_text_kwargs(p, aux=aux)
     elif p["file_type"] in ["json-nested"]:
         kwargs, rename = json_kwargs(p["munge_fields"], p["count_location"], "Count")
     # read file
@@ -207,9 +504,8 @@ def read_single_datafile(
             else:
                 driver = nist.xml_count_parse_info(p, ignore_namespace=True)
             xml_path_info = nist.xml_string_path_info(p["munge_fields"], p["namespace"])
-            tree = et.parse(f_path)
-            df, err = nist.df_from_tree(
-                tree,
+            df, err = nist.df_from_xml_file(
+                f_path,
                 xml_path_info=xml_path_info,
                 file_name=file_name,
                 **driver,
@@ -220,9 +516,12 @@ def read_single_datafile(
                 df_dict = {"Sheet1": df}
         elif p["file_type"] in ["json-nested"]:
             # TODO what if json-nested is a lookup?
-            with open(f_path, "r") as f:
-                data = json.loads(f.read())
-            df = pd.json_normalize(data, **kwargs)
+            rows = list()
+            for chunk in json_normalized_row_chunks(
+                f_path, kwargs["record_path"], kwargs["meta"]
+            ):
+                rows.extend(chunk)
+            df = pd.DataFrame(rows)
             if not fatal_error(err):
                 df.rename(columns=rename, inplace=True)
                 df_dict = {"Sheet1": df}
@@ -291,18 +590,7 @@ def read_single_datafile(
                     err = consolidate_errors([err, new_err])
 
         # regularize column names
-        if p["all_rows"] == "data":
-            # rename any columns from header-less tables to column_0, column_1, etc.
-            for k in df_dict.keys():
-                df_dict[k].columns = [f"column_{j}" for j in range(df_dict[k].shape[1])]
-        else:
-            # strip whitespace from column names # TODO handle same for multi-index columns
-            for k in df_dict.keys():
-                if not isinstance(df_dict[k].columns, pd.MultiIndex):
-                    df_dict[k].columns = [
-                        (c.strip() if isinstance(c, str) else c)
-                        for c in df_dict[k].columns
-                    ]
+        df_dict = regularize_column_names(df_dict, p)
 
     except FileNotFoundError:
         err_str = f"File not found: {f_path}"
@@ -343,6 +631,361 @@ def read_single_datafile(
     return df_dict, row_constants, err
 
 
+def read_parameters_key(
+    f_path: str,
+    p: Dict[str, Any],
+    aux: bool = False,
+    driving_path: Optional[str] = None,
+    lookup_id: Optional[str] = None,
+) -> str:
+    """Returns a string identifying the file <f_path> (as last modified) together with
+    all the parameters on which reading it via read_single_datafile depends, so that
+    two readings with the same key give the same results"""
+    try:
+        modified = os.path.getmtime(f_path)
+    except OSError:
+        modified = None
+    read_params = {k: p.get(k) for k in constants.munger_read_parameters}
+    if p.get("file_type") in constants.formula_dependent_file_types:
+        read_params["munge_fields"] = p.get("munge_fields")
+    return repr(
+        (
+            os.path.abspath(f_path),
+            modified,
+            aux,
+            driving_path,
+            lookup_id,
+            sorted(read_params.items()),
+        )
+    )
+
+
+def file_digest(f_path: str) -> str:
+    """Returns the sha256 hex digest of the contents of the file at <f_path>, computed
+    only if the file has changed since its digest was last computed"""
+    key = os.path.abspath(f_path)
+    stat = os.stat(key)
+    cached = file_digests.get(key)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        digest = hashlib.sha256()
+        with open(key, "rb") as f:
+            for block in iter(lambda: f.read(constants.digest_read_size), b""):
+                digest.update(block)
+        file_digests[key] = ((stat.st_mtime_ns, stat.st_size), digest.hexdigest())
+    return file_digests[key][1]
+
+
+def frame_cache_key(
+    f_path: str,
+    munger_path: str,
+    suffix: Optional[str] = None,
+    extra_formula_keys: Optional[List[str]] = None,
+) -> str:
+    """Returns a key identifying the standard count frame of the file at <f_path> as munged
+    by the munger at <munger_path>, which changes whenever the contents of either file change"""
+    digest = hashlib.sha256()
+    digest.update(
+        repr(
+            (
+                constants.frame_cache_version,
+                file_digest(f_path),
+                file_digest(munger_path),
+                suffix,
+                extra_formula_keys,
+            )
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+def cached_frame_path(
+    cache_dir: str, key: str, cache_format: str = constants.default_frame_cache_format
+) -> Optional[str]:
+    """Returns the path of the file storing the dataframe stored under <key> in <cache_format>
+    in the on-disk cache <cache_dir>, if there is one and it has the contents it had when stored,
+    and otherwise None. Stored files are named for their key and the sha256 digest of their contents,
+    so that a file that has been truncated or otherwise altered since it was stored is never read
+    (it is removed instead)."""
+    suffix = constants.frame_cache_suffixes[cache_format]
+    try:
+        entries = [
+            entry.path
+            for entry in os.scandir(cache_dir)
+            if entry.name.startswith(f"{key}_") and entry.name.endswith(suffix)
+        ]
+    except OSError:
+        return None
+    for cache_path in entries:
+        stored_digest = Path(cache_path).name[len(key) + 1 : -len(suffix)]
+        try:
+            if file_digest(cache_path) == stored_digest:
+                return cache_path
+            os.remove(cache_path)
+        except OSError:
+            # e.g., removed by another process
+            continue
+    return None
+
+
+def read_cached_frame(
+    cache_dir: str, key: str, cache_format: str = constants.default_frame_cache_format
+) -> Optional[pd.DataFrame]:
+    """Returns the dataframe stored under <key> in <cache_format> (see constants.frame_cache_suffixes)
+    in the on-disk cache <cache_dir>, or None if there is none. Marks the stored dataframe as
+    most recently used. The "pickle" format should be used only for a cache directory that no one
+    else can write to, since unpickling a file can run arbitrary code."""
+    cache_path = cached_frame_path(cache_dir, key, cache_format=cache_format)
+    if cache_path is None:
+        return None
+    try:
+        if cache_format == "parquet":
+            df = pd.read_parquet(cache_path, engine="pyarrow")
+            # parquet stores missing strings as nulls, which are read as None; restore NaN
+            for c in df.columns[df.dtypes == object]:
+                df[c] = df[c].where(df[c].notna(), np.nan)
+        else:
+            with open(cache_path, "rb") as f:
+                df = pickle.load(f)
+        os.utime(cache_path)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(df, pd.DataFrame):
+        return None
+    return df
+
+
+def write_cached_frame(
+    cache_dir: str,
+    key: str,
+    df: pd.DataFrame,
+    max_bytes: int = constants.frame_cache_max_bytes,
+    cache_format: str = constants.default_frame_cache_format,
+) -> Optional[str]:
+    """Stores <df> under <key> in <cache_format> (see constants.frame_cache_suffixes) in the on-disk
+    cache <cache_dir>, then removes least recently used dataframes until the cache takes at most
+    <max_bytes> on disk. Returns error string, if any"""
+    suffix = constants.frame_cache_suffixes[cache_format]
+    # write to a temporary file first, so that no process ever reads a partial file
+    temp_path = os.path.join(cache_dir, f"{key}.{os.getpid()}.tmp")
+    try:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        if cache_format == "parquet":
+            df.to_parquet(temp_path, engine="pyarrow")
+        else:
+            with open(temp_path, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        cache_path = os.path.join(cache_dir, f"{key}_{file_digest(temp_path)}{suffix}")
+        os.replace(temp_path, cache_path)
+    except ImportError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return (
+            f"Dataframe not cached: the {cache_format} format requires pyarrow "
+            f"(pip install electiondata[cache]), or set cache_format=pickle"
+        )
+    except Exception as exc:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return f"Unable to write dataframe to cache directory {cache_dir}: {exc}"
+
+    # evict least recently used
+    cached = list()
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(tuple(constants.frame_cache_suffixes.values())):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            cached.append((stat.st_mtime, stat.st_size, entry.path))
+    cached.sort()
+    total = sum(size for _, size, _ in cached)
+    for _, size, path in cached:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # e.g., already removed by another process
+            pass
+        total -= size
+    return None
+
+
+def read_xml_in_chunks(
+    f_path: str,
+    p: Dict[str, Any],
+    munger_path: str,
+    chunk_rows: int,
+) -> Iterator[
+    Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[int, Any]], Optional[dict]]
+]:
+    """Streaming version of read_single_datafile for xml files.
+    Yields, for each chunk of at most <chunk_rows> counts, the same triple as read_single_datafile:
+    dictionary of dataframes (with the single key 'Sheet1'), dictionary of row constants (empty)
+    and error. Every dataframe has a column for each munge field, even if no value
+    for the field is found in the chunk. Reading stops after the first fatal error."""
+    file_name = Path(f_path).name
+    munger_name = Path(munger_path).stem
+    driver = nist.xml_count_parse_info(p, ignore_namespace=True)
+    xml_path_info = nist.xml_string_path_info(p["munge_fields"], p["namespace"])
+    columns = ["Count"] + list(xml_path_info.keys())
+    try:
+        for rows, err in nist.xml_row_chunks(
+            f_path,
+            xml_path_info=xml_path_info,
+            file_name=file_name,
+            **driver,
+            ns=p["namespace"],
+            chunk_rows=chunk_rows,
+        ):
+            if fatal_error(err):
+                yield dict(), dict(), err
+                return
+            yield {"Sheet1": pd.DataFrame(rows, columns=columns)}, dict(), err
+    except FileNotFoundError:
+        err_str = f"File not found: {f_path}"
+        yield dict(), dict(), add_new_error(None, "file", file_name, err_str)
+    except et.ParseError as pe:
+        err_str = f"Error parsing results file.\n{pe}"
+        yield dict(), dict(), add_new_error(None, "file", file_name, err_str)
+    except Exception as exc:
+        yield dict(), dict(), add_new_error(
+            None,
+            "file",
+            file_name,
+            f"Unknown exception while reading file in chunks using munger {munger_name}: {exc}",
+        )
+
+
+def read_json_in_chunks(
+    f_path: str,
+    p: Dict[str, Any],
+    munger_path: str,
+    chunk_rows: int,
+) -> Iterator[
+    Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[int, Any]], Optional[dict]]
+]:
+    """Streaming version of read_single_datafile for json-nested files.
+    Yields, for each chunk of at most <chunk_rows> records, the same triple as read_single_datafile:
+    dictionary of dataframes (with the single key 'Sheet1'), dictionary of row constants (empty)
+    and error. Every dataframe has a column for the count and for each munge field, even if
+    no value for the field is found in the chunk. Reading stops after the first error."""
+    file_name = Path(f_path).name
+    munger_name = Path(munger_path).stem
+    kwargs, rename = json_kwargs(p["munge_fields"], p["count_location"], "Count")
+    columns = list(rename.values()) + [".".join(path) for path in kwargs["meta"]]
+    try:
+        for rows in json_normalized_row_chunks(
+            f_path, kwargs["record_path"], kwargs["meta"], chunk_rows=chunk_rows
+        ):
+            df = pd.DataFrame(rows).rename(columns=rename)
+            for c in columns:
+                if c not in df.columns:
+                    df[c] = np.nan
+            yield {"Sheet1": df}, dict(), None
+    except FileNotFoundError:
+        err_str = f"File not found: {f_path}"
+        yield dict(), dict(), add_new_error(None, "file", file_name, err_str)
+    except (json.JSONDecodeError, UnicodeDecodeError) as je:
+        err_str = f"Error parsing results file.\n{je}"
+        yield dict(), dict(), add_new_error(None, "file", file_name, err_str)
+    except Exception as exc:
+        yield dict(), dict(), add_new_error(
+            None,
+            "file",
+            file_name,
+            f"Unknown exception while reading file in chunks using munger {munger_name}: {exc}",
+        )
+
+
+def regularize_column_names(
+    df_dict: Dict[str, pd.DataFrame], p: Dict[str, Any]
+) -> Dict[str, pd.DataFrame]:
+    """Renames columns of header-less tables to column_0, column_1, etc.;
+    otherwise strips whitespace from column names"""
+    if p["all_rows"] == "data":
+        # rename any columns from header-less tables to column_0, column_1, etc.
+        for k in df_dict.keys():
+            df_dict[k].columns = [f"column_{j}" for j in range(df_dict[k].shape[1])]
+    else:
+        # strip whitespace from column names # TODO handle same for multi-index columns
+        for k in df_dict.keys():
+            if not isinstance(df_dict[k].columns, pd.MultiIndex):
+                df_dict[k].columns = [
+                    (c.strip() if isinstance(c, str) else c) for c in df_dict[k].columns
+                ]
+    return df_dict
+
+
+def read_flat_text_in_chunks(
+    f_path: str,
+    p: Dict[str, Any],
+    munger_path: str,
+    chunk_rows: int,
+) -> Iterator[
+    Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[int, Any]], Optional[dict]]
+]:
+    """Streaming version of read_single_datafile for flat_text files that are not multi-block.
+    Yields, for each chunk of at most <chunk_rows> data rows, the same triple as read_single_datafile:
+    dictionary of dataframes (with the single key 'Sheet1'), dictionary of row constants
+    (read once, from the top of the file) and error. Header rows are read once and apply to every chunk.
+    Reading stops after the first chunk with a fatal error. If the records turn out to be of uneven
+    length (so they must be padded, which read_single_datafile can do only for the whole file),
+    yields None in place of the dictionary of dataframes, with a warning, and stops."""
+    file_name = Path(f_path).name
+    munger_name = Path(munger_path).stem
+    row_constants = dict()
+    kwargs = flat_text_kwargs(p)
+    try:
+        # get the row constants
+        if p["rows_with_constants"]:
+            row_df = pd.read_csv(
+                f_path, **get_row_constant_kwargs(kwargs, p["rows_with_constants"])
+            )
+            row_constants["Sheet1"], err = build_row_constants_from_df(
+                row_df, p["rows_with_constants"], file_name, "Sheet1"
+            )
+            if fatal_error(err):
+                yield dict(), row_constants, err
+                return
+        else:
+            err = None
+        with pd.read_csv(f_path, chunksize=chunk_rows, **kwargs) as reader:
+            for df in reader:
+                if df.empty:
+                    continue
+                df_dict = regularize_column_names({"Sheet1": df}, p)
+                # report any errors from the row constants only once
+                yield df_dict, row_constants, err
+                err = None
+    except FileNotFoundError:
+        err_str = f"File not found: {f_path}"
+        yield dict(), row_constants, add_new_error(None, "file", file_name, err_str)
+    except UnicodeDecodeError as ude:
+        err_str = f"Encoding error. Datafile not read completely.\n\t{ude}"
+        yield dict(), row_constants, add_new_error(None, "file", file_name, err_str)
+    except ValueError as ve:
+        # e.g., from uneven record lengths, which cannot be padded chunk by chunk
+        yield None, row_constants, add_new_error(
+            None,
+            "warn-file",
+            file_name,
+            f"ValueError while reading file in chunks, possibly from uneven record lengths: {ve}\n"
+            f"Will read whole file",
+        )
+    except Exception as exc:
+        yield dict(), row_constants, add_new_error(
+            None,
+            "file",
+            file_name,
+            f"Unknown exception while reading file in chunks using munger {munger_name}: {exc}",
+        )
+
+
 def excel_to_dict(
     f_path: str,
     kwargs: Dict[str, Any],
@@ -972,13 +1615,8 @@ def get_filtered_input_options(
     elif menu_type == "contest":
         contest_type = list(set(constants.contest_types_model) & set(filters))[0]
 
-        connection = session.bind.raw_connection()
-        cursor = connection.cursor()
         jurisdiction_id = db.list_to_id(session, "ReportingUnit", filters)
-        reporting_unit = db.name_from_id_cursor(
-            cursor, "ReportingUnit", jurisdiction_id
-        )
-        connection.close()
+        reporting_unit = db.name_from_id(session, "ReportingUnit", jurisdiction_id)
 
         # define input option for all contests of the given type
         contest_type_df = pd.DataFrame(
@@ -1001,14 +1639,11 @@ def get_filtered_input_options(
         jurisdiction_id = db.list_to_id(session, "ReportingUnit", filters)
 
         # get the census data categories
-        connection = session.bind.raw_connection()
-        cursor = connection.cursor()
-
-        # TODO filter by major subdivision of jurisdiction
-        population_df = db.read_external(
-            cursor, election_id, jurisdiction_id, ["Category"]
-        )
-        cursor.close()
+        with db.borrowed_cursor(session) as (connection, cursor):
+            # TODO filter by major subdivision of jurisdiction
+            population_df = db.read_external(
+                cursor, election_id, jurisdiction_id, ["Category"]
+            )
         if population_df.empty:
             population = []
         else:
@@ -1072,17 +1707,14 @@ def get_filtered_input_options(
     ):
         election_id = db.list_to_id(session, "Election", filters)
         jurisdiction_id = db.list_to_id(session, "ReportingUnit", filters)
-        connection = session.bind.raw_connection()
-        cursor = connection.cursor()
-        df_unfiltered = db.read_external(
-            cursor,
-            election_id,
-            jurisdiction_id,
-            ["Source", "Label", "Category"],
-        )
+        with db.borrowed_cursor(session) as (connection, cursor):
+            df_unfiltered = db.read_external(
+                cursor,
+                election_id,
+                jurisdiction_id,
+                ["Source", "Label", "Category"],
+            )
         df = df_unfiltered[df_unfiltered.Category.isin(filters)]
-
-        cursor.close()
     # check if it's looking for a count by party
     elif menu_type == "count":
         election_id = db.list_to_id(session, "Election", filters)
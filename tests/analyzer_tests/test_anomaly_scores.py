@@ -0,0 +1,481 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.spatial.distance as dist
+from scipy import stats
+from electiondata import analyze
+
+
+def calculate_votes_at_stake_by_unit(data: pd.DataFrame) -> pd.DataFrame:
+    """Previous implementation of analyze.calculate_votes_at_stake, one unit at a time"""
+    df = pd.DataFrame()
+    unit_ids = data["unit_id"].unique()
+    for unit_id in unit_ids:
+        temp_df = data[data["unit_id"] == unit_id].copy()
+        try:
+            # get a df of the most anomalous pairing
+            max_score = temp_df["score"].max()
+            index = temp_df.index[temp_df["score"] == max_score][0]
+            reporting_unit_id = temp_df.loc[index, "ReportingUnit_Id"]
+            selection = temp_df.loc[index, "Selection"]
+            margin_pct = temp_df.loc[index, "margins_pct"]
+            reporting_unit_total = temp_df.loc[index, "reporting_unit_total"]
+            anomalous_df = (
+                temp_df[
+                    (temp_df["ReportingUnit_Id"] == reporting_unit_id)
+                    & (
+                        (temp_df["score"] == max_score)
+                        | (temp_df["rank"] == 1)
+                        & (temp_df["reporting_unit_total"] == reporting_unit_total)
+                    )
+                ]
+                .sort_values("rank", ascending=False)
+                .drop_duplicates()
+            )
+
+            # Identify the next closest RU in terms of margins
+            filtered_df = temp_df[
+                (temp_df["ReportingUnit_Id"] != reporting_unit_id)
+                & (temp_df["Selection"] == selection)
+            ]
+            # this finds the closest margin on either side (+/-)
+            next_index = filtered_df.iloc[
+                (filtered_df["margins_pct"] - margin_pct).abs().argsort()[:1]
+            ].index[0]
+            next_reporting_unit_id = temp_df.loc[next_index, "ReportingUnit_Id"]
+            next_margin_pct = temp_df.loc[next_index, "margins_pct"]
+            next_reporting_unit_total = temp_df.loc[next_index, "reporting_unit_total"]
+            next_anomalous_df = (
+                temp_df[
+                    (temp_df["ReportingUnit_Id"] == next_reporting_unit_id)
+                    & (
+                        (temp_df["margins_pct"] == next_margin_pct)
+                        | (temp_df["rank"] == 1)
+                        & (temp_df["reporting_unit_total"] == next_reporting_unit_total)
+                    )
+                ]
+                .sort_values("rank", ascending=False)
+                .drop_duplicates()
+            )
+
+            # move the most anomalous to the closest and calculate what the
+            # change to the Contest margin would be
+            winner_bucket_total = int(
+                anomalous_df[anomalous_df["rank"] == 1]["Count"].item()
+            )
+            not_winner_bucket_total = int(
+                anomalous_df[anomalous_df["rank"] != 1]["Count"].item()
+            )
+            reported_bucket_total = int(anomalous_df["Count"].sum())
+            next_bucket_total = int(next_anomalous_df["Count"].sum())
+            adj_margin = (
+                next_anomalous_df[next_anomalous_df["rank"] != 1].iloc[0]["Count"]
+                / next_bucket_total
+            )
+            not_winner_adj_bucket_total = int(reported_bucket_total * adj_margin)
+            winner_adj_bucket_total = (
+                reported_bucket_total - not_winner_adj_bucket_total
+            )
+
+            # calculate margins by raw numbers for the bucket
+            contest_margin = winner_bucket_total - not_winner_bucket_total
+            adj_contest_margin = winner_adj_bucket_total - not_winner_adj_bucket_total
+
+            # calculate margins by raw numbers for the entire contest
+            contest_margin_ttl = (
+                anomalous_df[anomalous_df["rank"] == 1].iloc[0]["ind_total"]
+                - anomalous_df[anomalous_df["rank"] != 1].iloc[0]["ind_total"]
+            )
+            temp_df["votes_at_stake"] = contest_margin - adj_contest_margin
+            temp_df["margin_ratio"] = temp_df["votes_at_stake"] / contest_margin_ttl
+        except Exception:
+            temp_df["margin_ratio"] = 0
+            temp_df["votes_at_stake"] = 0
+        df = pd.concat([df, temp_df])
+    return df
+
+
+def assign_anomaly_score_by_unit(data: pd.DataFrame) -> pd.DataFrame:
+    """Previous implementation of analyze.assign_anomaly_score, one pair at a time:
+    adds a new column called score between 0 and 1; 1 is more anomalous.
+    Also adds a `unit_id` column which assigns a score to each unit of analysis
+    that is considered. For example, we may decide to look at anomalies across each
+    distinct combination of contest, reporting unit type, and vote type. Each
+    combination of those would get assigned an ID. This means rows may get added
+    to the dataframe if needed."""
+
+    # Assign a ranking for each candidate by votes for each contest
+    if "total" not in data["CountItemType"].unique():
+        groupby_cols = list(data.columns)
+        groupby_cols.remove("Count")
+        total_data = data.groupby(groupby_cols).sum().reset_index()
+    else:
+        total_data = data[data["CountItemType"] == "total"]
+
+    ranked_df = (
+        total_data.groupby(["Contest_Id", "Selection", "Selection_Id"], as_index=False)[
+            "Count"
+        ]
+        .sum()
+        .sort_values(["Contest_Id", "Count"], ascending=False)
+    )
+    ranked_df["rank"] = ranked_df.groupby("Contest_Id")["Count"].rank(
+        "dense", ascending=False
+    )
+    ranked_df.rename(columns={"Count": "ind_total"}, inplace=True)
+
+    # Now get the total votes for the entire contest
+    contest_df = ranked_df.groupby("Contest_Id")["ind_total"].sum().reset_index()
+    contest_df.rename(columns={"ind_total": "contest_total"}, inplace=True)
+    ranked_df = ranked_df.merge(contest_df, how="inner", on="Contest_Id")
+
+    # Group data by parent info. This works because each child is also its own
+    # parent in the DB table
+    grouped_df = (
+        data.groupby(
+            [
+                "ParentReportingUnit_Id",
+                "ParentName",
+                "ParentReportingUnitType",
+                "Candidate_Id",
+                "CountItemType",
+                "Contest_Id",
+                "Contest",
+                "Selection",
+                "contest_type",
+                "contest_district_type",
+            ],
+            as_index=False,
+        )["Count"]
+        .sum()
+        .reset_index()
+    )
+    grouped_df.drop(columns="index", inplace=True)
+    grouped_df.rename(
+        columns={
+            "ParentReportingUnit_Id": "ReportingUnit_Id",
+            "ParentName": "Name",
+            "ParentReportingUnitType": "ReportingUnitType",
+        },
+        inplace=True,
+    )
+    grouped_df = grouped_df.merge(
+        ranked_df, how="inner", on=["Contest_Id", "Selection"]
+    )
+
+    # assign temporary unit_ids to unique combination of contest,
+    # ru_type, and count type. These will be updated later to account
+    # for 2 candidate pairings
+    df_unit = grouped_df[
+        ["Contest_Id", "ReportingUnitType", "CountItemType"]
+    ].drop_duplicates()
+    df_unit = df_unit.reset_index()
+    df_unit["unit_id_tmp"] = df_unit.index
+    df_with_units = grouped_df.merge(
+        df_unit, how="left", on=["Contest_Id", "ReportingUnitType", "CountItemType"]
+    )
+
+    # loop through each unit ID and assign anomaly scores
+    # also update the "real" unit_id which takes into account pairing of candidates
+    unit_ids_tmp = df_with_units["unit_id_tmp"].unique()
+    unit_id = 0
+    df = pd.DataFrame()
+    # for each unit ID
+    for unit_id_tmp in unit_ids_tmp:
+        # grab all the data there
+        temp_df = df_with_units[df_with_units["unit_id_tmp"] == unit_id_tmp]
+        for i in range(2, int(temp_df["rank"].max()) + 1):
+            selection_df = temp_df[temp_df["rank"].isin([1, i])].copy()
+            selection_df["unit_id"] = unit_id
+            unit_id += 1
+            total = (
+                selection_df.groupby("ReportingUnit_Id")["Count"].sum().reset_index()
+            )
+            total.rename(columns={"Count": "reporting_unit_total"}, inplace=True)
+            selection_df = selection_df.merge(total, how="inner", on="ReportingUnit_Id")
+            if selection_df.shape[0] >= 12 and len(selection_df["rank"].unique()) > 1:
+                pivot_df = (
+                    pd.pivot_table(
+                        selection_df,
+                        values="Count",
+                        index=["ReportingUnit_Id", "reporting_unit_total"],
+                        columns="Selection",
+                    )
+                    .sort_values("ReportingUnit_Id")
+                    .reset_index()
+                )
+                pivot_df = pivot_df[pivot_df["reporting_unit_total"] > 0]
+                pivot_df_values = pivot_df.drop(
+                    columns=["ReportingUnit_Id", "reporting_unit_total"]
+                )
+                to_drop = [
+                    selection_df[selection_df["rank"] == 1]["Selection"].unique()[0],
+                    selection_df[selection_df["rank"] == i]["Selection"].unique()[0],
+                ]
+                # pass in proportions instead of raw vlaues
+                vote_proportions = pivot_df_values.div(
+                    pivot_df["reporting_unit_total"], axis=0
+                )
+                vote_proportions = vote_proportions.fillna(0)
+                # assign z score and then add back into final DF
+                scored = analyze.euclidean_zscore(vote_proportions.to_numpy())
+                pivot_df["score"] = scored
+                pivot_df = pivot_df[["ReportingUnit_Id", to_drop[1], "score"]]
+                pivot_df["Selection"] = to_drop[1]
+                pivot_df.rename(columns={to_drop[1]: "Count"}, inplace=True)
+                scored_df = selection_df.merge(
+                    pivot_df, how="left", on=["ReportingUnit_Id", "Selection", "Count"]
+                )
+                df = pd.concat([df, scored_df])
+    if "score" in df.columns:
+        df["score"] = df["score"].fillna(0)
+    return df
+
+
+def scored_frame(rows: list) -> pd.DataFrame:
+    """Frame as passed to calculate_votes_at_stake, from rows of
+    (unit_id, ReportingUnit_Id, Selection, rank, Count, score)"""
+    df = pd.DataFrame(
+        rows,
+        columns=["unit_id", "ReportingUnit_Id", "Selection", "rank", "Count", "score"],
+    )
+    df["reporting_unit_total"] = df.groupby(["unit_id", "ReportingUnit_Id"])[
+        "Count"
+    ].transform("sum")
+    df["ind_total"] = df.groupby(["unit_id", "Selection"])["Count"].transform("sum")
+    df["margins_pct"] = df["Count"] / df["reporting_unit_total"].astype(float)
+    return df
+
+
+def two_candidate_rows(unit_id: int, counts: list, scores: list) -> list:
+    """Rows for a leader A and a challenger B in reporting units 1, 2, ...,
+    with the counts (A, B) and the score of each reporting unit"""
+    rows = list()
+    for ru, ((leader, challenger), score) in enumerate(zip(counts, scores), start=1):
+        rows.append((unit_id, ru, "A", 1, leader, score - 1))
+        rows.append((unit_id, ru, "B", 2, challenger, score))
+    return rows
+
+
+votes_at_stake_frames = {
+    "distinct margins": two_candidate_rows(
+        1, [(60, 40), (70, 30), (55, 45), (90, 10)], [1, 2, 5, 3]
+    ),
+    "zero-vote unit first": two_candidate_rows(
+        1, [(0, 0), (70, 30), (55, 45), (52, 48), (90, 10)], [1, 2, 5, 2, 3]
+    ),
+    "zero-vote unit between": two_candidate_rows(
+        1,
+        [(60, 40), (70, 30), (0, 0), (55, 45), (90, 10), (52, 48)],
+        [1, 2, 1, 5, 3, 2],
+    ),
+    "zero-vote unit most anomalous": two_candidate_rows(
+        1, [(60, 40), (70, 30), (0, 0), (90, 10)], [1, 2, 5, 3]
+    ),
+    "tied margins": two_candidate_rows(
+        1, [(60, 40), (120, 80), (55, 45), (50, 50), (30, 20)], [1, 2, 5, 3, 2]
+    ),
+    "equidistant margins": two_candidate_rows(
+        1, [(70, 30), (60, 40), (50, 50), (40, 60)], [1, 5, 2, 3]
+    ),
+    "tied scores": two_candidate_rows(
+        1, [(60, 40), (70, 30), (55, 45), (90, 10)], [5, 2, 5, 3]
+    ),
+    "no other reporting unit": two_candidate_rows(1, [(60, 40)], [1]),
+    "tied ranks": [
+        (1, 1, "A", 1, 50, 1),
+        (1, 1, "B", 1, 50, 3),
+        (1, 2, "A", 1, 60, 1),
+        (1, 2, "B", 1, 40, 2),
+    ],
+    "several units": (
+        two_candidate_rows(1, [(60, 40), (0, 0), (55, 45), (90, 10)], [1, 2, 5, 3])
+        + two_candidate_rows(2, [(10, 90), (30, 70), (45, 55)], [3, 1, 2])
+        + [
+            (3, 1, "A", 1, 50, 0),
+            (3, 1, "B", 2, 30, 1),
+            (3, 1, "C", 3, 20, 4),
+            (3, 2, "A", 1, 40, 0),
+            (3, 2, "B", 2, 40, 2),
+            (3, 2, "C", 3, 20, 2),
+            (3, 3, "A", 1, 0, 0),
+            (3, 3, "B", 2, 0, 3),
+            (3, 3, "C", 3, 0, 3),
+        ]
+    ),
+}
+
+
+@pytest.mark.parametrize("frame", votes_at_stake_frames.keys())
+def test_votes_at_stake_matches_loop(frame):
+    data = scored_frame(votes_at_stake_frames[frame])
+    # rows of the units interleaved
+    if frame == "several units":
+        data = data.sort_values("ReportingUnit_Id", kind="stable")
+    expected = calculate_votes_at_stake_by_unit(data)
+    df, err_str = analyze.calculate_votes_at_stake(data)
+    pd.testing.assert_frame_equal(df, expected, check_like=True, check_dtype=False)
+
+
+def test_votes_at_stake_empty():
+    df, err_str = analyze.calculate_votes_at_stake(scored_frame(list()))
+    assert df.empty and err_str is None
+
+
+def vote_count_frame(seed: int, count_item_types: tuple) -> pd.DataFrame:
+    """Frame as passed to assign_anomaly_score: vote counts of a few contests in 8 counties
+    (some with no votes), with ties between the contest totals of some candidates"""
+    rng = np.random.default_rng(seed)
+    rows = list()
+    candidate_id = 0
+    for contest_id in range(1, 5):
+        candidates = list()
+        for k in range(contest_id):
+            candidate_id += 1
+            candidates.append((candidate_id, f"Candidate {candidate_id}", f"P{k}"))
+        for ru in range(8):
+            for count_item_type in count_item_types:
+                for cand, name, party in candidates:
+                    count = int(rng.integers(0, 1000)) if ru % 5 else 0
+                    if contest_id == 3 and cand == candidates[-1][0]:
+                        # two candidates tied in every county
+                        count = rows[-1]["Count"]
+                    if contest_id == 4:
+                        # all candidates tied
+                        count = 500 if ru % 5 else 0
+                    rows.append(
+                        {
+                            "ParentReportingUnit_Id": 1000 + ru,
+                            "ParentName": f"County {ru}",
+                            "ParentReportingUnitType": "county",
+                            "ReportingUnitType": "county",
+                            "Candidate_Id": cand,
+                            "CountItemType": count_item_type,
+                            "Contest_Id": contest_id,
+                            "Contest": f"Contest {contest_id}",
+                            "Selection": name,
+                            "Selection_Id": cand + 5000,
+                            "contest_type": "Candidate",
+                            "contest_district_type": "state",
+                            "Party": party,
+                            "Count": count,
+                        }
+                    )
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize(
+    "count_item_types",
+    [("total", "absentee", "election-day"), ("absentee", "election-day")],
+)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_anomaly_score_matches_loop(seed, count_item_types):
+    data = vote_count_frame(seed, count_item_types)
+    expected = assign_anomaly_score_by_unit(data.copy())
+    df = analyze.assign_anomaly_score(data.copy())
+    assert not expected.empty
+    # same rows, in the same order
+    pd.testing.assert_frame_equal(
+        df.drop(columns="score"), expected.drop(columns="score"), check_dtype=False
+    )
+    np.testing.assert_allclose(
+        df["score"].to_numpy(float), expected["score"].to_numpy(float), atol=1e-9
+    )
+
+
+def test_anomaly_score_empty():
+    data = vote_count_frame(0, ("total",)).iloc[:0]
+    assert analyze.assign_anomaly_score(data).empty
+    # too few reporting units to score
+    data = vote_count_frame(0, ("total",))
+    data = data[data["ParentReportingUnit_Id"] < 1002]
+    assert analyze.assign_anomaly_score(data).empty
+
+
+def euclidean_zscore_pairwise(li: list) -> list:
+    """Previous implementation of analyze.euclidean_zscore, one distance at a time"""
+    distance_list = [sum([dist.euclidean(item, y) for y in li]) for item in li]
+    if len(set(distance_list)) == 1:
+        # if all distances are the same, which yields z-score nan values
+        return [0] * len(li)
+    else:
+        return list(stats.zscore(distance_list))
+
+
+zscore_vectors = {
+    "empty": list(),
+    "single vector": [[0.4, 0.6]],
+    "two vectors": [[0.4, 0.6], [0.5, 0.5]],
+    "identical vectors": [[0.25, 0.75]] * 4,
+    "tied distances": [[0, 0], [1, 0], [0, 1], [1, 1]],
+    "some identical vectors": [[0.1, 0.9], [0.1, 0.9], [0.5, 0.5], [0.3, 0.7]],
+    "proportions": [[0.1, 0.2, 0.7], [0.3, 0.3, 0.4], [0.2, 0.2, 0.6]],
+    "one dimension": [[0.52], [0.48], [0.61], [0.5], [0.55]],
+    "random": np.random.default_rng(0).random((40, 3)).tolist(),
+}
+
+
+@pytest.mark.parametrize("vectors", zscore_vectors.keys())
+def test_euclidean_zscore_matches_pairwise(vectors):
+    li = zscore_vectors[vectors]
+    expected = euclidean_zscore_pairwise(li)
+    zscores = analyze.euclidean_zscore(li)
+    assert len(zscores) == len(expected)
+    np.testing.assert_allclose(zscores, expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("vectors", zscore_vectors.keys())
+@pytest.mark.parametrize("tile_elements", [1, 7, 2**20])
+def test_euclidean_distance_sums_in_tiles(vectors, tile_elements):
+    li = zscore_vectors[vectors]
+    expected = [sum([dist.euclidean(item, y) for y in li]) for item in li]
+    np.testing.assert_allclose(
+        analyze.euclidean_distance_sums(li, tile_elements=tile_elements),
+        expected,
+        atol=1e-9,
+    )
+
+
+def zscores_pair_by_pair(vectors: np.ndarray, starts, stops) -> np.ndarray:
+    """Previous scoring in analyze.assign_anomaly_score, one pair at a time"""
+    scores = np.zeros(vectors.shape[0])
+    for start, stop in zip(starts, stops):
+        scores[start:stop] = euclidean_zscore_pairwise(vectors[start:stop].tolist())
+    return scores
+
+
+@pytest.mark.parametrize(
+    "sizes",
+    [[], [5], [3, 1, 4, 1, 5, 9, 2, 6], [4, 4, 4, 4]],
+)
+def test_zscores_by_pair_in_workers_match_serial(sizes, monkeypatch):
+    # score even small jobs in worker processes
+    monkeypatch.setattr(analyze.constants, "min_parallel_scoring_cost", 0)
+    rng = np.random.default_rng(len(sizes))
+    vectors = rng.random((sum(sizes), 2))
+    if sizes == [4, 4, 4, 4]:
+        # ties: all vectors of the last two pairs are the same
+        vectors[8:] = 0.5
+    stops = np.cumsum(np.array(sizes, dtype=int))
+    starts = stops - np.array(sizes, dtype=int)
+    expected = zscores_pair_by_pair(vectors, starts, stops)
+    for workers in [1, 3]:
+        np.testing.assert_allclose(
+            analyze.zscores_by_pair(vectors, starts, stops, workers=workers),
+            expected,
+            atol=1e-9,
+        )
+
+
+def test_anomaly_score_in_workers_matches_loop(monkeypatch):
+    monkeypatch.setattr(analyze.constants, "min_parallel_scoring_cost", 0)
+    data = vote_count_frame(1, ("total", "absentee"))
+    expected = assign_anomaly_score_by_unit(data.copy())
+    df = analyze.assign_anomaly_score(data.copy(), workers=2)
+    pd.testing.assert_frame_equal(
+        df.drop(columns="score"), expected.drop(columns="score"), check_dtype=False
+    )
+    np.testing.assert_allclose(
+        df["score"].to_numpy(float), expected["score"].to_numpy(float), atol=1e-9
+    )
+    assert analyze.assign_anomaly_score(data.iloc[:0].copy(), workers=2).empty
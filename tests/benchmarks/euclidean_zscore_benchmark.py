@@ -0,0 +1,65 @@
+"""Microbenchmark: analyze.euclidean_zscore, old (scipy distance per pair) vs. new (tiled Gram matrix).
+
+Run from the repository root (not collected by pytest):
+    python tests/benchmarks/euclidean_zscore_benchmark.py [--sizes 100 1000 5000 50000] [--legacy-max 2000]
+
+For each size n, builds n vectors of two vote proportions (as assign_anomaly_score does for a pair
+of candidates in n reporting units) and times the current implementation. The old implementation
+makes n^2 calls to scipy from Python, so it is timed, and the results compared, only for n up to
+<legacy-max>.
+"""
+import argparse
+import time
+
+import numpy as np
+import scipy.spatial.distance as dist
+from scipy import stats
+
+from electiondata import analyze as an
+
+
+def legacy_euclidean_zscore(li):
+    distance_list = [sum([dist.euclidean(item, y) for y in li]) for item in li]
+    if len(set(distance_list)) == 1:
+        return [0] * len(li)
+    else:
+        return list(stats.zscore(distance_list))
+
+
+def sample_proportions(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    leader = rng.beta(6, 4, size=n)
+    challenger = (1 - leader) * rng.beta(8, 2, size=n)
+    return np.column_stack([leader, challenger])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000, 50000]
+    )
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        vectors = sample_proportions(n)
+
+        start = time.perf_counter()
+        new = an.euclidean_zscore(vectors)
+        new_seconds = time.perf_counter() - start
+        line = f"n={n:>6,}: new {new_seconds:8.3f} s"
+
+        if n <= args.legacy_max:
+            start = time.perf_counter()
+            old = legacy_euclidean_zscore(vectors)
+            old_seconds = time.perf_counter() - start
+            max_diff = np.max(np.abs(np.asarray(old) - np.asarray(new)))
+            line += (
+                f"  old {old_seconds:8.3f} s  speedup {old_seconds / new_seconds:7.1f}x"
+                f"  max |difference| {max_diff:.1e}"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
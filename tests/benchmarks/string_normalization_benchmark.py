@@ -0,0 +1,85 @@
+"""Microbenchmark: string normalization in munge.clean_strings, old (per-cell) vs. new (per distinct value).
+
+Run from the repository root (not collected by pytest):
+    python tests/benchmarks/string_normalization_benchmark.py [--rows 500000] [--cols 10] [--distinct 2000]
+
+Builds a frame of <rows> x <cols> cells (5M by default) drawn from <distinct> values per column,
+with the irregular whitespace and quotes typical of results files, then times the old
+implementation of clean_strings against the current one and checks that the results agree.
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from electiondata import munge as m
+
+
+def legacy_compress_whitespace(s):
+    try:
+        new_s = re.sub(r"(\s)\s+", "\\1", s)
+        new_s = new_s.strip()
+        new_s = new_s.replace("\n", " ")
+    except Exception:
+        new_s = ""
+    return new_s
+
+
+def legacy_clean_strings(df: pd.DataFrame, cols) -> pd.DataFrame:
+    working = df.copy()
+    for c in cols:
+        working[c] = working[c].astype("string")
+        working[c] = working[c].fillna("")
+        mask = working[c].str.contains('"').fillna(False)
+        working.loc[mask, c] = working[c].str.replace('"', "'")[mask]
+        mask = working[c].apply(lambda x: isinstance(x, str))
+        working.loc[mask, c] = working[c][mask].apply(legacy_compress_whitespace)
+    return working
+
+
+def sample_frame(rows: int, cols: int, distinct: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = dict()
+    for j in range(cols):
+        pool = np.array(
+            [
+                f"  Precinct {j}-{i}\t  Ward  {i % 7} " if i % 3 else f'"Name {i}"\n\n'
+                for i in range(distinct)
+            ],
+            dtype=object,
+        )
+        values = pool[rng.integers(0, distinct, size=rows)]
+        values[rng.random(rows) < 0.01] = None
+        frame[f"col_{j}"] = values
+    return pd.DataFrame(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--distinct", type=int, default=2000)
+    args = parser.parse_args()
+
+    df = sample_frame(args.rows, args.cols, args.distinct)
+    cols = list(df.columns)
+    print(f"{df.size:,} cells ({args.rows:,} rows x {args.cols} columns)")
+
+    start = time.perf_counter()
+    old = legacy_clean_strings(df, cols)
+    old_seconds = time.perf_counter() - start
+    print(f"old clean_strings: {old_seconds:.2f} s")
+
+    start = time.perf_counter()
+    new = m.clean_strings(df, cols)
+    new_seconds = time.perf_counter() - start
+    print(f"new clean_strings: {new_seconds:.2f} s")
+
+    print(f"speedup: {old_seconds / new_seconds:.1f}x")
+    print(f"results agree: {old.equals(new)}")
+
+
+if __name__ == "__main__":
+    main()
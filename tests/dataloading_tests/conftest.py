@@ -1,5 +1,6 @@
 import pytest
 import os
+import configparser
 from pathlib import Path
 import electiondata as ed
 import datetime
@@ -38,3 +39,22 @@ def dataloader(param_file):
     yield dl
     # code after yield statement runs during post-testing clean-up
     dl.close_and_erase()
+
+
+@pytest.fixture(scope="session")
+def partitioned_dataloader(param_file, tmp_path_factory):
+    # same parameters, but with VoteCount partitioned by election
+    params = configparser.ConfigParser(interpolation=None)
+    params.read(param_file)
+    params["electiondata"]["partition_vote_count"] = "true"
+    partitioned_param_file = os.path.join(
+        tmp_path_factory.mktemp("partitioned"), "run_time.ini"
+    )
+    with open(partitioned_param_file, "w") as f:
+        params.write(f)
+    ts = datetime.datetime.now().strftime("%m%d_%H%M")
+    dbname = f"test_partitioned_{ts}"
+    dl = ed.DataLoader(dbname=dbname, param_file=partitioned_param_file)
+    yield dl
+    # code after yield statement runs during post-testing clean-up
+    dl.close_and_erase()
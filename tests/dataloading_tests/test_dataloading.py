@@ -1,6 +1,14 @@
 import pytest
 import os
 from pathlib import Path
+import pandas as pd
+from psycopg2 import sql
+import electiondata as ed
+from electiondata import analyze as an
+from electiondata import database as db
+from electiondata import juris as jm
+from electiondata import munge as m
+from electiondata import userinterface as ui
 
 
 def test_dataloader_exists(dataloader):
@@ -41,7 +49,9 @@ def test_loading(dataloader, test_data_url, param_file):
     )
 
 
-def test_multielection_loading(dataloader):
+def load_multielection_test_file(dataloader):
+    """Loads the multi-election test file (2018 General, Alabama and Arizona) and tests the
+    loaded results against the reference results"""
     tests_dir = Path(__file__).parents[1]
     reference_results = os.path.join(
         tests_dir, "dataloading_tests", "multielection_loading", "reference_results.tsv"
@@ -84,3 +94,300 @@ def test_multielection_loading(dataloader):
             reference_results=reference_results,
         )
         assert test_err["test"] == dict()
+
+
+def test_multielection_loading(dataloader):
+    load_multielection_test_file(dataloader)
+
+
+def test_partitioned_loading(partitioned_dataloader):
+    load_multielection_test_file(partitioned_dataloader)
+
+    # vote counts were routed to a single partition for the election
+    session = partitioned_dataloader.session
+    election_id = db.name_to_id(session, "Election", "2018 General")
+    election_partition = db.vote_count_partition_name(election_id)
+    with db.borrowed_cursor(session) as (connection, cursor):
+        assert db.vote_count_is_partitioned(cursor)
+        assert db.table_exists(cursor, election_partition)
+        cursor.execute(
+            """SELECT count(*) FROM pg_inherits
+            WHERE inhparent = to_regclass(format('%%I.%%I', current_schema(), %s))""",
+            ["VoteCount"],
+        )
+        assert cursor.fetchone()[0] == 1
+        datafile_ids, err_str = db.data_file_list_cursor(cursor, election_id)
+        assert err_str is None and datafile_ids
+
+        # queries for the election scan only its partition
+        cursor.execute(
+            'EXPLAIN SELECT sum("Count") FROM "VoteCount" WHERE "Election_Id" = %s',
+            [election_id],
+        )
+        plan = "\n".join(row for (row,) in cursor.fetchall())
+        assert election_partition in plan
+        cursor.execute(
+            'EXPLAIN SELECT sum("Count") FROM "VoteCount" WHERE "Election_Id" = %s',
+            [election_id + 1000000],
+        )
+        plan = "\n".join(row for (row,) in cursor.fetchall())
+        assert election_partition not in plan
+
+    # removing a datafile deletes its counts; the partition is dropped with the last datafile
+    for i, datafile_id in enumerate(datafile_ids):
+        assert db.remove_vote_counts(session, datafile_id) is None
+        with db.borrowed_cursor(session) as (connection, cursor):
+            cursor.execute(
+                'SELECT count(*) FROM "VoteCount" WHERE "_datafile_Id" = %s',
+                [datafile_id],
+            )
+            assert cursor.fetchone()[0] == 0
+            assert db.table_exists(cursor, election_partition) == (
+                i < len(datafile_ids) - 1
+            )
+
+
+def test_chunked_loading(dataloader):
+    # jurisdictions and election must be in the db
+    load_multielection_test_file(dataloader)
+
+    tests_dir = Path(__file__).parents[1]
+    results_dir = os.path.join(tests_dir, "dataloading_tests")
+    file_name = "county_2018_AL_AZ_only.csv"
+    f_path = os.path.join(results_dir, "multielection_loading", file_name)
+    content_root = dataloader.d["repository_content_root"]
+    munger_path = os.path.join(content_root, "mungers", "medsl_2018.munger")
+    juris_path = os.path.join(content_root, "jurisdictions", "Alabama")
+    election_id = db.name_to_id(dataloader.session, "Election", "2018 General")
+    jurisdiction_id = db.name_to_id(dataloader.session, "ReportingUnit", "Alabama")
+
+    # load the same file whole and in chunks, each to its own datafile record
+    totals = dict()
+    stats = dict()
+    for chunk_rows in [None, 1000]:
+        datafile_id, err = ed.datafile_info(
+            dataloader.session.bind,
+            "county_2018_AL_AZ_only.ini",
+            f"chunked_loading_test_{chunk_rows}",
+            file_name,
+            "2021-07-10",
+            "Stephanie Singer",
+            "created for repo testing",
+            jurisdiction_id,
+            election_id,
+            False,
+        )
+        assert not ui.fatal_error(err)
+        stats[chunk_rows] = dict()
+        err = ed.load_results_file(
+            dataloader.session,
+            munger_path,
+            f_path,
+            "Alabama",
+            datafile_id,
+            election_id,
+            dict(),
+            results_dir,
+            juris_path,
+            chunk_rows=chunk_rows,
+            stats=stats[chunk_rows],
+        )
+        assert not ui.fatal_error(err)
+        totals[chunk_rows] = db.read_query(
+            dataloader.session,
+            """SELECT "Contest_Id", "Selection_Id", "ReportingUnit_Id", "CountItemType", "Count"
+            FROM "VoteCount" WHERE "_datafile_Id" = %s
+            ORDER BY "Contest_Id", "Selection_Id", "ReportingUnit_Id", "CountItemType"
+            """,
+            params=[datafile_id],
+        )
+
+    # counts for the same contest, selection, etc. in different chunks are summed, not dropped
+    assert not totals[None].empty
+    assert totals[1000].equals(totals[None])
+
+    # statistics of the inserts are filled, with every vote count inserted (or staged) counted
+    for chunk_rows in [None, 1000]:
+        assert stats[chunk_rows]["rows"] >= totals[None].shape[0]
+        assert stats[chunk_rows]["seconds"] > 0
+        assert stats[chunk_rows]["seconds_per_million_rows"] > 0
+        assert stats[chunk_rows]["peak_memory_mb"] > 0
+    assert stats[None]["rows"] == totals[None].shape[0]
+
+
+def compare_row_by_row(analyzer, reference: str) -> (set, set, set):
+    """Classifies the rows of the <reference> file as compare_to_results_file did before it compared
+    in batches, calling contest_total once per row. Returns the keys of the rows not found, ok and
+    wrong (with the database total)"""
+    ref = pd.read_csv(reference, sep="\t")
+    ref["VoteType"].fillna("total", inplace=True)
+    ref, _ = m.clean_count_cols(ref, ["Count"])
+    not_found_in_db, ok, wrong = set(), set(), set()
+    for idx, row in ref.iterrows():
+        key = tuple(row[reference_key_cols])
+        db_total = analyzer.contest_total(
+            election=row["Election"],
+            jurisdiction=row["Jurisdiction"],
+            contest=row["Contest"],
+            reporting_unit=row["ReportingUnit"],
+            vote_type=row["VoteType"],
+        )
+        if db_total is None:
+            not_found_in_db.add(key)
+        elif int(db_total) == int(row["Count"]):
+            ok.add(key)
+        else:
+            wrong.add(key + (int(db_total),))
+    return not_found_in_db, ok, wrong
+
+
+reference_key_cols = [
+    "Election",
+    "Jurisdiction",
+    "Contest",
+    "ReportingUnit",
+    "VoteType",
+    "Count",
+]
+
+
+def test_compare_to_results_file_matches_row_by_row(dataloader, tmp_path):
+    # jurisdictions and election must be in the db
+    load_multielection_test_file(dataloader)
+
+    tests_dir = Path(__file__).parents[1]
+    ref = pd.read_csv(
+        os.path.join(
+            tests_dir,
+            "dataloading_tests",
+            "multielection_loading",
+            "reference_results.tsv",
+        ),
+        sep="\t",
+    )
+    # add rows with a wrong count, a missing vote type, an unknown contest and an unknown reporting unit
+    first = ref.iloc[0]
+    extra = pd.DataFrame(
+        [
+            {**first, "Count": first["Count"] + 1},
+            {**first, "VoteType": None},
+            {**first, "Contest": "AL Dogcatcher"},
+            {**first, "ReportingUnit": "Alabama;Nowhere County"},
+        ]
+    )
+    reference = os.path.join(tmp_path, "reference_results.tsv")
+    pd.concat([ref, extra]).to_csv(reference, sep="\t", index=False)
+
+    not_found_in_db, ok, wrong, _, _, err = dataloader.analyzer.compare_to_results_file(
+        reference
+    )
+    expected = compare_row_by_row(dataloader.analyzer, reference)
+    assert (
+        set(not_found_in_db[reference_key_cols].itertuples(index=False, name=None)),
+        set(ok[reference_key_cols].itertuples(index=False, name=None)),
+        set(
+            wrong.rename(columns={"Reference_Count": "Count"})[
+                reference_key_cols + ["Database_Count"]
+            ].itertuples(index=False, name=None)
+        ),
+    ) == expected
+    assert ("2018 General", "Alabama", "AL Dogcatcher") in {
+        key[:3] for key in expected[0]
+    }
+    assert len(expected[2]) == 1
+
+    # unknown reporting unit is reported
+    assert "Alabama;Nowhere County" in str(err["warn-test"])
+
+
+def test_juris_load_marks_scores_stale(dataloader):
+    # jurisdictions and election must be in the db
+    load_multielection_test_file(dataloader)
+
+    session = dataloader.session
+    election_id = db.name_to_id(session, "Election", "2018 General")
+    jurisdiction_id = db.name_to_id(session, "ReportingUnit", "Alabama")
+
+    # scores are stored, and current
+    scored, err_str = an.refresh_anomaly_scores(
+        session, election_id, jurisdiction_id, "county"
+    )
+    assert err_str is None
+    signature, stored_signature = db.anomaly_score_signatures(
+        session, election_id, jurisdiction_id, "county"
+    )
+    assert stored_signature == signature
+
+    # loading the jurisdiction files marks the scores stale, without changing the datafiles
+    err = jm.load_or_update_juris_to_db(
+        session, dataloader.d["repository_content_root"], "Alabama", "Alabama"
+    )
+    assert not ui.fatal_error(err)
+    new_signature, stored_signature = db.anomaly_score_signatures(
+        session, election_id, jurisdiction_id, "county"
+    )
+    assert new_signature == signature
+    assert stored_signature is None
+
+    # so the scores are recomputed when next needed
+    scored, err_str = an.refresh_anomaly_scores(
+        session, election_id, jurisdiction_id, "county"
+    )
+    assert err_str is None and scored is not None
+    assert db.anomaly_score_signatures(
+        session, election_id, jurisdiction_id, "county"
+    ) == (signature, signature)
+
+
+def public_table_contents(dataloader) -> dict:
+    """Returns the number of records and a hash of the contents of each public table"""
+    contents = dict()
+    with db.borrowed_cursor(dataloader.session) as (connection, cursor):
+        for table in db.public_tables_in_dependency_order(cursor):
+            cursor.execute(
+                sql.SQL(
+                    "SELECT count(*), md5(string_agg(t::text, ',' ORDER BY t::text)) FROM {table} t"
+                ).format(table=sql.Identifier("public", table))
+            )
+            contents[table] = cursor.fetchone()
+    return contents
+
+
+@pytest.mark.parametrize("tests_pass", [False, True])
+def test_staged_reload(dataloader, tmp_path, monkeypatch, tests_pass):
+    # jurisdictions, election and results must be in the db
+    load_multielection_test_file(dataloader)
+    before = public_table_contents(dataloader)
+    party = f"pytest staged party {tests_pass}"
+
+    # instead of loading files, add a party in the staging schema and report the test results
+    def load_into_staging(self, **kwargs):
+        err = db.insert_to_cdf_db(
+            self.session.bind,
+            pd.DataFrame([[party, "none"]], columns=["Name", "Abbreviation"]),
+            "Party",
+            "database",
+            "test_staged_reload",
+        )
+        assert err is None
+        return (
+            {"2018 General;Alabama": list()},
+            {"2018 General;Alabama": list()},
+            {"2018 General;Alabama": tests_pass},
+            None,
+        )
+
+    monkeypatch.setattr(ed.DataLoader, "load_all", load_into_staging)
+    err = ed.stage_and_publish_juris_election(
+        dataloader, "Alabama", "2018 General", str(tmp_path), move_files=False
+    )
+    assert not ui.fatal_error(err)
+    after = public_table_contents(dataloader)
+
+    # the party is published only if tests pass; nothing else in the live tables changes
+    assert (db.name_to_id(dataloader.session, "Party", party) is not None) == tests_pass
+    if tests_pass:
+        assert after["Party"][0] == before["Party"][0] + 1
+        after.pop("Party")
+        before.pop("Party")
+    assert after == before
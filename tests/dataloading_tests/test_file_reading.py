@@ -0,0 +1,242 @@
+import io
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from lxml import etree as lxml_et
+from electiondata import nist
+from electiondata import userinterface as ui
+
+nist_v2_file = os.path.join(
+    Path(__file__).parents[1], "000_data_for_pytest", "nist_v2_wy20g.xml"
+)
+nist_v2_namespace = "http://itl.nist.gov/ns/voting/1500-100/v2"
+
+# nested results, with strings (some with escapes) and numbers long enough to be split
+# across read buffers, and meta values both before and after the records they apply to
+json_results = {
+    "election": "2020 General",
+    "contests": [
+        {
+            "name": 'US President (\u00e9lection) "Wyoming"',
+            "district": "Statewide",
+            "results": [
+                {
+                    "candidate": "Joseph R. Biden",
+                    "votes": 73491,
+                    "detail": {"type": "total", "share": 26.553},
+                },
+                {
+                    "candidate": "Donald J. Trump",
+                    "votes": 193559,
+                    "detail": {"type": "total", "share": 69.939},
+                },
+            ],
+            "certified": True,
+        },
+        {
+            "results": [
+                {
+                    "candidate": "Merav Ben David",
+                    "votes": 72766,
+                    "detail": {"type": "total", "share": None},
+                },
+                {
+                    "candidate": "Cynthia M. Lummis",
+                    "votes": 198100,
+                    "detail": {"type": "total", "share": 1.2e-3},
+                },
+            ],
+            "name": "US Senate",
+            "note": [1, [2, {"skipped": False}]],
+        },
+    ],
+    "state": "Wyoming",
+}
+json_record_path = ["contests", "results"]
+json_meta = [["election"], ["state"], ["contests", "name"], ["contests", "district"]]
+
+
+@pytest.mark.parametrize(
+    "main_path, main_attrib, munge_fields, lookup_id",
+    [
+        # counts, as read per the nist_v2_xml munger
+        (
+            "ElectionReport/Election/Contest/ContestSelection/VoteCounts/Count",
+            None,
+            [
+                "Contest/Name",
+                "VoteCounts/Type",
+                "VoteCounts/GpUnitId",
+                "ContestSelection/CandidateIds",
+            ],
+            None,
+        ),
+        # lookups, as read per the nist_v2_xml munger
+        (
+            "ElectionReport/GpUnit",
+            "ObjectId",
+            ["GpUnit/Name/Text"],
+            "VoteCounts/GpUnitId",
+        ),
+        (
+            "ElectionReport/Election/Candidate",
+            "ObjectId",
+            ["Candidate/BallotName/Text", "Candidate/PartyId"],
+            "ContestSelection/CandidateIds",
+        ),
+    ],
+)
+def test_xml_streaming_matches_tree(main_path, main_attrib, munge_fields, lookup_id):
+    xml_path_info = nist.xml_string_path_info(munge_fields, nist_v2_namespace)
+    from_tree, tree_err = nist.df_from_tree(
+        lxml_et.parse(nist_v2_file),
+        main_path,
+        main_attrib,
+        xml_path_info,
+        "nist_v2_wy20g.xml",
+        nist_v2_namespace,
+        lookup_id=lookup_id,
+    )
+    from_file, file_err = nist.df_from_xml_file(
+        nist_v2_file,
+        main_path,
+        main_attrib,
+        xml_path_info,
+        "nist_v2_wy20g.xml",
+        nist_v2_namespace,
+        lookup_id=lookup_id,
+    )
+    assert tree_err is None and file_err is None
+    assert not from_tree.empty
+    pd.testing.assert_frame_equal(from_file, from_tree)
+
+    # same rows when read in small chunks
+    chunks = list(
+        nist.xml_row_chunks(
+            nist_v2_file,
+            main_path,
+            main_attrib,
+            xml_path_info,
+            "nist_v2_wy20g.xml",
+            nist_v2_namespace,
+            lookup_id=lookup_id,
+            chunk_rows=7,
+        )
+    )
+    assert all(err is None and len(rows) <= 7 for rows, err in chunks)
+    from_chunks = pd.DataFrame([row for rows, err in chunks for row in rows])
+    pd.testing.assert_frame_equal(from_chunks, from_tree)
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 2**16])
+def test_json_events(read_size):
+    for text in [json.dumps(json_results), json.dumps(json_results, indent=2)]:
+        events = ui.json_events(io.StringIO(text), read_size=read_size)
+        assert ui.json_value(events, *next(events)) == json_results
+        # document is read completely
+        assert list(events) == list()
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 2**16])
+def test_json_normalized_row_chunks(tmp_path, read_size):
+    f_path = os.path.join(tmp_path, "results.json")
+    with open(f_path, "w") as f:
+        json.dump(json_results, f)
+    chunks = list(
+        ui.json_normalized_row_chunks(
+            f_path, json_record_path, json_meta, chunk_rows=3, read_size=read_size
+        )
+    )
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    streamed = pd.DataFrame([row for chunk in chunks for row in chunk])
+    normalized = pd.json_normalize(
+        json_results, record_path=json_record_path, meta=json_meta, errors="ignore"
+    )
+    pd.testing.assert_frame_equal(streamed, normalized, check_like=True)
+
+
+def count_frame(seed: int) -> pd.DataFrame:
+    """Small standard count frame, with a missing string"""
+    return pd.DataFrame(
+        {
+            "Candidate_raw_SOURCE": ["Biden", "Trump", None, f"Write-in {seed}"],
+            "ReportingUnit_raw_SOURCE": ["Albany", "Albany", "Big Horn", "Big Horn"],
+            "Count": [100 + seed, 200, 300, 4],
+        }
+    ).fillna(value=np.nan)
+
+
+def cache_files(cache_dir) -> list:
+    return sorted(entry.path for entry in os.scandir(cache_dir))
+
+
+@pytest.fixture(params=["parquet", "pickle"])
+def cache_format(request):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    return request.param
+
+
+def test_frame_cache_hit(tmp_path, cache_format):
+    df = count_frame(0)
+    assert ui.read_cached_frame(tmp_path, "abc", cache_format=cache_format) is None
+    assert ui.write_cached_frame(tmp_path, "abc", df, cache_format=cache_format) is None
+    pd.testing.assert_frame_equal(
+        ui.read_cached_frame(tmp_path, "abc", cache_format=cache_format), df
+    )
+    # other keys and other formats miss
+    assert ui.read_cached_frame(tmp_path, "abd", cache_format=cache_format) is None
+    other_format = [f for f in ["parquet", "pickle"] if f != cache_format][0]
+    assert ui.read_cached_frame(tmp_path, "abc", cache_format=other_format) is None
+
+
+def test_frame_cache_stale(tmp_path, cache_format):
+    assert (
+        ui.write_cached_frame(
+            tmp_path, "abc", count_frame(0), cache_format=cache_format
+        )
+        is None
+    )
+    [cache_path] = cache_files(tmp_path)
+    # alter the stored file, keeping its size
+    with open(cache_path, "r+b") as f:
+        contents = f.read()
+        f.seek(0)
+        f.write(bytes(b ^ 1 for b in contents[:8]))
+    assert ui.read_cached_frame(tmp_path, "abc", cache_format=cache_format) is None
+    # altered file is removed
+    assert cache_files(tmp_path) == list()
+
+
+def test_frame_cache_eviction(tmp_path, cache_format):
+    for seed, key in enumerate(["a", "b"]):
+        assert (
+            ui.write_cached_frame(
+                tmp_path, key, count_frame(seed), cache_format=cache_format
+            )
+            is None
+        )
+    # "a" stored before "b", but used more recently
+    for t, path in zip([1000, 2000], cache_files(tmp_path)):
+        os.utime(path, (t, t))
+    assert ui.read_cached_frame(tmp_path, "a", cache_format=cache_format) is not None
+    max_bytes = 2.5 * max(os.path.getsize(path) for path in cache_files(tmp_path))
+    assert (
+        ui.write_cached_frame(
+            tmp_path,
+            "c",
+            count_frame(2),
+            max_bytes=max_bytes,
+            cache_format=cache_format,
+        )
+        is None
+    )
+    assert ui.read_cached_frame(tmp_path, "b", cache_format=cache_format) is None
+    for seed, key in [(0, "a"), (2, "c")]:
+        pd.testing.assert_frame_equal(
+            ui.read_cached_frame(tmp_path, key, cache_format=cache_format),
+            count_frame(seed),
+        )
@@ -0,0 +1,350 @@
+import os
+import re
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+from electiondata import munge as m
+
+mungers_dir = os.path.join(Path(__file__).parents[2], "src", "mungers")
+
+dictionary_rows = [
+    ("Party", "Democratic Party", "DEM"),
+    ("Party", "Republican Party", "REP"),
+    ("Candidate", "Hillary Clinton", "HILLARY CLINTON"),
+    ("Candidate", "Donald J. Trump", "Donald J. Trump"),
+    ("CountItemType", "election-day", "Election Day"),
+]
+
+
+def write_dictionary(dictionary_path: str, rows: list):
+    pd.DataFrame(
+        rows, columns=["cdf_element", "cdf_internal_name", "raw_identifier_value"]
+    ).to_csv(dictionary_path, sep="\t", index=False)
+
+
+def test_dictionary_lookups(tmp_path):
+    dictionary_path = os.path.join(tmp_path, "dictionary.txt")
+    write_dictionary(dictionary_path, dictionary_rows)
+    dictionary = m.compile_dictionary(dictionary_path)
+    assert dictionary.internal_names("Party") == {
+        "DEM": "Democratic Party",
+        "REP": "Republican Party",
+    }
+    # raw and internal candidate names are regularized
+    assert dictionary.internal_names("Candidate") == {
+        "Hillary Clinton": "Hillary Clinton",
+        "Donald J. Trump": "Donald J. Trump",
+    }
+    assert dictionary.internal_names("CountItemType") == {
+        "Election Day": "election-day"
+    }
+    assert dictionary.internal_names("Office") == dict()
+
+
+def test_dictionary_duplicate_raw(tmp_path):
+    dictionary_path = os.path.join(tmp_path, "dictionary.txt")
+    write_dictionary(
+        dictionary_path,
+        dictionary_rows
+        + [
+            ("Party", "Democratic-Farmer-Labor Party", "DEM"),
+            # same raw name once regularized
+            ("Candidate", "Clinton, Hillary", "Hillary Clinton"),
+        ],
+    )
+    dictionary = m.compile_dictionary(dictionary_path)
+    # first entry wins
+    assert dictionary.internal_names("Party")["DEM"] == "Democratic Party"
+    assert (
+        dictionary.internal_names("Candidate")["Hillary Clinton"] == "Hillary Clinton"
+    )
+
+    # each raw value gives exactly one row when replaced
+    df = pd.DataFrame({"Party_raw": ["DEM", "REP", "GRN"], "Count": [1, 2, 3]})
+    replaced, err = m.replace_raw_with_internal_name(
+        df, "test_munger", "results.csv", "Party", dictionary, dictionary_path
+    )
+    assert list(replaced["Party"]) == [
+        "Democratic Party",
+        "Republican Party",
+        "none or unknown",
+    ]
+    assert list(replaced["Count"]) == [1, 2, 3]
+
+
+def test_dictionary_recompiled_when_modified(tmp_path):
+    dictionary_path = os.path.join(tmp_path, "dictionary.txt")
+    write_dictionary(dictionary_path, dictionary_rows)
+    dictionary = m.compile_dictionary(dictionary_path)
+    # unchanged file is not compiled again
+    assert m.compile_dictionary(dictionary_path) is dictionary
+
+    # same size, new contents and modification time
+    stat = os.stat(dictionary_path)
+    write_dictionary(
+        dictionary_path,
+        [("Party", "Democratic Party", "DEX")] + dictionary_rows[1:],
+    )
+    os.utime(dictionary_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert os.stat(dictionary_path).st_size == stat.st_size
+    recompiled = m.compile_dictionary(dictionary_path)
+    assert recompiled is not dictionary
+    assert recompiled.internal_names("Party") == {
+        "DEX": "Democratic Party",
+        "REP": "Republican Party",
+    }
+
+    # appended entries are found
+    write_dictionary(
+        dictionary_path,
+        dictionary_rows + [("Party", "Green Party", "GRN")],
+    )
+    assert m.compile_dictionary(dictionary_path).internal_names("Party")["GRN"] == (
+        "Green Party"
+    )
+
+
+def previous_munger_params(munger_path: str, results_dir: str = None) -> (dict, dict):
+    """Previous m.get_and_check_munger_params, reading the munger file on every call"""
+    params, lookup_source_files, err = m.read_munger_params(munger_path)
+    if results_dir:
+        for source_file in lookup_source_files:
+            if not os.path.isfile(os.path.join(results_dir, source_file)):
+                err = m.ui.add_new_error(
+                    err,
+                    "munger",
+                    Path(munger_path).stem,
+                    f"Auxiliary file not found: {source_file}",
+                )
+    return params, err
+
+
+@pytest.mark.parametrize(
+    "munger", sorted(f for f in os.listdir(mungers_dir) if f.endswith(".munger"))
+)
+def test_compiled_munger_matches_file(munger, tmp_path):
+    munger_path = os.path.join(mungers_dir, munger)
+    # twice, so that the second call uses the compiled munger
+    for _ in range(2):
+        assert m.get_and_check_munger_params(munger_path) == previous_munger_params(
+            munger_path
+        )
+        # lookup source files are not in an empty results directory
+        assert m.get_and_check_munger_params(
+            munger_path, results_dir=str(tmp_path)
+        ) == previous_munger_params(munger_path, results_dir=str(tmp_path))
+        assert m.get_munge_formulas(munger_path) == m.read_munge_formulas(munger_path)
+        for extra in [None, ["Election", "Jurisdiction"]]:
+            assert m.get_string_fields_from_munger(
+                munger_path, extra_formula_keys=extra
+            ) == m.read_string_fields_from_munger(munger_path, extra_formula_keys=extra)
+        plan = m.compile_munger(munger_path)
+        assert plan.ignore == m.read_ignored_values(munger_path)
+        # formulas with suffix appended to each field, as previously computed for each element
+        assert plan.formulas_with_suffix("_SOURCE") == {
+            element: re.sub("<([^>]*)>", "<\\1_SOURCE>", formula)
+            for element, formula in m.read_munge_formulas(munger_path)[0].items()
+        }
+
+
+regex_formula_frames = {
+    "empty": pd.DataFrame(columns=["Candidate_SOURCE", "County_SOURCE"]),
+    "matched and unmatched": pd.DataFrame(
+        {
+            "Candidate_SOURCE": ["Biden (DEM)", "Trump (REP)", "Write-ins", ""],
+            "County_SOURCE": ["Albany", "Albany", "Big Horn", "Big Horn"],
+        }
+    ),
+    "repeated values": pd.DataFrame(
+        {
+            "Candidate_SOURCE": ["Biden (DEM)"] * 3 + ["Biden (DEM) (DEM)"],
+            "County_SOURCE": ["Albany"] * 4,
+        }
+    ),
+}
+
+
+@pytest.mark.parametrize("frame", regex_formula_frames.keys())
+@pytest.mark.parametrize(
+    "formula",
+    [
+        r"{<Candidate_SOURCE>,^.*\((.*)\)$}",
+        r"<County_SOURCE>;{<Candidate_SOURCE>,^(.*) \(.*\)$}",
+        "<County_SOURCE>",
+    ],
+)
+def test_compiled_regexes_match_recompiled(frame, formula):
+    df = regex_formula_frames[frame]
+    regexes = {
+        pattern_str: re.compile(pattern_str)
+        for _, pattern_str in m.constants.brace_pattern.findall(formula)
+    }
+    expected, expected_err = m.add_column_from_formula(
+        df, formula, "Party_raw", None, "test_munger"
+    )
+    compiled, compiled_err = m.add_column_from_formula(
+        df, formula, "Party_raw", None, "test_munger", regexes=regexes
+    )
+    pd.testing.assert_frame_equal(compiled, expected)
+    assert compiled_err == expected_err
+
+
+def test_munger_recompiled_when_modified(tmp_path):
+    munger_path = os.path.join(tmp_path, "test.munger")
+    with open(os.path.join(mungers_dir, "ri_gen.munger")) as f:
+        text = f.read()
+    with open(munger_path, "w") as f:
+        f.write(text)
+    plan = m.compile_munger(munger_path)
+    # unchanged file is not compiled again
+    assert m.compile_munger(munger_path) is plan
+
+    stat = os.stat(munger_path)
+    with open(munger_path, "w") as f:
+        f.write(text.replace("Party=<Party>", "Party=<Party Name>"))
+    os.utime(munger_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert m.get_munge_formulas(munger_path)[0]["Party"] == "<Party Name>"
+    assert m.compile_munger(munger_path) is not plan
+
+
+flat_text_munger = r"""[format]
+file_type=flat_text
+count_location=by_name:Election Day,Mail
+flat_text_delimiter=,
+noncount_header_row=0
+count_header_row_numbers=0
+count_field_name_row=0
+
+[munge formulas]
+ReportingUnit=<County>;<Precinct>
+Party={<Candidate>,^.*\((.*)\)$}
+CandidateContest=<Contest>
+Candidate={<Candidate>,^(.*) \(.*\)$}
+CountItemType=<count_header_0>
+
+[ignore]
+"""
+
+flat_text_results = {
+    "header only": "County,Precinct,Contest,Candidate,Election Day,Mail\n",
+    "repeated combinations and tied counts": (
+        "County,Precinct,Contest,Candidate,Election Day,Mail\n"
+        "Albany,P1,President,Biden (DEM),10,5\n"
+        "Albany,P1,President,Trump (REP),10,5\n"
+        "Albany,P1,President,Biden (DEM),3,0\n"
+        " Albany ,P2,President,Biden (DEM),7,7\n"
+        "Albany,P2,President,Write-ins,7,7\n"
+        "Big Horn,,President,Trump (REP),0,0\n"
+    ),
+}
+
+
+@pytest.mark.parametrize("results", flat_text_results.keys())
+def test_distinct_munging_matches_row_by_row(results, tmp_path):
+    munger_path = os.path.join(tmp_path, "test.munger")
+    f_path = os.path.join(tmp_path, "results.csv")
+    with open(munger_path, "w") as f:
+        f.write(flat_text_munger)
+    with open(f_path, "w") as f:
+        f.write(flat_text_results[results])
+    p, err = m.get_and_check_munger_params(munger_path)
+    assert err is None
+    by_row, by_row_err = m.file_to_raw_df(
+        munger_path, p, f_path, str(tmp_path), distinct=False
+    )
+    by_combination, by_combination_err = m.file_to_raw_df(
+        munger_path, p, f_path, str(tmp_path), distinct=True
+    )
+    assert by_row.empty == (results == "header only")
+    assert by_combination_err == by_row_err
+    pd.testing.assert_frame_equal(
+        by_combination, by_row, check_like=True, check_dtype=False
+    )
+
+
+def test_distinct_keys_and_broadcast():
+    df = pd.DataFrame(
+        {
+            "Candidate": ["Biden", "Trump", "Biden", "Biden", None, None],
+            "County": ["Albany", "Albany", "Albany", "Big Horn", "Albany", "Albany"],
+            "Count": [10, 10, 3, 7, 1, 2],
+        }
+    )
+    keys, codes = m.distinct_keys(df, ["Count"])
+    # combinations in order of first appearance, missing values included
+    assert list(codes) == [0, 1, 0, 2, 3, 3]
+    assert keys.shape[0] == 4
+    counts = df[["Count"]]
+    key_col = m.constants.distinct_key_column
+
+    # munging each combination to one row restores the rows
+    pd.testing.assert_frame_equal(
+        m.broadcast_to_rows(keys, codes, counts), df, check_like=True
+    )
+    # rows of a dropped combination are dropped
+    kept = m.broadcast_to_rows(keys[keys[key_col] != 0], codes, counts)
+    pd.testing.assert_frame_equal(
+        kept, df[codes != 0].reset_index(drop=True), check_like=True
+    )
+    # a combination munged to several rows gives several rows for each of its rows
+    doubled = m.broadcast_to_rows(pd.concat([keys, keys.iloc[[2]]]), codes, counts)
+    assert sorted(doubled["Count"]) == sorted(list(df["Count"]) + [7])
+
+    # empty frame
+    empty = df.iloc[:0]
+    keys, codes = m.distinct_keys(empty, ["Count"])
+    assert keys.empty and codes.size == 0
+    assert m.broadcast_to_rows(keys, codes, empty[["Count"]]).empty
+
+
+# mungers reading results files as flat_text_munger does, with other formulas,
+# and a munger reading them differently
+same_reading_munger = flat_text_munger.replace(
+    "Candidate={<Candidate>,^(.*) \\(.*\\)$}", "Candidate=<Candidate>"
+).replace("ReportingUnit=<County>;<Precinct>", "ReportingUnit=<County>")
+other_reading_munger = flat_text_munger.replace(
+    "file_type=flat_text", "file_type=flat_text\nencoding=iso-8859-1"
+)
+
+
+@pytest.mark.parametrize("results", flat_text_results.keys())
+def test_read_cache_matches_reading_each_time(results, tmp_path):
+    f_path = os.path.join(tmp_path, "results.csv")
+    with open(f_path, "w") as f:
+        f.write(flat_text_results[results])
+    munger_paths = list()
+    for name, text in [
+        ("first", flat_text_munger),
+        ("same_reading", same_reading_munger),
+        ("other_reading", other_reading_munger),
+    ]:
+        munger_paths.append(os.path.join(tmp_path, f"{name}.munger"))
+        with open(munger_paths[-1], "w") as f:
+            f.write(text)
+
+    read_cache = dict()
+    # each munger twice, so that any change to the shared reading would show
+    for munger_path in munger_paths + munger_paths:
+        p, err = m.get_and_check_munger_params(munger_path)
+        assert err is None
+        expected, expected_err = m.file_to_raw_df(munger_path, p, f_path, str(tmp_path))
+        df, df_err = m.file_to_raw_df(
+            munger_path, p, f_path, str(tmp_path), read_cache=read_cache
+        )
+        assert df_err == expected_err
+        pd.testing.assert_frame_equal(df, expected)
+    # the first two mungers share one reading of the file
+    assert len(read_cache) == 2
+
+    # modified file is read again
+    with open(f_path, "a") as f:
+        f.write("Carbon,P9,President,Biden (DEM),1,2\n")
+    stat = os.stat(f_path)
+    os.utime(f_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    p, err = m.get_and_check_munger_params(munger_paths[0])
+    df, df_err = m.file_to_raw_df(
+        munger_paths[0], p, f_path, str(tmp_path), read_cache=read_cache
+    )
+    assert "Carbon;P9" in set(df["ReportingUnit_raw"])
+    assert len(read_cache) == 3